@@ -51,6 +51,7 @@ hiddenimports = [
     'postgrest',
     'realtime',
     'storage3',
+    'zstandard',
 ]
 
 # Add hidden imports for supabase sub-packages
@@ -0,0 +1,64 @@
+# runs blocking supabase calls on a thread pool so the tabs never freeze on a round-trip.
+# the work function runs in the background; on_done / on_error are called back on the
+# GUI thread, so they can touch widgets directly.
+# example:
+#   run_task(lambda: supabase.table("devices").select("*").execute(),
+#            on_done=self.show_devices, on_error=self.show_error)
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+PENDING_PREFIX = "pending-"  # id prefix for optimistic rows that aren't saved yet
+
+_running = set()  # keeps each task's signals alive until its callback has run
+
+
+def is_pending(row):
+    """True for a row added optimistically that the server hasn't confirmed"""
+    return str((row or {}).get('id', '')).startswith(PENDING_PREFIX)
+
+
+class TaskSignals(QObject):
+    finished = pyqtSignal(object)  # emits whatever the work function returned
+    failed = pyqtSignal(object)    # emits the exception
+
+
+class BackgroundTask(QRunnable):
+    """One blocking call run on the shared QThreadPool"""
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+
+
+def run_task(fn, on_done=None, on_error=None):
+    """Run fn() in the background and call on_done(result) or on_error(exception) on the GUI thread"""
+    task = BackgroundTask(fn)
+    _running.add(task.signals)
+
+    def done(result):
+        _running.discard(task.signals)
+        if on_done:
+            on_done(result)
+
+    def failed(error):
+        _running.discard(task.signals)
+        if on_error:
+            on_error(error)
+        else:
+            print(f"⚠️  Background task failed: {error}")
+
+    # connected from the GUI thread, so the callbacks are queued back onto it
+    task.signals.finished.connect(done)
+    task.signals.failed.connect(failed)
+    QThreadPool.globalInstance().start(task)
+    return task
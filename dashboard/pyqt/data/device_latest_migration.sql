@@ -0,0 +1,127 @@
+-- Migration script for the device_latest table (newest reading per device)
+-- Run this in your Supabase SQL Editor, after sensor_logs_partitioning_migration.sql
+--
+-- "Current state" lookups (device cards, the dashboard's fallback to the most
+-- recent data) used to scan sensor_logs with ORDER BY recorded_at DESC LIMIT 1.
+-- device_latest keeps one row per device, upserted by a trigger whenever
+-- readings are inserted, so those lookups are a primary-key read.
+
+BEGIN;
+
+-- ============================================
+-- 1. device_latest Table
+-- ============================================
+
+-- Same column types as sensor_logs, backfilled with each device's newest reading
+CREATE TABLE IF NOT EXISTS public.device_latest AS
+SELECT DISTINCT ON (device_id)
+    device_id, recorded_at, temp_c, humidity, pressure_pa, "windSpeed",
+    battery, boot, rfid, filter_status
+FROM public.sensor_logs
+WHERE device_id IS NOT NULL
+AND device_id IN (SELECT id FROM public.devices)
+ORDER BY device_id, recorded_at DESC;
+
+ALTER TABLE public.device_latest ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+-- guarded so the script can be run again
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                   WHERE conrelid = 'public.device_latest'::regclass AND contype = 'p') THEN
+        ALTER TABLE public.device_latest ADD PRIMARY KEY (device_id);
+    END IF;
+
+    -- Lets PostgREST embed it: devices?select=*,device_latest(*)
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                   WHERE conrelid = 'public.device_latest'::regclass
+                   AND conname = 'device_latest_device_id_fkey') THEN
+        ALTER TABLE public.device_latest
+            ADD CONSTRAINT device_latest_device_id_fkey
+            FOREIGN KEY (device_id) REFERENCES public.devices(id) ON DELETE CASCADE;
+    END IF;
+END;
+$$;
+
+-- ============================================
+-- 2. Trigger to keep it current
+-- ============================================
+
+-- Statement-level: a bulk insert costs one upsert. Older readings arriving late
+-- (e.g. from the relay's spool) never overwrite a newer one.
+CREATE OR REPLACE FUNCTION update_device_latest()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO public.device_latest AS t (
+        device_id, recorded_at, temp_c, humidity, pressure_pa, "windSpeed",
+        battery, boot, rfid, filter_status, updated_at)
+    SELECT DISTINCT ON (device_id)
+        device_id, recorded_at, temp_c, humidity, pressure_pa, "windSpeed",
+        battery, boot, rfid, filter_status, NOW()
+    FROM new_rows
+    WHERE device_id IN (SELECT id FROM public.devices)
+    ORDER BY device_id, recorded_at DESC
+    ON CONFLICT (device_id) DO UPDATE SET
+        recorded_at = EXCLUDED.recorded_at,
+        temp_c = EXCLUDED.temp_c,
+        humidity = EXCLUDED.humidity,
+        pressure_pa = EXCLUDED.pressure_pa,
+        "windSpeed" = EXCLUDED."windSpeed",
+        battery = EXCLUDED.battery,
+        boot = EXCLUDED.boot,
+        rfid = EXCLUDED.rfid,
+        filter_status = EXCLUDED.filter_status,
+        updated_at = EXCLUDED.updated_at
+    WHERE t.recorded_at IS NULL OR EXCLUDED.recorded_at >= t.recorded_at;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS update_device_latest ON public.sensor_logs;
+CREATE TRIGGER update_device_latest
+    AFTER INSERT ON public.sensor_logs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION update_device_latest();
+
+-- ============================================
+-- 3. Row Level Security (RLS) Policies
+-- ============================================
+
+ALTER TABLE public.device_latest ENABLE ROW LEVEL SECURITY;
+
+-- device_latest: Users can only view their own devices
+DROP POLICY IF EXISTS "Users can view own device_latest" ON public.device_latest;
+CREATE POLICY "Users can view own device_latest"
+    ON public.device_latest
+    FOR SELECT
+    USING (device_id IN (
+        SELECT id FROM public.devices WHERE owner_id = auth.uid()
+    ));
+
+-- ============================================
+-- 4. Helpful Queries
+-- ============================================
+
+-- Devices with their newest reading, one query
+-- SELECT d.id, d.name, l.recorded_at, l.battery, l.boot, l.rfid
+-- FROM devices d
+-- LEFT JOIN device_latest l ON l.device_id = d.id
+-- WHERE d.owner_id = auth.uid();
+
+-- Devices that haven't reported in a day
+-- SELECT * FROM device_latest
+-- WHERE recorded_at < NOW() - INTERVAL '1 day';
+
+-- Rebuild from sensor_logs (e.g. after deleting raw rows)
+-- TRUNCATE device_latest;
+-- INSERT INTO device_latest (device_id, recorded_at, temp_c, humidity, pressure_pa, "windSpeed",
+--                            battery, boot, rfid, filter_status)
+-- SELECT DISTINCT ON (device_id) device_id, recorded_at, temp_c, humidity, pressure_pa, "windSpeed",
+--        battery, boot, rfid, filter_status
+-- FROM sensor_logs
+-- WHERE device_id IN (SELECT id FROM devices)
+-- ORDER BY device_id, recorded_at DESC;
+
+COMMIT;
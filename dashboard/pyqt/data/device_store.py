@@ -0,0 +1,111 @@
+# one copy of the user's device list, shared by the dashboard and devices tabs.
+# it is fetched once; after that every insert / update / unclaim is applied to the
+# list in place and devicesChanged tells every tab, so nothing refetches the whole list.
+# a copy of the confirmed list is kept in query_cache for when Supabase can't be reached,
+# and writes go through the outbox so they are queued while offline.
+from PyQt5.QtCore import QObject, pyqtSignal
+from supabase import create_client
+
+from config import SUPABASE_URL, SUPABASE_KEY
+from data.background_tasks import run_task, is_pending
+from data.offline import connectivity, is_offline_error
+from data.query_cache import query_cache, cache_key
+
+
+class DeviceStore(QObject):
+
+    devicesChanged = pyqtSignal(list)  # the full list (newest first) after every change
+    loadFailed = pyqtSignal(str)       # emits the error message string
+
+    def __init__(self, user_session, outbox, parent=None):
+        super().__init__(parent)
+        self.user_session = user_session
+        self.outbox = outbox  # device writes; queued while offline
+        self.supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        self.supabase.auth.set_session(
+            access_token=self.user_session.access_token,
+            refresh_token=self.user_session.refresh_token
+        )
+        self.devices = []
+        self.loaded = False
+        self.stale_since = None  # when the shown list was saved, while it's the offline copy
+        self.outbox.replayed.connect(self.on_replayed)
+        self.outbox.flushed.connect(self.load)  # queued writes are in: check against the server
+
+    def load(self):
+        """Fetch the user's devices in the background (startup, or a manual reload)"""
+        print("📡 Fetching devices...")
+        run_task(
+            lambda: self.supabase.table("devices")
+                .select("*")
+                .eq("owner_id", self.user_session.user.id)
+                .order("created_at", desc=True)
+                .execute(),
+            on_done=self.on_loaded,
+            on_error=self.on_load_failed
+        )
+
+    def on_loaded(self, response):
+        connectivity.report(True)
+        self.stale_since = None
+        self.set_devices(response.data or [])
+
+    def on_load_failed(self, e):
+        if is_offline_error(e):
+            connectivity.report(False)
+            stale = query_cache.get_stale(self.cache_key())
+            if stale is not None:
+                print("📴 Offline: showing the saved device list")
+                devices, self.stale_since = stale
+                self.set_devices(devices)
+                return
+        self.loadFailed.emit(str(e))
+
+    def cache_key(self):
+        return cache_key(self.user_session, None, "devices", None)
+
+    def set_devices(self, devices):
+        self.devices = list(devices)
+        self.loaded = True
+        print(f"✅ Received {len(self.devices)} devices")
+        self.changed()
+
+    def changed(self):
+        # the offline copy only has rows the server has confirmed, and is only refreshed
+        # from a list that was loaded online
+        if self.stale_since is None:
+            query_cache.put(self.cache_key(), [d for d in self.devices if not is_pending(d)], 0)
+        self.devicesChanged.emit(list(self.devices))
+
+    def on_replayed(self, op, rows):
+        """A write queued while offline went through: show the server's version of the row"""
+        if op["table"] != "devices":
+            return
+        for row in rows:
+            if row.get('owner_id') == self.user_session.user.id:
+                self.upsert(row, replace_id=op.get("pending_id"))
+            else:
+                self.remove(row.get('id'))  # unclaimed
+
+    def get(self, device_id):
+        return next((d for d in self.devices if d.get('id') == device_id), None)
+
+    def upsert(self, device, index=0, replace_id=None):
+        """Replace the device with the same id (or replace_id), otherwise insert it at index"""
+        replace_id = replace_id or device.get('id')
+        for i, existing in enumerate(self.devices):
+            if existing.get('id') == replace_id:
+                self.devices[i] = device
+                break
+        else:
+            self.devices.insert(min(index, len(self.devices)), device)
+        self.changed()
+
+    def remove(self, device_id):
+        """Drop a device; returns where it was so a failed write can put it back"""
+        for i, existing in enumerate(self.devices):
+            if existing.get('id') == device_id:
+                del self.devices[i]
+                self.changed()
+                return i
+        return 0
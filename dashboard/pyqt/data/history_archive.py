@@ -0,0 +1,166 @@
+# compressed chunks for the long-term part of the series store (data/series_store.py).
+# readings change slowly and arrive on a steady cadence, so instead of compressing raw
+# float64/int64 bytes each column is first turned into small integers:
+#   recorded_at: whole seconds (the sub-second part is dropped), delta-of-delta: a 60 s
+#                cadence or rollup buckets give nearly all zeros
+#   metrics:     rounded to the precision the firmware reports, then delta-encoded
+# zigzag-mapped to unsigned, narrowed to the smallest type that holds them, and split into
+# byte planes (the high bytes are almost all zero), then compressed with zstd (zlib only
+# reaches ~9.9x of float64, zstd ~10.2x). each column is a separate block so a window of
+# one metric only decodes recorded_at and that metric.
+# the header is compact JSON (block offsets follow from the lengths), zlib-compressed: at
+# about a day of readings per chunk a plain header was ~8% of the archive.
+# benchmark: testing/history_archive_benchmark.py
+# example:
+#   blob = encode_chunk(times_ns, {"temp_c": temps})
+#   times_ns, columns = decode_chunk(blob, ["temp_c"])
+import json
+import struct
+import zlib
+
+import numpy as np
+import zstandard
+
+DECODE_ERRORS = (KeyError, ValueError, zlib.error, zstandard.ZstdError)
+MAGIC = b"AQH2"
+ZSTD_LEVEL = 19  # chunks are written once per sealed day; 19 also decodes fastest here
+
+# decimals kept per column: what the firmware sends (String(value, decimals)), so raw
+# readings round-trip exactly and rollup averages lose nothing the sensor resolves
+DECIMALS = {
+    "temp_c": 2,
+    "humidity": 2,
+    "pressure_pa": 1,
+    "windSpeed": 2,
+    "battery": 3,
+    "samples": 0,
+}
+DEFAULT_DECIMALS = 4
+SECOND_NS = 10 ** 9
+
+
+class ArchiveError(Exception):
+    """A chunk that can't be decoded (not a chunk, or corrupt)"""
+
+
+def compress(data):
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def decompress(data):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def pack(ints):
+    """int64 -> bytes: zigzag (small negatives stay small), narrowest unsigned type,
+    byte planes. Returns (bytes, dtype str)"""
+    ints = np.asarray(ints, dtype="<i8")
+    zigzag = ((ints << 1) ^ (ints >> 63)).view("<u8")
+    top = int(zigzag.max()) if len(zigzag) else 0
+    dtype = next(d for d in ("<u1", "<u2", "<u4", "<u8") if top <= np.iinfo(d).max)
+    narrow = zigzag.astype(dtype)
+    return narrow.view("<u1").reshape(-1, narrow.itemsize).T.tobytes(), dtype
+
+
+def unpack(data, dtype):
+    itemsize = np.dtype(dtype).itemsize
+    planes = np.frombuffer(data, dtype="<u1").reshape(itemsize, -1)
+    zigzag = np.ascontiguousarray(planes.T).view(dtype).ravel().astype("<u8")
+    return ((zigzag >> np.uint64(1)).view("<i8")) ^ -((zigzag & np.uint64(1)).view("<i8"))
+
+
+def encode_times(times):
+    """int64 ns -> (first second, delta-of-delta ints)"""
+    seconds = times // SECOND_NS
+    deltas = np.diff(seconds, prepend=seconds[:1])
+    return int(seconds[0]) if len(seconds) else 0, np.diff(deltas, prepend=0)
+
+
+def decode_times(first, dod):
+    deltas = np.cumsum(dod, dtype="<i8")
+    return (first + np.cumsum(deltas, dtype="<i8")) * SECOND_NS
+
+
+def encode_values(name, values):
+    """float64 -> (decimals, missing-mask or None, delta ints)"""
+    decimals = DECIMALS.get(name, DEFAULT_DECIMALS)
+    missing = np.isnan(values)
+    steps = np.zeros(len(values), dtype="<i8")
+    steps[~missing] = np.round(values[~missing] * 10 ** decimals)
+    if missing.any():
+        # repeat the previous step so a gap costs two zero deltas instead of two big jumps
+        index = np.where(missing, 0, np.arange(len(values)))
+        steps = steps[np.maximum.accumulate(index)]
+    return decimals, (missing if missing.any() else None), np.diff(steps, prepend=0)
+
+
+def decode_values(decimals, deltas, missing):
+    values = np.cumsum(deltas, dtype="<i8") / 10 ** decimals
+    if missing is not None:
+        values[missing] = np.nan
+    return values
+
+
+def encode_chunk(times, columns):
+    """Rows of one chunk -> bytes. times: int64 ns (sorted); columns: name -> float64 array"""
+    blocks, header = [], {"rows": len(times), "blocks": {}}
+
+    def add(name, data, **info):
+        data = compress(data)
+        header["blocks"][name] = {"length": len(data), **info}
+        blocks.append(data)
+
+    first, dod = encode_times(np.asarray(times, dtype="<i8"))
+    data, dtype = pack(dod)
+    add("recorded_at", data, dtype=dtype, first=first)
+    for name, values in columns.items():
+        decimals, missing, deltas = encode_values(name, np.asarray(values, dtype="<f8"))
+        data, dtype = pack(deltas)
+        add(name, data, dtype=dtype, decimals=decimals)
+        if missing is not None:
+            add(name + ":missing", np.packbits(missing).tobytes())
+    head = zlib.compress(json.dumps(header, separators=(",", ":")).encode(), 9)
+    return MAGIC + struct.pack("<I", len(head)) + head + b"".join(blocks)
+
+
+def chunk_header(blob):
+    """(header with each block's offset, where the blocks start)"""
+    if blob[:4] != MAGIC:
+        raise ArchiveError("not a history chunk")
+    (size,) = struct.unpack("<I", blob[4:8])
+    header = json.loads(zlib.decompress(blob[8:8 + size]))
+    offset = 0
+    for info in header["blocks"].values():  # blocks are stored in header order
+        info["offset"] = offset
+        offset += info["length"]
+    return header, 8 + size
+
+
+def decode_chunk(blob, names):
+    """bytes -> (times int64 ns, {name: float64 array}) for the columns asked for.
+    A column the chunk doesn't have comes back all NaN."""
+    try:
+        header, base = chunk_header(blob)
+        blocks, rows = header["blocks"], header["rows"]
+
+        def block(name):
+            info = blocks[name]
+            start = base + info["offset"]
+            return decompress(blob[start:start + info["length"]]), info
+
+        data, info = block("recorded_at")
+        times = decode_times(info["first"], unpack(data, info["dtype"]))
+        columns = {}
+        for name in names:
+            if name not in blocks:
+                columns[name] = np.full(rows, np.nan)
+                continue
+            data, info = block(name)
+            missing = None
+            if name + ":missing" in blocks:
+                mask = np.frombuffer(block(name + ":missing")[0], dtype="<u1")
+                missing = np.unpackbits(mask, count=rows).astype(bool)
+            columns[name] = decode_values(info["decimals"], unpack(data, info["dtype"]), missing)
+    except DECODE_ERRORS as e:
+        raise ArchiveError(f"corrupt history chunk: {e}") from e
+    return times, columns
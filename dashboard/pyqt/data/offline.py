@@ -0,0 +1,58 @@
+# whether Supabase can be reached right now. loaders and background writes report every
+# request's outcome here; tabs listen to `changed` to show the offline banner, and the
+# outbox replays queued writes when it flips back online.
+# report() may be called from any thread: the state lives on the GUI thread.
+import socket
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+try:
+    import httpx  # what the supabase client talks over
+    NETWORK_ERRORS = (httpx.TransportError, OSError)
+    # failed before the request went out: no connection was ever made
+    UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout,
+                     ConnectionRefusedError, socket.gaierror)
+except ImportError:
+    NETWORK_ERRORS = (OSError,)
+    UNSENT_ERRORS = (ConnectionRefusedError, socket.gaierror)
+
+
+def is_offline_error(e):
+    """True when the request never got an answer (no network, DNS, timeout), as opposed
+    to Supabase answering with an error"""
+    return isinstance(e, NETWORK_ERRORS)
+
+
+def is_unsent_error(e):
+    """True when the request can't have reached Supabase, so sending it again can't apply
+    it twice. A read timeout or dropped connection may come after the server committed."""
+    return isinstance(e, UNSENT_ERRORS)
+
+
+class Connectivity(QObject):
+
+    changed = pyqtSignal(bool)  # True when back online
+    reported = pyqtSignal(bool)  # internal: carries report() over to the GUI thread
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.online = True
+        self.offline_since = None
+        self.reported.connect(self.set_online)
+
+    def report(self, online):
+        """Outcome of a request: True if Supabase answered, False if it couldn't be reached"""
+        self.reported.emit(online)
+
+    def set_online(self, online):
+        if online == self.online:
+            return
+        self.online = online
+        self.offline_since = None if online else time.time()
+        print("🌐 Back online" if online else "📴 Supabase unreachable, working offline")
+        self.changed.emit(online)
+
+
+# the one connectivity state every loader and tab shares
+connectivity = Connectivity()
@@ -0,0 +1,158 @@
+# writes made while Supabase can't be reached (device edits, unclaims, new devices, profile
+# saves) are queued here instead of failing, so the UI keeps its optimistic state and the
+# user carries on. the queue is saved to disk, and replayed in order as soon as
+# connectivity says we're back online; the tabs then reconcile with what the server has.
+# an insert is only queued (or retried) when it never reached the server: one that went out
+# and got no answer may have been saved, and sending it again would add it twice. updates
+# set the same values again, so those are queued on any network error.
+# example:
+#   outbox.write({"table": "devices", "action": "update", "values": {"name": "Attic"},
+#                 "match": {"id": device_id}, "label": "Rename Attic"},
+#                on_done, on_error, on_queued)
+import json
+import os
+
+from PyQt5.QtCore import QObject, QStandardPaths, pyqtSignal
+from supabase import create_client
+
+from config import SUPABASE_URL, SUPABASE_KEY
+from data.background_tasks import run_task
+from data.offline import connectivity, is_offline_error, is_unsent_error
+
+
+class UnconfirmedWrite(Exception):
+    """An insert that went out but got no answer: it may or may not have been saved"""
+
+    def __init__(self, error):
+        super().__init__(f"No answer from the server ({error}), so it may or may not have been saved. "
+                         "Reload to check before trying again.")
+
+
+def retry_safe(op, e):
+    """Whether a write that failed with network error e can be sent again"""
+    return op["action"] != "insert" or is_unsent_error(e)
+
+
+def execute(supabase, op):
+    """Run one queued write: insert op["values"], or update the rows matching op["match"]"""
+    query = supabase.table(op["table"])
+    if op["action"] == "insert":
+        query = query.insert(op["values"])
+    else:
+        query = query.update(op["values"])
+    for column, value in op.get("match", {}).items():
+        query = query.eq(column, value)
+    return query.execute()
+
+
+class Outbox(QObject):
+
+    changed = pyqtSignal(int)          # number of writes waiting
+    replayed = pyqtSignal(dict, list)  # a queued write went through: the op, rows the server returned
+    rejected = pyqtSignal(dict, str)   # the server refused a queued write: the op, error message
+    flushed = pyqtSignal()             # queue emptied after a replay; time to reconcile
+
+    def __init__(self, user_session, parent=None):
+        super().__init__(parent)
+        self.user_session = user_session
+        self.supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        self.supabase.auth.set_session(
+            access_token=self.user_session.access_token,
+            refresh_token=self.user_session.refresh_token
+        )
+        base = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+        self.path = os.path.join(base, f"outbox-{self.user_session.user.id}.json")
+        self.ops = self.read()
+        self.replaying = False
+        connectivity.changed.connect(self.on_connectivity_changed)
+        self.replay()  # anything left over from last time
+
+    def read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.ops, f)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print(f"⚠️  Could not save queued writes: {e}")
+        self.changed.emit(len(self.ops))
+
+    def write(self, op, on_done, on_error, on_queued=None):
+        """Send a write now, or queue it if Supabase can't be reached. on_done gets the
+        response, on_error an exception the server raised, on_queued nothing."""
+        if self.ops:
+            # earlier writes are still waiting: this one has to go after them
+            self.enqueue(op, on_queued)
+            return
+
+        def failed(e):
+            if not is_offline_error(e):
+                on_error(e)
+                return
+            connectivity.report(False)
+            if retry_safe(op, e):
+                self.enqueue(op, on_queued)
+            else:
+                on_error(UnconfirmedWrite(e))
+
+        def done(response):
+            connectivity.report(True)
+            on_done(response)
+
+        run_task(lambda: execute(self.supabase, op), done, failed)
+
+    def enqueue(self, op, on_queued):
+        self.ops.append(op)
+        self.save()
+        print(f"📤 Queued for when we're back online: {op.get('label', op['table'])}")
+        if on_queued:
+            on_queued()
+        if connectivity.online:
+            self.replay()
+
+    def on_connectivity_changed(self, online):
+        if online:
+            self.replay()
+
+    def replay(self):
+        """Send the queued writes in order, one at a time"""
+        if self.replaying or not self.ops:
+            return
+        self.replaying = True
+        op = self.ops[0]
+
+        def done(response):
+            self.ops.pop(0)
+            self.save()
+            self.replaying = False
+            print(f"✅ Synced: {op.get('label', op['table'])}")
+            self.replayed.emit(op, response.data or [])
+            self.next()
+
+        def failed(e):
+            self.replaying = False
+            if is_offline_error(e):
+                connectivity.report(False)
+                if retry_safe(op, e):
+                    return  # still offline; try again on the next reconnect
+                e = UnconfirmedWrite(e)
+            self.ops.pop(0)
+            self.save()
+            print(f"❌ Queued write rejected: {op.get('label', op['table'])}: {e}")
+            self.rejected.emit(op, str(e))
+            self.next()
+
+        run_task(lambda: execute(self.supabase, op), done, failed)
+
+    def next(self):
+        if self.ops:
+            self.replay()
+        else:
+            self.flushed.emit()
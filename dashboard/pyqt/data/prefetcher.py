@@ -0,0 +1,58 @@
+# warms query_cache with the views the user is likely to open next (the other devices at
+# the same time range, the current device over a longer range) while the network is idle.
+# one low-priority request at a time, and only while no interactive fetch is running:
+# hold() a loader the user is waiting on and nothing new starts until it has finished
+# (a prefetch already in flight is left to finish).
+# example:
+#   self.prefetcher.hold(self.loader)  # before self.loader.start()
+#   self.prefetcher.schedule([{"mode": SupabaseDataLoader.FETCH_MODE_GRAPH, "device_id": d,
+#                              "time_range_hours": 24, "columns": ["temp_c"]}])
+from PyQt5.QtCore import QObject, QThread
+
+from data.query_cache import query_cache
+from data.offline import connectivity
+from data.supabase_loader import SupabaseDataLoader
+
+
+class Prefetcher(QObject):
+    """Runs queued SupabaseDataLoader requests one by one, only to fill query_cache"""
+
+    def __init__(self, user_session, parent=None):
+        super().__init__(parent)
+        self.user_session = user_session
+        self.queue = []  # SupabaseDataLoader kwargs still to warm, in order
+        self.loader = None  # the prefetch in flight
+        self.interactive = set()  # loaders the user is waiting on
+        self.prefetched = 0
+
+    def schedule(self, views):
+        """Warm these views in order, replacing whatever was still queued"""
+        self.queue = list(views)
+        self.start_next()
+
+    def hold(self, loader):
+        """An interactive fetch: prefetching waits until it (and any others) have finished"""
+        self.interactive.add(loader)
+        loader.finished.connect(lambda loader=loader: self.release(loader))
+
+    def release(self, loader):
+        self.interactive.discard(loader)
+        self.start_next()
+
+    def start_next(self):
+        if self.interactive or self.loader is not None or not connectivity.online:
+            return
+        while self.queue:
+            loader = SupabaseDataLoader(user_session=self.user_session, **self.queue.pop(0))
+            if query_cache.contains(loader.result_key()):
+                continue  # already warm
+            self.loader = loader
+            loader.finished.connect(self.on_finished)
+            loader.start(QThread.LowestPriority)
+            return
+
+    def on_finished(self):
+        self.loader.wait()
+        self.loader = None
+        self.prefetched += 1
+        self.start_next()
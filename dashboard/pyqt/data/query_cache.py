@@ -0,0 +1,271 @@
+# query results shared by every tab and loader mode, so switching time ranges or device
+# sets back and forth doesn't download the same rows again.
+# two levels: an in-memory LRU with a global byte budget, and an on-disk tier every result
+# is written through to (it survives a restart). each entry has a TTL tied to how often the
+# data behind it can change, so get() never serves rows staler than one sensor cadence /
+# rollup bucket. expired and invalidated entries stay on disk as the last known copy, which
+# get_stale() serves when Supabase can't be reached (offline mode).
+# example:
+#   key = cache_key(user_session, [device_id], "graph", 24, ["temp_c"])
+#   df = query_cache.get(key)
+#   if df is None: ...fetch...; query_cache.put(key, df, cadence_ttl(bucket_seconds))
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from PyQt5.QtCore import QStandardPaths
+
+MEMORY_BUDGET = 256 * 1024 * 1024  # bytes of cached results kept in memory
+DISK_BUDGET = 1024 * 1024 * 1024   # bytes kept in the on-disk tier
+SENSOR_CADENCE = 60  # seconds: nodes post once per sleep_Time, so raw rows change at most this often
+MAX_TTL = 60 * 60    # even day buckets are refreshed within the hour (today's bucket keeps changing)
+
+
+def cadence_ttl(bucket_seconds=SENSOR_CADENCE):
+    """TTL for data aggregated into buckets of this size: nothing changes faster than a new
+    reading, and a coarse bucket moves so little per reading that it can be kept longer"""
+    return min(MAX_TTL, max(SENSOR_CADENCE, bucket_seconds))
+
+
+def cache_key(user_session, devices, mode, time_range_hours, columns=None):
+    """(user, device set, mode, time range, column set) -> hashable key"""
+    user_id = user_session.user.id if user_session and user_session.user else None
+    devices = tuple(sorted(devices)) if devices is not None else None
+    columns = tuple(sorted(columns)) if columns else None
+    return user_id, devices, mode, time_range_hours, columns
+
+
+def size_of(value):
+    """Approximate bytes held by a cached value"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def copy_of(value):
+    """Callers may add columns or keys to what they got; keep those changes out of the cache"""
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class DiskTier:
+    """Second level: one file per key under the user cache directory, oldest files
+    dropped first when over budget. Each file holds the key, then
+    (value, stored_at, expires_at), so the key can be checked without loading the value.
+    The directory's size is counted once and then kept as a running total, so only a put
+    that goes over budget lists the directory."""
+
+    def __init__(self, path=None, budget=DISK_BUDGET):
+        self.path = path
+        self.budget = budget
+        self.total = None  # bytes in the directory, counted on first use
+        self.lock = threading.Lock()
+
+    def directory(self):
+        # resolved lazily: the cache location depends on the QApplication's name
+        if self.path is None:
+            base = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+            self.path = os.path.join(base, "query_cache")
+        os.makedirs(self.path, exist_ok=True)
+        return self.path
+
+    def file_for(self, key):
+        return os.path.join(self.directory(), hashlib.sha1(repr(key).encode()).hexdigest() + ".pkl")
+
+    def get(self, key):
+        """(value, stored_at, expires_at) or None"""
+        try:
+            with open(self.file_for(key), "rb") as f:
+                if pickle.load(f) != key:
+                    return None
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+
+    def put(self, key, value, stored_at, expires_at):
+        path = self.file_for(key)
+        # a temp file of its own: loaders on other threads may be writing the same key
+        with tempfile.NamedTemporaryFile(dir=self.directory(), suffix=".tmp", delete=False) as f:
+            try:
+                pickle.dump(key, f, pickle.HIGHEST_PROTOCOL)
+                pickle.dump((value, stored_at, expires_at), f, pickle.HIGHEST_PROTOCOL)
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        size = os.path.getsize(f.name)
+        with self.lock:
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(f.name, path)
+            if self.total is None:
+                self.total = self.trim()
+            else:
+                self.total += size - replaced
+                if self.total > self.budget:
+                    self.total = self.trim()
+
+    def trim(self):
+        """Drop the oldest files until the directory fits the budget. Returns its size."""
+        files = []
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.budget:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        return total
+
+
+class QueryCache:
+    """LRU of query results with TTLs, a memory budget and a DiskTier behind it.
+    Thread-safe: loaders read and fill it from their worker threads."""
+
+    def __init__(self, budget=MEMORY_BUDGET, disk=None):
+        self.budget = budget
+        self.disk = disk
+        self.entries = OrderedDict()  # key -> (value, stored_at, expires_at, size), least recently used first
+        self.bytes = 0
+        self.invalidated = {}  # device id (None = every device) -> when its results were invalidated
+        self.lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.stale_hits = 0
+        self.evictions = self.expirations = 0
+
+    def invalidated_at(self, key):
+        # caller holds the lock
+        devices = key[1] if key[1] is not None else self.invalidated.keys()
+        return max([self.invalidated.get(None, 0)] + [self.invalidated.get(d, 0) for d in devices])
+
+    def fresh(self, key, stored_at, expires_at, now):
+        return expires_at > now and stored_at > self.invalidated_at(key)
+
+    def get(self, key):
+        """Cached value for key, or None when missing, expired or invalidated"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, stored_at, expires_at, size = entry
+                if self.fresh(key, stored_at, expires_at, now):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return copy_of(value)
+                self.drop(key)
+                self.expirations += 1
+
+        stored = self.disk.get(key) if self.disk else None
+        with self.lock:
+            if stored is not None and self.fresh(key, stored[1], stored[2], now):
+                self.disk_hits += 1
+                self.store(key, *stored)  # back into memory
+                return copy_of(stored[0])
+            self.misses += 1
+        return None
+
+    def get_stale(self, key):
+        """Last known (value, stored_at) for key however old it is, or None. For offline mode."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.stale_hits += 1
+                return copy_of(entry[0]), entry[1]
+        stored = self.disk.get(key) if self.disk else None
+        if stored is None:
+            return None
+        with self.lock:
+            self.stale_hits += 1
+        return copy_of(stored[0]), stored[1]
+
+    def contains(self, key):
+        """Whether key is in memory and fresh (not counted as a lookup)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and self.fresh(key, entry[1], entry[2], time.time())
+
+    def put(self, key, value, ttl):
+        """Cache value for ttl seconds. ttl=0 only keeps it on disk as the last known copy."""
+        value = copy_of(value)
+        now = time.time()
+        if ttl > 0:
+            with self.lock:
+                self.store(key, value, now, now + ttl)
+        if self.disk:
+            try:
+                self.disk.put(key, value, now, now + ttl)
+            except OSError as e:
+                print(f"⚠️  Query cache write failed: {e}")
+
+    def store(self, key, value, stored_at, expires_at):
+        # caller holds the lock; least recently used entries are dropped when over budget
+        # (they are still on disk)
+        if key in self.entries:
+            self.drop(key)
+        size = size_of(value)
+        if size > self.budget:
+            return
+        self.entries[key] = (value, stored_at, expires_at, size)
+        self.bytes += size
+        while self.bytes > self.budget:
+            self.drop(next(iter(self.entries)))
+            self.evictions += 1
+
+    def drop(self, key):
+        size = self.entries.pop(key)[3]
+        self.bytes -= size
+
+    def invalidate(self, devices=None):
+        """Stop serving results for any of these devices (everything when None), e.g. when
+        new readings have landed. They stay on disk as the last known copy."""
+        now = time.time()
+        with self.lock:
+            for device in (devices if devices is not None else [None]):
+                self.invalidated[device] = now
+            for key in [k for k, entry in self.entries.items() if entry[1] <= self.invalidated_at(k)]:
+                self.drop(key)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else None,
+                "stale_hits": self.stale_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def summary(self):
+        """stats() as one line for the log and the refresh button tooltip"""
+        s = self.stats()
+        rate = f"{100 * s['hit_rate']:.0f}%" if s["hit_rate"] is not None else "n/a"
+        return (f"{rate} hit rate ({s['hits']} memory, {s['disk_hits']} disk, {s['misses']} misses), "
+                f"{s['entries']} entries / {s['bytes'] / 1e6:.1f} MB in memory, "
+                f"{s['evictions']} evicted, {s['expirations']} expired, {s['stale_hits']} served offline")
+
+
+# the one cache every tab and loader shares
+query_cache = QueryCache(disk=DiskTier())
@@ -0,0 +1,160 @@
+# statistics for the dashboard stat cards, worked out from the graph frame that is
+# already loaded instead of downloading the same rows again.
+# a frame goes in as whole numpy columns (no per-row python work, it runs on the GUI thread),
+# delta fetches are appended and rows that fall out of the sliding time window are masked
+# off. the mean is kept as running sums, so a refresh only adds up the new rows; min, max
+# and p95 are worked out vectorised when asked for and cached until the window changes.
+import numpy as np
+import pandas as pd
+
+# stat card key -> sensor_logs column (same keys as the averagesFetched dict)
+STAT_COLUMNS = {
+    "temp": "temp_c",
+    "humidity": "humidity",
+    "pressure": "pressure_pa",
+    "windspeed": "windSpeed",
+}
+PERCENTILE = 0.95
+
+
+def to_ns(times):
+    """recorded_at values -> int64 UTC nanoseconds"""
+    return pd.to_datetime(times, utc=True).dt.tz_convert(None).to_numpy("datetime64[ns]").view("<i8")
+
+
+class RunningStats:
+    """Mean, min, max and p95 of one metric over a sliding window of rows"""
+
+    def __init__(self):
+        self.times = np.empty(0, dtype="<i8")
+        self.values = np.empty(0)
+        self.weights = np.empty(0)
+        self.lows = np.empty(0)   # per row min reading: a rollup bucket's _min, else the value
+        self.highs = np.empty(0)  # per row max reading
+        self.total = 0.0
+        self.weight = 0.0
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def extend(self, times, values, weights=None, lows=None, highs=None):
+        """Add rows: times int64 ns, values float (NaN rows are skipped), weights the sample
+        count for rollup buckets, lows/highs the bucket's min/max reading"""
+        values = np.asarray(values, dtype="f8")
+        keep = ~np.isnan(values)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype="f8")
+        lows = values if lows is None else np.where(np.isnan(lows), values, lows)
+        highs = values if highs is None else np.where(np.isnan(highs), values, highs)
+        if not keep.all():
+            times, values, weights, lows, highs = (a[keep] for a in (times, values, weights, lows, highs))
+        if not len(values):
+            return
+        self.times = np.concatenate([self.times, times])
+        self.values = np.concatenate([self.values, values])
+        self.weights = np.concatenate([self.weights, weights])
+        self.lows = np.concatenate([self.lows, lows])
+        self.highs = np.concatenate([self.highs, highs])
+        self.total += float(values @ weights)
+        self.weight += float(weights.sum())
+        self.cache.clear()
+
+    def evict_before(self, cutoff):
+        """Drop readings older than cutoff (the window start, int64 ns)"""
+        if not len(self.times) or self.times.min() >= cutoff:
+            return
+        keep = self.times >= cutoff
+        gone = ~keep
+        self.total -= float(self.values[gone] @ self.weights[gone])
+        self.weight -= float(self.weights[gone].sum())
+        self.times, self.values, self.weights, self.lows, self.highs = (
+            a[keep] for a in (self.times, self.values, self.weights, self.lows, self.highs))
+        if not len(self.values):
+            # start again from exact zeros instead of accumulated rounding error
+            self.total = self.weight = 0.0
+        self.cache.clear()
+
+    @property
+    def mean(self):
+        return self.total / self.weight if self.weight else None
+
+    @property
+    def min(self):
+        if "min" not in self.cache:
+            self.cache["min"] = float(self.lows.min()) if len(self.lows) else None
+        return self.cache["min"]
+
+    @property
+    def max(self):
+        if "max" not in self.cache:
+            self.cache["max"] = float(self.highs.max()) if len(self.highs) else None
+        return self.cache["max"]
+
+    def percentile(self, q=PERCENTILE):
+        """Nearest-rank percentile of the readings in the window. A rollup bucket counts as
+        `samples` readings of its average, the same weighting as the mean."""
+        if q not in self.cache:
+            if not len(self.values):
+                self.cache[q] = None
+            else:
+                order = np.argsort(self.values, kind="stable")
+                cumulative = np.cumsum(self.weights[order])
+                rank = np.searchsorted(cumulative, q * cumulative[-1] - 1e-9)
+                self.cache[q] = float(self.values[order[min(rank, len(order) - 1)]])
+        return self.cache[q]
+
+
+class FrameStats:
+    """RunningStats for every stat card column plus the newest rfid of a graph frame"""
+
+    def __init__(self):
+        self.stats = {key: RunningStats() for key in STAT_COLUMNS}
+        self.columns = set()  # columns the frame has loaded; the others are left to the server
+        self.rfid = "N/A"
+        self.newest = None  # newest recorded_at seen, where the next delta fetch starts
+
+    def add_frame(self, df, columns=None):
+        """Add rows from a full or delta fetch, a column at a time.
+        columns limits it to those metrics, e.g. one merged in after the frame was loaded."""
+        if df.empty or "recorded_at" not in df.columns:
+            return
+        times = to_ns(df["recorded_at"])
+        # rollup buckets average `samples` readings each, so weight them to get the raw mean
+        weights = pd.to_numeric(df["samples"], errors="coerce").fillna(1).to_numpy("f8") \
+            if "samples" in df.columns else None
+
+        def column(name):
+            return pd.to_numeric(df[name], errors="coerce").to_numpy("f8") if name in df.columns else None
+
+        for key, col in STAT_COLUMNS.items():
+            if col not in df.columns or (columns is not None and col not in columns):
+                continue
+            self.columns.add(col)
+            # rollup frames carry each bucket's min/max reading next to its average
+            self.stats[key].extend(times, column(col), weights, column(f"{col}_min"), column(f"{col}_max"))
+
+        if "rfid" in df.columns:
+            rfids = df["rfid"].dropna()
+            if not rfids.empty:
+                self.rfid = rfids.iloc[-1]
+        newest = df["recorded_at"].max()
+        if self.newest is None or newest > self.newest:
+            self.newest = newest
+
+    def evict_before(self, cutoff):
+        cutoff = pd.Timestamp(cutoff)
+        cutoff = (cutoff.tz_convert(None) if cutoff.tzinfo else cutoff).as_unit("ns").value
+        for stats in self.stats.values():
+            stats.evict_before(cutoff)
+
+    def averages(self):
+        """Same shape as SupabaseDataLoader.averagesFetched, plus <key>_min/_max/_p95"""
+        averages = {"rfid": self.rfid}
+        for key, stats in self.stats.items():
+            if STAT_COLUMNS[key] not in self.columns:
+                continue
+            averages[key] = stats.mean
+            averages[f"{key}_min"] = stats.min
+            averages[f"{key}_max"] = stats.max
+            averages[f"{key}_p95"] = stats.percentile()
+        return averages
@@ -0,0 +1,265 @@
+-- Migration script for sensor_logs partitioning, indexes & retention
+-- Run this in your Supabase SQL Editor
+--
+-- The dashboard always filters sensor_logs by device_id IN (...) plus
+-- recorded_at >= cutoff ORDER BY recorded_at. This converts sensor_logs into
+-- a table range-partitioned by month, so those queries only touch the
+-- months they ask for, and old months can be archived by detaching a
+-- partition instead of running a huge DELETE.
+--
+-- The existing table is renamed to sensor_logs_legacy and copied over. It is
+-- left in place so you can compare row counts before dropping it (section 8).
+--
+-- Safe to run again: a table that is already partitioned isn't renamed,
+-- rows that were already copied are skipped, and everything else is created
+-- only if missing. Legacy rows without recorded_at can't be placed in any
+-- partition, so the script stops (and rolls back) if there are any; set or
+-- delete them and run it again.
+
+BEGIN;
+
+-- ============================================
+-- 1. Partitioned sensor_logs table
+-- ============================================
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('public.sensor_logs')) = 'r' THEN
+        ALTER TABLE public.sensor_logs RENAME TO sensor_logs_legacy;
+    END IF;
+END;
+$$;
+
+-- Same columns and defaults as before, partitioned by recorded_at
+CREATE TABLE IF NOT EXISTS public.sensor_logs (
+    LIKE public.sensor_logs_legacy INCLUDING DEFAULTS INCLUDING IDENTITY
+) PARTITION BY RANGE (recorded_at);
+
+-- The partition key must be part of the primary key
+ALTER TABLE public.sensor_logs ALTER COLUMN recorded_at SET NOT NULL;
+ALTER TABLE public.sensor_logs ALTER COLUMN recorded_at SET DEFAULT NOW();
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                   WHERE conrelid = 'public.sensor_logs'::regclass AND contype = 'p') THEN
+        ALTER TABLE public.sensor_logs ADD PRIMARY KEY (id, recorded_at);
+    END IF;
+END;
+$$;
+
+-- A serial id keeps using the legacy sequence: hand it over so it survives
+-- DROP TABLE sensor_logs_legacy. An identity id got its own sequence from
+-- INCLUDING IDENTITY instead, which is moved past the copied ids in section 3.
+DO $$
+DECLARE
+    seq TEXT;
+BEGIN
+    IF to_regclass('public.sensor_logs_legacy') IS NULL THEN
+        RETURN;
+    END IF;
+    IF (SELECT attidentity FROM pg_attribute
+        WHERE attrelid = 'public.sensor_logs_legacy'::regclass AND attname = 'id') = '' THEN
+        seq := pg_get_serial_sequence('public.sensor_logs_legacy', 'id');
+        IF seq IS NOT NULL THEN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY public.sensor_logs.id', seq);
+        END IF;
+    END IF;
+END;
+$$;
+
+-- Catches rows outside every monthly partition (e.g. a device with a bad clock)
+CREATE TABLE IF NOT EXISTS public.sensor_logs_default
+    PARTITION OF public.sensor_logs DEFAULT;
+
+-- ============================================
+-- 2. Partition management functions
+-- ============================================
+
+-- Create the partition for the month containing month_start (UTC month bounds)
+CREATE OR REPLACE FUNCTION create_sensor_logs_partition(month_start DATE)
+RETURNS void AS $$
+DECLARE
+    first_day DATE := date_trunc('month', month_start)::DATE;
+    part_name TEXT := 'sensor_logs_' || to_char(month_start, 'YYYY_MM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS public.%I PARTITION OF public.sensor_logs FOR VALUES FROM (%L) TO (%L)',
+        part_name,
+        first_day::TIMESTAMP AT TIME ZONE 'UTC',
+        (first_day + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC'
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Make sure partitions exist for this month and the next few.
+-- Run this regularly (section 7): a month with no partition lands in sensor_logs_default,
+-- and a partition can't be created later while the default holds rows in its range.
+CREATE OR REPLACE FUNCTION ensure_sensor_logs_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS void AS $$
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        PERFORM create_sensor_logs_partition((date_trunc('month', NOW() AT TIME ZONE 'UTC') + i * INTERVAL '1 month')::DATE);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 3. Copy existing data
+-- ============================================
+
+-- One partition per month that already has data, then the upcoming months,
+-- then the rows. OVERRIDING SYSTEM VALUE keeps the legacy ids even when id is
+-- GENERATED ALWAYS AS IDENTITY; ON CONFLICT skips rows a previous run copied.
+DO $$
+DECLARE
+    m DATE;
+    missing BIGINT;
+    seq TEXT;
+BEGIN
+    IF to_regclass('public.sensor_logs_legacy') IS NOT NULL THEN
+        SELECT COUNT(*) INTO missing FROM public.sensor_logs_legacy WHERE recorded_at IS NULL;
+        IF missing > 0 THEN
+            RAISE EXCEPTION '% sensor_logs_legacy rows have no recorded_at', missing
+                USING HINT = 'Set recorded_at on those rows (or delete them), then run this script again.';
+        END IF;
+
+        FOR m IN
+            SELECT DISTINCT date_trunc('month', recorded_at AT TIME ZONE 'UTC')::DATE
+            FROM public.sensor_logs_legacy
+        LOOP
+            PERFORM create_sensor_logs_partition(m);
+        END LOOP;
+        PERFORM ensure_sensor_logs_partitions(3);
+
+        INSERT INTO public.sensor_logs OVERRIDING SYSTEM VALUE
+        SELECT * FROM public.sensor_logs_legacy
+        ON CONFLICT DO NOTHING;
+    ELSE
+        PERFORM ensure_sensor_logs_partitions(3);
+    END IF;
+
+    -- New rows must not reuse copied ids: an identity sequence starts at 1
+    IF (SELECT attidentity FROM pg_attribute
+        WHERE attrelid = 'public.sensor_logs'::regclass AND attname = 'id') <> '' THEN
+        seq := pg_get_serial_sequence('public.sensor_logs', 'id');
+        PERFORM setval(seq, GREATEST(COALESCE(MAX(id), 0), 1), MAX(id) IS NOT NULL)
+        FROM public.sensor_logs;
+    END IF;
+END;
+$$;
+
+-- ============================================
+-- 4. Indexes
+-- ============================================
+
+-- Matches the dashboard query: device_id IN (...) AND recorded_at >= cutoff,
+-- and "latest reading for a device" (ORDER BY recorded_at DESC LIMIT 1)
+CREATE INDEX IF NOT EXISTS idx_sensor_logs_device_recorded
+    ON public.sensor_logs(device_id, recorded_at DESC);
+
+-- Rows arrive in time order, so a BRIN index on recorded_at is tiny and
+-- serves plain time-range scans (all devices, rollups, archival)
+CREATE INDEX IF NOT EXISTS idx_sensor_logs_recorded_brin
+    ON public.sensor_logs USING BRIN (recorded_at);
+
+-- ============================================
+-- 5. Row Level Security (RLS) Policies
+-- ============================================
+
+-- Policies don't carry over from the legacy table
+ALTER TABLE public.sensor_logs ENABLE ROW LEVEL SECURITY;
+
+-- Sensor logs: Users can only view logs from their own devices
+DROP POLICY IF EXISTS "Users can view own sensor logs" ON public.sensor_logs;
+CREATE POLICY "Users can view own sensor logs"
+    ON public.sensor_logs
+    FOR SELECT
+    USING (device_id IN (
+        SELECT id FROM public.devices WHERE owner_id = auth.uid()
+    ));
+
+-- ============================================
+-- 6. Function to archive old sensor data
+-- ============================================
+
+-- Detach monthly partitions that are entirely older than keep_months and move
+-- them to the sensor_archive schema (or drop them). Returns partitions archived.
+CREATE SCHEMA IF NOT EXISTS sensor_archive;
+
+CREATE OR REPLACE FUNCTION archive_old_sensor_logs(keep_months INTEGER DEFAULT 24,
+                                                   drop_archived BOOLEAN DEFAULT FALSE)
+RETURNS INTEGER AS $$
+DECLARE
+    part RECORD;
+    cutoff DATE := (date_trunc('month', NOW() AT TIME ZONE 'UTC') - keep_months * INTERVAL '1 month')::DATE;
+    archived INTEGER := 0;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.sensor_logs'::regclass
+        AND c.relname ~ '^sensor_logs_\d{4}_\d{2}$'
+    LOOP
+        -- partition month + 1 is its upper bound
+        IF to_date(substring(part.relname FROM '\d{4}_\d{2}$'), 'YYYY_MM') + INTERVAL '1 month' <= cutoff THEN
+            EXECUTE format('ALTER TABLE public.sensor_logs DETACH PARTITION public.%I', part.relname);
+            IF drop_archived THEN
+                EXECUTE format('DROP TABLE public.%I', part.relname);
+            ELSE
+                EXECUTE format('ALTER TABLE public.%I SET SCHEMA sensor_archive', part.relname);
+            END IF;
+            archived := archived + 1;
+        END IF;
+    END LOOP;
+
+    RETURN archived;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One call for scheduled maintenance
+CREATE OR REPLACE FUNCTION maintain_sensor_logs()
+RETURNS void AS $$
+BEGIN
+    PERFORM ensure_sensor_logs_partitions(3);
+    PERFORM archive_old_sensor_logs(24, FALSE);
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 7. Scheduling (Optional - needs the pg_cron extension)
+-- ============================================
+
+-- Enable pg_cron under Database > Extensions, then:
+/*
+SELECT cron.schedule('maintain-sensor-logs', '0 3 * * *', 'SELECT maintain_sensor_logs()');
+*/
+
+-- ============================================
+-- 8. Helpful Queries
+-- ============================================
+
+-- Compare row counts before dropping the legacy table
+-- SELECT
+--     (SELECT COUNT(*) FROM sensor_logs_legacy) AS legacy_rows,
+--     (SELECT COUNT(*) FROM sensor_logs) AS partitioned_rows;
+
+-- Drop the legacy table once the counts match
+-- DROP TABLE sensor_logs_legacy;
+
+-- Rows per partition
+-- SELECT tableoid::regclass AS partition, COUNT(*)
+-- FROM sensor_logs
+-- GROUP BY 1
+-- ORDER BY 1;
+
+-- Rows that fell into the default partition (should be empty)
+-- SELECT * FROM sensor_logs_default ORDER BY recorded_at DESC LIMIT 20;
+
+-- Check that the dashboard query prunes partitions and uses the composite index
+-- EXPLAIN ANALYZE
+-- SELECT * FROM sensor_logs
+-- WHERE device_id IN ('device1', 'device2')
+-- AND recorded_at >= NOW() - INTERVAL '24 hours'
+-- ORDER BY recorded_at;
+
+COMMIT;
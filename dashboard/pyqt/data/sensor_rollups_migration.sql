@@ -0,0 +1,239 @@
+-- Migration script for sensor_logs rollup tables (1 min / 15 min / hourly / daily)
+-- Run this in your Supabase SQL Editor, after sensor_logs_partitioning_migration.sql
+--
+-- Long dashboard ranges (7 days, 30 days, All Time) used to pull every raw row.
+-- These tables hold one row per device per time bucket, kept up to date by a
+-- trigger on sensor_logs, so SupabaseDataLoader can read a few hundred
+-- buckets instead. Averages are exposed under the raw column names
+-- (recorded_at, temp_c, humidity, pressure_pa, windSpeed) so the dashboard
+-- plots them unchanged; min/max/count sit alongside.
+--
+-- Safe to run again: tables, columns, keys and policies are only added if
+-- missing, and the backfill rebuilds the buckets it covers.
+
+BEGIN;
+
+-- ============================================
+-- 1. Rollup levels
+-- ============================================
+CREATE OR REPLACE FUNCTION sensor_rollup_levels()
+RETURNS TABLE (table_name TEXT, bucket_width INTERVAL) AS $$
+    VALUES ('sensor_logs_1m', INTERVAL '1 minute'),
+           ('sensor_logs_15m', INTERVAL '15 minutes'),
+           ('sensor_logs_1h', INTERVAL '1 hour'),
+           ('sensor_logs_1d', INTERVAL '1 day');
+$$ LANGUAGE sql IMMUTABLE;
+
+-- ============================================
+-- 2. Rollup tables
+-- ============================================
+
+-- device_id keeps whatever type sensor_logs uses; recorded_at is the bucket start (UTC)
+DO $$
+DECLARE
+    lvl RECORD;
+BEGIN
+    FOR lvl IN SELECT * FROM sensor_rollup_levels() LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS public.%I AS SELECT device_id, recorded_at FROM public.sensor_logs WITH NO DATA',
+            lvl.table_name);
+        EXECUTE format($f$
+            ALTER TABLE public.%1$I
+                ALTER COLUMN device_id SET NOT NULL,
+                ALTER COLUMN recorded_at SET NOT NULL,
+                ADD COLUMN IF NOT EXISTS samples INTEGER NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS last_at TIMESTAMPTZ,
+                ADD COLUMN IF NOT EXISTS battery DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS rfid TEXT,
+                ADD COLUMN IF NOT EXISTS temp_c_n INTEGER NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS temp_c_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS temp_c_min DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS temp_c_max DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS humidity_n INTEGER NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS humidity_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS humidity_min DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS humidity_max DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS pressure_pa_n INTEGER NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS pressure_pa_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS pressure_pa_min DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS pressure_pa_max DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS "windSpeed_n" INTEGER NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS "windSpeed_sum" DOUBLE PRECISION NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS "windSpeed_min" DOUBLE PRECISION,
+                ADD COLUMN IF NOT EXISTS "windSpeed_max" DOUBLE PRECISION,
+                -- bucket averages under the raw column names
+                ADD COLUMN IF NOT EXISTS temp_c DOUBLE PRECISION
+                    GENERATED ALWAYS AS (temp_c_sum / NULLIF(temp_c_n, 0)) STORED,
+                ADD COLUMN IF NOT EXISTS humidity DOUBLE PRECISION
+                    GENERATED ALWAYS AS (humidity_sum / NULLIF(humidity_n, 0)) STORED,
+                ADD COLUMN IF NOT EXISTS pressure_pa DOUBLE PRECISION
+                    GENERATED ALWAYS AS (pressure_pa_sum / NULLIF(pressure_pa_n, 0)) STORED,
+                ADD COLUMN IF NOT EXISTS "windSpeed" DOUBLE PRECISION
+                    GENERATED ALWAYS AS ("windSpeed_sum" / NULLIF("windSpeed_n", 0)) STORED
+            $f$, lvl.table_name);
+        -- one row per device per bucket; also serves device_id IN (...) AND recorded_at >= cutoff
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                       WHERE conrelid = format('public.%I', lvl.table_name)::regclass AND contype = 'p') THEN
+            EXECUTE format('ALTER TABLE public.%I ADD PRIMARY KEY (device_id, recorded_at)', lvl.table_name);
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- ============================================
+-- 3. Aggregation query
+-- ============================================
+
+-- Builds the upsert that folds `source` (a table name or parenthesised
+-- subquery of sensor_logs rows) into one rollup table. Sums and counts add
+-- up, min/max widen, battery and rfid follow the newest reading.
+CREATE OR REPLACE FUNCTION sensor_rollup_sql(target TEXT, width INTERVAL, source TEXT)
+RETURNS TEXT AS $$
+BEGIN
+    RETURN format($f$
+        INSERT INTO public.%1$I AS t (
+            device_id, recorded_at, samples, last_at, battery, rfid,
+            temp_c_n, temp_c_sum, temp_c_min, temp_c_max,
+            humidity_n, humidity_sum, humidity_min, humidity_max,
+            pressure_pa_n, pressure_pa_sum, pressure_pa_min, pressure_pa_max,
+            "windSpeed_n", "windSpeed_sum", "windSpeed_min", "windSpeed_max")
+        SELECT
+            device_id,
+            date_bin(%2$L::INTERVAL, recorded_at, TIMESTAMPTZ '2000-01-01 00:00:00+00'),
+            COUNT(*), MAX(recorded_at),
+            (array_agg(battery ORDER BY recorded_at DESC))[1],
+            (array_agg(rfid ORDER BY recorded_at DESC))[1],
+            COUNT(temp_c), COALESCE(SUM(temp_c), 0), MIN(temp_c), MAX(temp_c),
+            COUNT(humidity), COALESCE(SUM(humidity), 0), MIN(humidity), MAX(humidity),
+            COUNT(pressure_pa), COALESCE(SUM(pressure_pa), 0), MIN(pressure_pa), MAX(pressure_pa),
+            COUNT("windSpeed"), COALESCE(SUM("windSpeed"), 0), MIN("windSpeed"), MAX("windSpeed")
+        FROM %3$s AS src
+        WHERE device_id IS NOT NULL AND recorded_at IS NOT NULL
+        GROUP BY 1, 2
+        ON CONFLICT (device_id, recorded_at) DO UPDATE SET
+            samples = t.samples + EXCLUDED.samples,
+            battery = CASE WHEN EXCLUDED.last_at >= t.last_at THEN EXCLUDED.battery ELSE t.battery END,
+            rfid = CASE WHEN EXCLUDED.last_at >= t.last_at THEN EXCLUDED.rfid ELSE t.rfid END,
+            last_at = GREATEST(t.last_at, EXCLUDED.last_at),
+            temp_c_n = t.temp_c_n + EXCLUDED.temp_c_n,
+            temp_c_sum = t.temp_c_sum + EXCLUDED.temp_c_sum,
+            temp_c_min = LEAST(t.temp_c_min, EXCLUDED.temp_c_min),
+            temp_c_max = GREATEST(t.temp_c_max, EXCLUDED.temp_c_max),
+            humidity_n = t.humidity_n + EXCLUDED.humidity_n,
+            humidity_sum = t.humidity_sum + EXCLUDED.humidity_sum,
+            humidity_min = LEAST(t.humidity_min, EXCLUDED.humidity_min),
+            humidity_max = GREATEST(t.humidity_max, EXCLUDED.humidity_max),
+            pressure_pa_n = t.pressure_pa_n + EXCLUDED.pressure_pa_n,
+            pressure_pa_sum = t.pressure_pa_sum + EXCLUDED.pressure_pa_sum,
+            pressure_pa_min = LEAST(t.pressure_pa_min, EXCLUDED.pressure_pa_min),
+            pressure_pa_max = GREATEST(t.pressure_pa_max, EXCLUDED.pressure_pa_max),
+            "windSpeed_n" = t."windSpeed_n" + EXCLUDED."windSpeed_n",
+            "windSpeed_sum" = t."windSpeed_sum" + EXCLUDED."windSpeed_sum",
+            "windSpeed_min" = LEAST(t."windSpeed_min", EXCLUDED."windSpeed_min"),
+            "windSpeed_max" = GREATEST(t."windSpeed_max", EXCLUDED."windSpeed_max")
+        $f$, target, width, source);
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- ============================================
+-- 4. Trigger for incremental updates
+-- ============================================
+
+-- Statement-level, so a bulk insert of N readings costs one upsert per level
+CREATE OR REPLACE FUNCTION rollup_new_sensor_logs()
+RETURNS TRIGGER AS $$
+DECLARE
+    lvl RECORD;
+BEGIN
+    FOR lvl IN SELECT * FROM sensor_rollup_levels() LOOP
+        EXECUTE sensor_rollup_sql(lvl.table_name, lvl.bucket_width, 'new_rows');
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS rollup_sensor_logs ON public.sensor_logs;
+CREATE TRIGGER rollup_sensor_logs
+    AFTER INSERT ON public.sensor_logs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION rollup_new_sensor_logs();
+
+-- ============================================
+-- 5. Function to rebuild rollups from raw data
+-- ============================================
+
+-- Recomputes every bucket touching [from_ts, to_ts) from sensor_logs. Use it to
+-- backfill, or after raw rows were updated/deleted (the trigger only sees inserts).
+CREATE OR REPLACE FUNCTION refresh_sensor_rollups(from_ts TIMESTAMPTZ, to_ts TIMESTAMPTZ DEFAULT NOW())
+RETURNS void AS $$
+DECLARE
+    lvl RECORD;
+    start_ts TIMESTAMPTZ;
+    end_ts TIMESTAMPTZ;
+BEGIN
+    IF from_ts IS NULL THEN
+        RETURN;
+    END IF;
+
+    FOR lvl IN SELECT * FROM sensor_rollup_levels() LOOP
+        -- widen to whole buckets so partially covered buckets are rebuilt completely
+        start_ts := date_bin(lvl.bucket_width, from_ts, TIMESTAMPTZ '2000-01-01 00:00:00+00');
+        end_ts := date_bin(lvl.bucket_width, to_ts, TIMESTAMPTZ '2000-01-01 00:00:00+00') + lvl.bucket_width;
+
+        EXECUTE format('DELETE FROM public.%I WHERE recorded_at >= %L AND recorded_at < %L',
+                       lvl.table_name, start_ts, end_ts);
+        EXECUTE sensor_rollup_sql(lvl.table_name, lvl.bucket_width,
+            format('(SELECT * FROM public.sensor_logs WHERE recorded_at >= %L AND recorded_at < %L)',
+                   start_ts, end_ts));
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Backfill from existing data
+SELECT refresh_sensor_rollups((SELECT MIN(recorded_at) FROM public.sensor_logs));
+
+-- ============================================
+-- 6. Row Level Security (RLS) Policies
+-- ============================================
+
+-- Rollups: Users can only view buckets from their own devices
+DO $$
+DECLARE
+    lvl RECORD;
+BEGIN
+    FOR lvl IN SELECT * FROM sensor_rollup_levels() LOOP
+        EXECUTE format('ALTER TABLE public.%I ENABLE ROW LEVEL SECURITY', lvl.table_name);
+        EXECUTE format('DROP POLICY IF EXISTS "Users can view own rollups" ON public.%I', lvl.table_name);
+        EXECUTE format($f$
+            CREATE POLICY "Users can view own rollups"
+                ON public.%I
+                FOR SELECT
+                USING (device_id IN (
+                    SELECT id FROM public.devices WHERE owner_id = auth.uid()
+                ))
+            $f$, lvl.table_name);
+    END LOOP;
+END;
+$$;
+
+-- ============================================
+-- 7. Helpful Queries
+-- ============================================
+
+-- Hourly averages with min/max for one device over the last week
+-- SELECT recorded_at, samples, temp_c, temp_c_min, temp_c_max
+-- FROM sensor_logs_1h
+-- WHERE device_id = 'device1'
+-- AND recorded_at >= NOW() - INTERVAL '7 days'
+-- ORDER BY recorded_at;
+
+-- Compare a rollup against raw data (sample counts should match)
+-- SELECT
+--     (SELECT SUM(samples) FROM sensor_logs_1d) AS rolled_up,
+--     (SELECT COUNT(*) FROM sensor_logs WHERE device_id IS NOT NULL) AS raw_rows;
+
+-- Rebuild the last two days after correcting raw rows
+-- SELECT refresh_sensor_rollups(NOW() - INTERVAL '2 days');
+
+COMMIT;
@@ -0,0 +1,404 @@
+# local history of graph readings, one directory per device and source table (raw
+# sensor_logs or a rollup). the recent days ("hot") are one flat file per column:
+# recorded_at as int64 UTC nanoseconds and every metric as float64, row-aligned and
+# memory-mapped, so slicing a window only touches the pages it covers and hands numpy
+# views straight to matplotlib, nothing is copied into pandas frames.
+# a sparse day index (first row of each UTC day) narrows a time lookup to one day's rows
+# before the binary search.
+# days older than HOT_DAYS are sealed (readings for them don't change any more) and moved
+# into compressed chunks of whole days (data/history_archive.py), about a tenth of the
+# size. a window reaching into them decodes just the chunks it overlaps.
+# writes are append-only apart from the tail: a fetched window replaces the stored rows
+# from its start onwards (rollup buckets at the end are rewritten as readings land).
+# files are never truncated, so a window that is still mapped stays valid; the row
+# count in meta.json says how much of each file is live. archiving writes the remaining
+# hot rows to a new generation of files instead.
+# example:
+#   series_store.write_frame("sensor_logs_1m", df, [device_id], start, end)
+#   arrays = series_store.window(device_id, "sensor_logs_1m", "temp_c", first, last)
+#   if arrays is not None: times, values = arrays
+# query_cache doesn't hold graph frames itself, only a StoredFrame saying which stored
+# window answers the request; its load() rebuilds the frame from here.
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QStandardPaths
+
+from data.history_archive import ArchiveError, SECOND_NS, decode_chunk, encode_chunk
+
+DAY_NS = 24 * 60 * 60 * 10 ** 9
+ALL_TIME = np.iinfo(np.int64).min  # start of a window with no lower bound
+MAX_MAPS = 64  # open memory maps kept around (each holds a file handle)
+TEXT_COLUMNS = {"device_id", "recorded_at", "rfid"}  # everything else is stored as float64
+HOT_DAYS = 2          # today and yesterday stay memory-mapped; older days get archived
+CHUNK_ROWS = 1440     # a day of minute readings; coarser sources fold several days into a chunk
+DECODED_CHUNKS = 128  # decoded (chunk, column) arrays kept for windows that scroll back and forth
+
+
+def to_ns(value):
+    """Timestamp (aware or UTC-naive) or None -> int64 UTC nanoseconds, None meaning all time"""
+    if value is None:
+        return int(ALL_TIME)
+    return int(pd.Timestamp(value).value)
+
+
+class SeriesStore:
+    """Memory-mapped column files per (device, source table) plus compressed chunks for
+    sealed days, with per-column coverage. Thread-safe: loaders write from their worker
+    threads, the dashboard reads on the GUI thread."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.metas = {}  # (device_id, source) -> meta dict
+        self.days = {}   # (device_id, source) -> (k, 2) array of [day number, first hot row]
+        self.maps = {}   # file path -> (rows, memmap)
+        self.decoded = OrderedDict()  # (chunk path, column) -> (times, values)
+
+    def directory(self, device_id, source):
+        # resolved lazily: the cache location depends on the QApplication's name
+        if self.path is None:
+            base = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+            self.path = os.path.join(base, "series")
+        return os.path.join(self.path, device_id, source)
+
+    def file_for(self, device_id, source, column, gen=0):
+        ext = ".i8" if column == "recorded_at" else ".f8"
+        name = column + (f".{gen}" if gen else "") + ext
+        return os.path.join(self.directory(device_id, source), name)
+
+    def chunk_file(self, device_id, source, first_day):
+        return os.path.join(self.directory(device_id, source), "chunks", f"{first_day}.chunk")
+
+    def meta(self, device_id, source):
+        """{"rows", "start", "end", "columns": {column: [start, end] or None}, "gen",
+        "chunks": [[first day, last day, rows], ...], "hot_start"} or None.
+        start/end is the time span whose readings are all stored; per column the part of it
+        that column was fetched for (columns are loaded lazily, so they can lag).
+        Rows before hot_start are in the chunks, the rest in generation `gen` of the files."""
+        key = (device_id, source)
+        if key not in self.metas:
+            directory = self.directory(device_id, source)
+            try:
+                with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+                    meta = json.load(f)
+                days = np.fromfile(os.path.join(directory, "days.i8"), dtype="<i8")
+                self.metas[key] = {"gen": 0, "chunks": [], "hot_start": None, **meta}
+                self.days[key] = days.reshape(-1, 2)
+            except (OSError, ValueError):
+                self.metas[key] = None
+                self.days[key] = np.empty((0, 2), dtype="<i8")
+        return self.metas[key]
+
+    # ---------- writing ----------
+
+    def write_frame(self, source, df, device_ids, start, end):
+        """Store a fetched graph frame: it holds every reading of `device_ids` from `start`
+        (None = all time) to `end` for the metric columns it has"""
+        if "recorded_at" not in df.columns and not df.empty:
+            return
+        start, end = to_ns(start), to_ns(end)
+        columns = [c for c in df.columns if c not in TEXT_COLUMNS]
+        groups = dict(tuple(df.groupby("device_id", sort=False))) if not df.empty else {}
+        with self.lock:
+            for device_id in device_ids:
+                rows = groups.get(device_id, df.iloc[:0])
+                try:
+                    self.write_device(device_id, source, rows, columns, start, end)
+                except (OSError, ArchiveError) as e:
+                    print(f"⚠️  Could not store history for {device_id}: {e}")
+                    self.metas.pop((device_id, source), None)  # re-read what's on disk
+
+    def write_device(self, device_id, source, df, columns, start, end):
+        meta = self.meta(device_id, source)
+        times = df["recorded_at"].dt.tz_convert(None).to_numpy("datetime64[ns]").view("<i8") \
+            if len(df) else np.empty(0, dtype="<i8")
+        take = np.arange(len(times))
+        if len(times) > 1 and (np.diff(times) < 0).any():
+            take = np.argsort(times, kind="stable")
+        if len(times):
+            end = max(end, int(times[take[-1]]))  # a node clock running ahead shouldn't leave rows uncovered
+
+        if meta is None or start <= meta["start"] or start > meta["end"]:
+            # nothing stored, this window covers all of it, or there'd be a gap: start over
+            if meta is not None:
+                self.drop_chunks(device_id, source, meta)
+            cut = 0
+            meta = {"rows": 0, "start": start, "end": end, "columns": {},
+                    "gen": meta["gen"] if meta else 0, "chunks": [], "hot_start": None}
+        else:
+            meta = {**meta, "end": end, "columns": dict(meta["columns"]), "chunks": list(meta["chunks"])}
+            if meta["hot_start"] is not None and start < meta["hot_start"]:
+                # sealed days are archived already and can't have changed: keep those
+                take = take[times[take] >= meta["hot_start"]]
+                start = meta["hot_start"]
+            cut = self.bound(device_id, source, meta, start, "left")
+        times = times[take]
+
+        gen = meta["gen"]
+        os.makedirs(self.directory(device_id, source), exist_ok=True)
+        self.write_column(self.file_for(device_id, source, "recorded_at", gen), cut, times)
+
+        for column in set(meta["columns"]) | set(columns):
+            coverage = meta["columns"].get(column)
+            path = self.file_for(device_id, source, column, gen)
+            if column in columns:
+                values = pd.to_numeric(df[column], errors="coerce").to_numpy("float64", na_value=np.nan)[take]
+                if column not in meta["columns"] and cut:
+                    values = np.concatenate([np.full(cut, np.nan), values])  # new file: pad to line up
+                    self.write_column(path, 0, values)
+                else:
+                    self.write_column(path, cut, values)
+                # still contiguous with what this column had: extend it, otherwise it starts here
+                contiguous = coverage is not None and coverage[0] <= start <= coverage[1]
+                meta["columns"][column] = [coverage[0] if contiguous else start, end]
+            else:
+                # not fetched this time: keep the rows lined up, its coverage stops here
+                self.write_column(path, cut, np.full(len(times), np.nan))
+                if coverage is not None:
+                    stop = min(coverage[1], start)
+                    meta["columns"][column] = [coverage[0], stop] if coverage[0] < stop else None
+
+        meta["rows"] = cut + len(times)
+        self.save_days(device_id, source, self.extend_days(self.days[(device_id, source)], cut, times))
+        self.archive(device_id, source, meta)
+        self.save_meta(device_id, source, meta)
+        if meta["gen"] != gen:
+            self.remove_generation(device_id, source, meta, gen)
+
+    @staticmethod
+    def write_column(path, row, values):
+        """Overwrite a column file from `row` on (no truncation: mapped views stay valid)"""
+        mode = "r+b" if os.path.exists(path) else "wb"
+        with open(path, mode) as f:
+            f.seek(row * 8)
+            f.write(np.ascontiguousarray(values, dtype="<i8" if values.dtype.kind in "iu" else "<f8").tobytes())
+
+    @staticmethod
+    def extend_days(days, cut, times):
+        """Keep day entries before `cut` and add one for each day that starts in `times`"""
+        days = days[days[:, 1] < cut]
+        if len(times):
+            day_numbers = times // DAY_NS
+            starts = np.flatnonzero(np.diff(day_numbers, prepend=day_numbers[0] - 1))
+            if len(days) and days[-1, 0] == day_numbers[0]:
+                starts = starts[1:]  # the cut was mid-day: that day already has its entry
+            new = np.column_stack([day_numbers[starts], starts + cut]).astype("<i8")
+            days = np.concatenate([days, new])
+        return days
+
+    def save_days(self, device_id, source, days):
+        days.tofile(os.path.join(self.directory(device_id, source), "days.i8"))
+        self.days[(device_id, source)] = days
+
+    def save_meta(self, device_id, source, meta):
+        path = os.path.join(self.directory(device_id, source), "meta.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+        self.metas[(device_id, source)] = meta
+
+    # ---------- archiving ----------
+
+    def archive(self, device_id, source, meta):
+        """Move sealed days out of the hot files into compressed chunks of at least
+        CHUNK_ROWS rows (whole days each), then start a new generation of hot files with
+        what is left. Updates meta in place; the caller saves it."""
+        days = self.days[(device_id, source)]
+        sealed = days[days[:, 0] <= meta["end"] // DAY_NS - HOT_DAYS]
+        ends = np.append(days[1:, 1], meta["rows"])  # row after each day's last one
+
+        groups, first = [], 0
+        for i in range(len(sealed)):
+            if ends[i] - sealed[first, 1] >= CHUNK_ROWS:
+                groups.append((first, i))
+                first = i + 1
+        if not groups:
+            return
+
+        gen, rows = meta["gen"], meta["rows"]
+        times = self.column(device_id, source, "recorded_at", rows, gen)
+        names = [c for c, coverage in meta["columns"].items() if coverage is not None]
+        values = {c: self.column(device_id, source, c, rows, gen) for c in names}
+        os.makedirs(os.path.join(self.directory(device_id, source), "chunks"), exist_ok=True)
+        for a, b in groups:
+            lo, hi = int(sealed[a, 1]), int(ends[b])
+            path = self.chunk_file(device_id, source, int(sealed[a, 0]))
+            with open(path + ".tmp", "wb") as f:
+                f.write(encode_chunk(times[lo:hi], {c: values[c][lo:hi] for c in names}))
+            os.replace(path + ".tmp", path)
+            meta["chunks"].append([int(sealed[a, 0]), int(sealed[b, 0]), hi - lo])
+            self.forget_decoded(path)
+
+        # what's left goes to fresh files, so maps of the old ones stay valid
+        moved, last = int(ends[groups[-1][1]]), groups[-1][1]
+        self.write_column(self.file_for(device_id, source, "recorded_at", gen + 1), 0, times[moved:])
+        for c in meta["columns"]:
+            column = self.column(device_id, source, c, rows, gen)
+            self.write_column(self.file_for(device_id, source, c, gen + 1), 0, column[moved:])
+        rest = days[last + 1:].copy()
+        rest[:, 1] -= moved
+        self.save_days(device_id, source, rest)
+        meta.update(rows=rows - moved, gen=gen + 1, hot_start=(int(sealed[last, 0]) + 1) * DAY_NS)
+        print(f"🗜️  Archived {moved} rows of {device_id} ({source}) into {len(groups)} chunk(s)")
+
+    def remove_generation(self, device_id, source, meta, gen):
+        """Delete superseded hot files (best effort: one that is still mapped may refuse)"""
+        for c in ["recorded_at", *meta["columns"]]:
+            path = self.file_for(device_id, source, c, gen)
+            self.maps.pop(path, None)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def drop_chunks(self, device_id, source, meta):
+        for first_day, _, _ in meta["chunks"]:
+            path = self.chunk_file(device_id, source, first_day)
+            self.forget_decoded(path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def forget_decoded(self, path):
+        for key in [k for k in self.decoded if k[0] == path]:
+            del self.decoded[key]
+
+    # ---------- reading ----------
+
+    def column(self, device_id, source, name, rows, gen):
+        """First `rows` values of a hot column file, memory-mapped (read-only)"""
+        path = self.file_for(device_id, source, name, gen)
+        cached = self.maps.get(path)
+        if cached is None or cached[0] != rows:
+            dtype = "<i8" if name == "recorded_at" else "<f8"
+            if len(self.maps) >= MAX_MAPS:
+                self.maps.clear()  # views already handed out keep their own maps alive
+            array = np.memmap(path, dtype=dtype, mode="r", shape=(rows,)) if rows else np.empty(0, dtype)
+            cached = self.maps[path] = (rows, array)
+        return cached[1]
+
+    def chunk(self, device_id, source, first_day, name):
+        """(times, values) of one archived chunk, decoded on first use"""
+        path = self.chunk_file(device_id, source, first_day)
+        key = (path, name)
+        if key in self.decoded:
+            self.decoded.move_to_end(key)
+            return self.decoded[key]
+        with open(path, "rb") as f:
+            times, columns = decode_chunk(f.read(), [name])
+        self.decoded[key] = (times, columns[name])
+        if len(self.decoded) > DECODED_CHUNKS:
+            self.decoded.popitem(last=False)
+        return self.decoded[key]
+
+    def bound(self, device_id, source, meta, t, side):
+        """Hot row where time t goes: the day index finds t's day, then a binary search in it"""
+        days = self.days[(device_id, source)]
+        rows = meta["rows"]
+        day = t // DAY_NS
+        i = int(np.searchsorted(days[:, 0], day, "left"))
+        lo = int(days[i, 1]) if i < len(days) else rows
+        if i == len(days) or days[i, 0] != day:
+            return lo  # no readings that day: everything before it is earlier
+        hi = int(days[i + 1, 1]) if i + 1 < len(days) else rows
+        times = self.column(device_id, source, "recorded_at", rows, meta["gen"])
+        return lo + int(np.searchsorted(times[lo:hi], t, side))
+
+    def window(self, device_id, source, column, first, last):
+        """(times, values) for first <= recorded_at <= last: times as UTC-naive
+        datetime64[ns], values as float64. Zero-copy views when the window is all in the
+        hot files; archived days are decoded and joined on. None unless every reading of
+        that column in the window is stored."""
+        first, last = to_ns(first), to_ns(last)
+        with self.lock:
+            meta = self.meta(device_id, source)
+            coverage = meta and meta["columns"].get(column)
+            if not coverage or coverage[0] > first or coverage[1] < last:
+                return None
+            try:
+                parts = []
+                if meta["hot_start"] is not None and first < meta["hot_start"]:
+                    floor = first // SECOND_NS * SECOND_NS  # archived timestamps are whole seconds
+                    for first_day, last_day, _ in meta["chunks"]:
+                        if (last_day + 1) * DAY_NS <= floor or first_day * DAY_NS > last:
+                            continue
+                        times, values = self.chunk(device_id, source, first_day, column)
+                        lo = np.searchsorted(times, floor, "left")
+                        hi = np.searchsorted(times, last, "right")
+                        parts.append((times[lo:hi], values[lo:hi]))
+                lo = self.bound(device_id, source, meta, first, "left")
+                hi = self.bound(device_id, source, meta, last, "right")
+                times = self.column(device_id, source, "recorded_at", meta["rows"], meta["gen"])
+                values = self.column(device_id, source, column, meta["rows"], meta["gen"])
+            except (OSError, ValueError, ArchiveError) as e:
+                print(f"⚠️  Stored history unreadable for {device_id}: {e}")
+                return None
+        if not parts:
+            return times[lo:hi].view("datetime64[ns]"), values[lo:hi]
+        parts.append((times[lo:hi], values[lo:hi]))
+        return (np.concatenate([t for t, _ in parts]).view("datetime64[ns]"),
+                np.concatenate([v for _, v in parts]))
+
+    def frame(self, device_ids, source, columns, first, last):
+        """Graph frame (device_id, recorded_at as UTC, then `columns`) of every stored
+        reading of `device_ids` from first to last, sorted by time. None unless the store
+        has all of it."""
+        parts = []
+        for device_id in device_ids:
+            data = {}
+            for column in columns:
+                arrays = self.window(device_id, source, column, first, last)
+                if arrays is None:
+                    return None
+                data.setdefault("recorded_at", arrays[0])
+                data[column] = arrays[1]
+            part = pd.DataFrame(data)  # copies out of the maps
+            part.insert(0, "device_id", device_id)
+            parts.append(part)
+        if not parts:
+            return None
+        df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        df["recorded_at"] = df["recorded_at"].dt.tz_localize("UTC")
+        return df.sort_values("recorded_at", kind="stable", ignore_index=True)
+
+
+class StoredFrame:
+    """What query_cache keeps for a graph request: where the frame's rows are in the
+    series store, plus its newest rfid (text, which the store doesn't keep)"""
+
+    def __init__(self, source, df, device_ids, first, last):
+        self.source = source
+        self.device_ids = list(device_ids)
+        self.columns = [c for c in df.columns if c not in TEXT_COLUMNS]
+        self.first, self.last = to_ns(first), to_ns(last)
+        self.rfid = None  # (device_id, recorded_at ns, rfid) of the newest tagged row
+        rfids = df.dropna(subset=["rfid"]) if "rfid" in df.columns else df.iloc[:0]
+        if not rfids.empty:
+            row = rfids.iloc[-1]
+            self.rfid = row["device_id"], to_ns(row["recorded_at"]), row["rfid"]
+
+    def load(self):
+        """The frame back from the store, or None if the store no longer has it all"""
+        df = series_store.frame(self.device_ids, self.source, self.columns, self.first, self.last)
+        if df is None:
+            return None
+        df["rfid"] = None
+        if self.rfid is not None:
+            device_id, at, rfid = self.rfid
+            # archived times are whole seconds: the tagged row is the last one not after it
+            rows = np.flatnonzero((df["device_id"] == device_id).to_numpy()
+                                  & (df["recorded_at"].to_numpy("datetime64[ns]").view("i8") <= at))
+            if len(rows):
+                df.loc[rows[-1], "rfid"] = rfid
+        df.attrs["source"] = self.source
+        return df
+
+
+# the one store every loader writes to and the dashboard plots from
+series_store = SeriesStore()
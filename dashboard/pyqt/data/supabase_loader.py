@@ -1,42 +1,466 @@
 # this handles all the data fetching from supa base to keep the UI responsive
 # this runs all the queries in a separate thread in the background, so the UI
 # keeps active in the foreground (what the users see)
+import time
+
 import pandas as pd
 from PyQt5.QtCore import QThread, pyqtSignal
 from supabase import create_client
 
 from config import SUPABASE_URL, SUPABASE_KEY, SUPABASE_TABLE
+from data.running_stats import STAT_COLUMNS
+from data.wire_format import CSV_MIN_ROWS, fetch_frame
+from data.series_store import StoredFrame, series_store
+from data.query_cache import query_cache, cache_key, cadence_ttl
+from data.offline import connectivity, is_offline_error
+
+# rollup tables from sensor_rollups_migration.sql, coarsest first: (table, bucket size in hours)
+# bucket averages come back under the raw column names, so plotting code works unchanged
+ROLLUP_TABLES = [
+    ("sensor_logs_1d", 24),
+    ("sensor_logs_1h", 1),
+    ("sensor_logs_15m", 0.25),
+    ("sensor_logs_1m", 1 / 60),
+]
+ROLLUP_COLUMNS = "device_id, recorded_at, samples, temp_c, humidity, pressure_pa, windSpeed, battery, rfid"
+ALL_TIME_ROLLUP = "sensor_logs_1h"
+MIN_GRAPH_POINTS = 200  # fewer buckets than this and the graph looks blocky
+READING_INTERVAL = 64  # seconds between readings of one device: sleep_Time 60 s plus wake time
+MIN_STAT_BUCKETS = 24  # stat card averages from buckets; enough that partial edge buckets barely matter
+
+# with `columns` set, graph queries only select these plus the metrics asked for
+BASE_COLUMNS = "device_id, recorded_at, rfid"
+
+# newest reading per device, kept by a trigger (device_latest_migration.sql)
+LATEST_TABLE = "device_latest"
+
+
+def expected_rows(hours, table):
+    """Rows per device `table` has for `hours`: one per bucket, or one per reading when a
+    bucket is narrower than the reading interval (raw rows are one per reading)"""
+    bucket_seconds = dict(ROLLUP_TABLES).get(table, 0) * 3600
+    return hours * 3600 / max(bucket_seconds, READING_INTERVAL)
+
+
+def fetch_latest(supabase, device_ids):
+    """Newest reading for each device in one primary-key query: {device_id: row}.
+    Returns an empty dict when device_latest doesn't exist yet."""
+    if not device_ids:
+        return {}
+    try:
+        response = supabase.table(LATEST_TABLE).select("*").in_("device_id", list(device_ids)).execute()
+    except Exception as e:
+        if is_offline_error(e):
+            raise
+        print(f"⚠️  {LATEST_TABLE} unavailable: {e}")
+        return {}
+    return {row["device_id"]: row for row in response.data or []}
 
 # create a supabase loader instance
 class SupabaseDataLoader(QThread):
 
     #signals being emitted by thread
     dataFetched = pyqtSignal(pd.DataFrame)
+    deltaFetched = pyqtSignal(pd.DataFrame) #only the rows newer than `since`
     averagesFetched = pyqtSignal(dict)
     devicesFetched = pyqtSignal(list)
+    latestFetched = pyqtSignal(dict) #{device_id: newest reading}
+    probeFetched = pyqtSignal(dict) #{"newest": recorded_at, "count": readings since `since`}
     errorOccurred = pyqtSignal(str) #emits the error message string
+    offlineData = pyqtSignal(float) #supabase unreachable, served the last known copy (fetched at this time.time(), 0 if nothing new)
 
     #different fetch modes for what we're fetching to display in the UI
     # example: loader = SupabaseDataLoader(SupabaseDataLoader.FETCH_MODE_GRAPH)
     FETCH_MODE_GRAPH = 1
     FETCH_MODE_AVERAGES = 2
     FETCH_MODE_DEVICES = 3
+    FETCH_MODE_LATEST = 4
+    FETCH_MODE_PROBE = 5
 
     # this is the constructor. basically initializes the class
-    def __init__(self, mode, device_id=None, user_session=None, time_range_hours=None, parent=None):
+    def __init__(self, mode, device_id=None, user_session=None, time_range_hours=None, since=None,
+                 columns=None, devices=None, parent=None):
         super().__init__(parent) #parent constructor is always called first
         self.mode = mode
         self.device_id = device_id
         self.user_session = user_session
         self.time_range_hours = time_range_hours  # Filter by time range (in hours)
+        self.since = since  # graph mode: newest recorded_at already loaded, fetch only what came after
+        self.columns = columns  # metric columns to fetch (e.g. ["temp_c"]); None means all of them
+        self.devices = devices  # probe mode: the device ids to check
+
+    def projection(self, table):
+        """select() string for graph queries on table. Rollups add <column>_min/_max for the
+        stat card columns, so the cards show the real extremes, not the extreme bucket averages"""
+        if table == SUPABASE_TABLE:
+            return ", ".join([BASE_COLUMNS if self.columns else "*"] + list(self.columns or []))
+        base = BASE_COLUMNS + ", samples" if self.columns else ROLLUP_COLUMNS
+        stat_columns = [c for c in (self.columns or STAT_COLUMNS.values()) if c in STAT_COLUMNS.values()]
+        return ", ".join([base] + list(self.columns or []) + [f"{c}_min, {c}_max" for c in stat_columns])
+
+    def result_key(self):
+        """query_cache key for what this loader fetches"""
+        devices = self.devices if self.devices is not None else [self.device_id] if self.device_id else None
+        return cache_key(self.user_session, devices, self.mode, self.time_range_hours, self.columns)
+
+    def result_ttl(self, table):
+        """Cache results from table for one bucket of it (one sensor cadence for raw rows)"""
+        bucket_hours = dict(ROLLUP_TABLES).get(table)
+        return cadence_ttl(bucket_hours * 3600) if bucket_hours else cadence_ttl()
+
+    # answers graph and averages requests from query_cache. True when it did
+    def emit_cached(self):
+        if self.mode == self.FETCH_MODE_GRAPH and self.since is None:
+            signal = self.dataFetched
+        elif self.mode == self.FETCH_MODE_AVERAGES:
+            signal = self.averagesFetched
+        else:
+            return False
+        cached = self.resolve(query_cache.get(self.result_key()))
+        if cached is None:
+            return False
+        print(f"⚡ Cached result for device: {self.device_id or self.devices or 'All'}")
+        signal.emit(cached)
+        return True
+
+    # supabase unreachable: answer with the last known copy of the same request instead.
+    # True when it did
+    def emit_offline(self):
+        if self.mode == self.FETCH_MODE_GRAPH and self.since is not None:
+            self.offlineData.emit(0.0)  # nothing new can arrive; the loaded frame stays
+            return True
+        signal = {
+            self.FETCH_MODE_GRAPH: self.dataFetched,
+            self.FETCH_MODE_AVERAGES: self.averagesFetched,
+            self.FETCH_MODE_DEVICES: self.devicesFetched,
+            self.FETCH_MODE_LATEST: self.latestFetched,
+        }.get(self.mode)
+        stale = query_cache.get_stale(self.result_key()) if signal is not None else None
+        value = self.resolve(stale[0]) if stale is not None else None
+        if value is None:
+            return False
+        stored_at = stale[1]
+        print(f"📴 Offline: showing data saved {time.strftime('%H:%M', time.localtime(stored_at))}")
+        signal.emit(value)
+        self.offlineData.emit(stored_at)
+        return True
+
+    @staticmethod
+    def resolve(cached):
+        """A query_cache value as emitted: graph frames are read back from the series store"""
+        return cached.load() if isinstance(cached, StoredFrame) else cached
+
+    def device_ids(self, supabase):
+        """Devices to filter on: the ones given, the selected one, or every device the user owns"""
+        if self.devices is not None:
+            return list(self.devices)
+        if self.device_id:
+            return [self.device_id]
+        if self.user_session and self.user_session.user:
+            user_devices = supabase.table("devices") \
+                .select("id") \
+                .eq("owner_id", self.user_session.user.id) \
+                .execute()
+            return [d["id"] for d in user_devices.data or []]
+        return None
+
+    def graph_source(self):
+        """Pick the coarsest rollup table that still gives MIN_GRAPH_POINTS rows per device
+        for the selected time range. A bucket no wider than READING_INTERVAL holds about one
+        reading, so below that the raw rows are read instead. Returns (table, columns)."""
+        if not self.time_range_hours:
+            return ALL_TIME_ROLLUP, self.projection(ALL_TIME_ROLLUP)
+        for table, bucket_hours in ROLLUP_TABLES:
+            if bucket_hours * 3600 > READING_INTERVAL and \
+                    expected_rows(self.time_range_hours, table) >= MIN_GRAPH_POINTS:
+                return table, self.projection(table)
+        return SUPABASE_TABLE, self.projection(SUPABASE_TABLE)
+
+    def bulk(self, table, device_count):
+        """Whether a graph query on table is big enough to fetch as CSV instead of JSON"""
+        if not self.time_range_hours:
+            return True  # all-time
+        return expected_rows(self.time_range_hours, table) * device_count >= CSV_MIN_ROWS
+
+    # newest recorded_at for the selected device(s), or None if they have no data at all
+    # reads device_latest (one row per device) and only scans `table` if that migration isn't applied
+    def most_recent_time(self, supabase, table):
+        device_ids = self.device_ids(supabase)
+        for source in (LATEST_TABLE, table):
+            query = supabase.table(source).select("recorded_at")
+            if device_ids is not None:
+                query = query.in_("device_id", device_ids)
+            try:
+                response = query.order("recorded_at", desc=True).limit(1).execute()
+            except Exception as e:
+                if source == table:
+                    raise
+                print(f"⚠️  {LATEST_TABLE} unavailable ({e}), scanning {table}")
+                continue
+            return response.data[0]["recorded_at"] if response.data else None
+
+    # probe mode: newest recorded_at plus how many readings are at or after `since`, so an
+    # auto-refresh can tell whether anything changed without fetching the data itself.
+    # the count catches late readings (e.g. from the relay's spool) older than the newest one
+    def fetch_probe(self, supabase):
+        probe = {"newest": self.most_recent_time(supabase, SUPABASE_TABLE), "count": None}
+        if self.since is not None:
+            query = supabase.table(SUPABASE_TABLE).select("id", count="exact", head=True)
+            device_ids = self.device_ids(supabase)
+            if device_ids is not None:
+                query = query.in_("device_id", device_ids)
+            probe["count"] = query.gte("recorded_at", pd.Timestamp(self.since).isoformat()).execute().count
+        self.probeFetched.emit(probe)
+
+    def average_columns(self):
+        return ", ".join(["recorded_at, rfid"] + list(self.columns)) if self.columns else "*"
+
+    # averages mode with `columns`: mean/min/max from the rollup sums and counts,
+    # a handful of bucket rows instead of every raw reading in the window
+    def fetch_bucket_averages(self, supabase):
+        if self.time_range_hours:
+            table = next((t for t, hours in ROLLUP_TABLES if self.time_range_hours / hours >= MIN_STAT_BUCKETS),
+                         ROLLUP_TABLES[-1][0])
+        else:
+            table = ROLLUP_TABLES[0][0]
+        select = ", ".join(["recorded_at"] + [f"{c}_sum, {c}_n, {c}_min, {c}_max" for c in self.columns])
+
+        def buckets(cutoff):
+            query = supabase.table(table).select(select)
+            device_ids = self.device_ids(supabase)
+            if device_ids is not None:
+                query = query.in_("device_id", device_ids)
+            if cutoff is not None:
+                query = query.gte("recorded_at", cutoff.isoformat())
+            return pd.DataFrame(query.execute().data or [])
+
+        cutoff = None
+        if self.time_range_hours:
+            cutoff = pd.Timestamp.now(tz="UTC") - pd.Timedelta(hours=self.time_range_hours)
+        df = buckets(cutoff)
+        if df.empty and cutoff is not None:
+            # same fallback as the graph: the most recent window that has data
+            most_recent_str = self.most_recent_time(supabase, SUPABASE_TABLE)
+            if most_recent_str:
+                df = buckets(pd.to_datetime(most_recent_str, utc=True) - pd.Timedelta(hours=self.time_range_hours))
+
+        averages = {}
+        for key, col in STAT_COLUMNS.items():
+            if col not in self.columns:
+                continue
+            n = df[f"{col}_n"].sum() if not df.empty else 0
+            averages[key] = df[f"{col}_sum"].sum() / n if n else None
+            averages[f"{key}_min"] = df[f"{col}_min"].min() if n else None
+            averages[f"{key}_max"] = df[f"{col}_max"].max() if n else None
+        if not df.empty:
+            query_cache.put(self.result_key(), averages, self.result_ttl(table))
+        self.averagesFetched.emit(averages)
+
+    # graph mode with `since`: emits deltaFetched with the raw rows recorded after it
+    def fetch_delta(self, supabase, columns):
+        fetched_at = pd.Timestamp.now(tz="UTC")
+        query = supabase.table(SUPABASE_TABLE).select(columns)
+        device_ids = self.device_ids(supabase)
+        if device_ids is not None:
+            query = query.in_("device_id", device_ids)
+
+        response = query.gt("recorded_at", pd.Timestamp(self.since).isoformat()) \
+            .order("recorded_at", desc=False) \
+            .execute()
+
+        df = pd.DataFrame(response.data or [])
+        if "recorded_at" in df.columns:
+            df["recorded_at"] = pd.to_datetime(df["recorded_at"], utc=True)
+        print(f"📈 {len(df)} new rows since {self.since}")
+        df.attrs["source"] = SUPABASE_TABLE
+        if device_ids is not None:
+            # rows at exactly `since` are already stored; everything after it is in df
+            start = pd.Timestamp(self.since) + pd.Timedelta(1, "ns")
+            series_store.write_frame(SUPABASE_TABLE, df, device_ids, start, fetched_at)
+        self.deltaFetched.emit(df)
+
+    # graph mode: emits dataFetched with one row per reading (or per bucket for rollups)
+    def fetch_graph(self, supabase, table, columns):
+        #querying the database
+        query = supabase.table(table).select(columns)
+        # ^ this is the format of the query. will select one table and the given columns
+
+        device_count = 1
+        device_ids = []
+        fetched_at = pd.Timestamp.now(tz="UTC")
+
+        # filtering by device selected on graph
+        if self.device_id:
+            # security check
+            if self.user_session and self.user_session.user:
+                user_id = self.user_session.user.id
+                #verifying ownership again with a query
+                #SQL equivalent: SELECT id FROM devices WHERE id = 'device_id' AND owner_id = 'user_id'
+                device_check = supabase.table("devices") \
+                    .select("id") \
+                    .eq("id", self.device_id) \
+                    .eq("owner_id", user_id) \
+                    .execute()
+
+                #if they do not have access or the device foes not exist, then exit
+                if not device_check.data:
+                    self.errorOccurred.emit("Access denied: Device does not belong to you")
+                    return
+
+            # now that ownership is verified, filter to this device
+            query = query.eq("device_id", self.device_id)
+            device_ids = [self.device_id]
+
+            # "All my Devices" is selected on the graph
+        else:
+            if self.user_session and self.user_session.user:
+                user_id = self.user_session.user.id
+
+                # a query to get the list of ALL devices owned by the user
+                # SQL: SELECT id FROM devices WHERE owner_id = 'user_id'
+                user_devices = supabase.table("devices") \
+                    .select("id") \
+                    .eq("owner_id", user_id) \
+                    .execute()
+
+                # case if user has no devices at all
+                if not user_devices.data:
+                    self.errorOccurred.emit("No devices found for this user")
+                    return
+
+                # this extracts the device IDs into a list of strings
+                device_ids = [d["id"] for d in user_devices.data]
+                device_count = len(device_ids)
+
+                # filter query to only get data from these devices IDs
+                # SQL: SELECT * FROM sensor_logs WHERE device_id IN ('device1', 'device2', ...)
+                query = query.in_("device_id", device_ids)
+
+        # IMPROVED TIME FILTERING LOGIC
+        # Two-step filtering: Data will always be the most recently recorded, even if it is old data
+        # Data displayed on the graph will
+        # add warning if data is fall back
+        # big windows come back as CSV (typed columns) instead of JSON dicts
+        bulk = self.bulk(table, device_count)
+        if self.time_range_hours:
+            from datetime import datetime, timedelta, timezone
+
+            #calculating cut off time by subtraction
+            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=self.time_range_hours)
+            cutoff_str = cutoff_time.isoformat()
+
+            # Build query with time filter
+            # gte = "greater than or equal"
+            # gets all sensor data past a specified time
+            time_filtered_query = query.gte("recorded_at", cutoff_str).order("recorded_at", desc=False)
+            df = fetch_frame(time_filtered_query, bulk)
+            stored_range = (cutoff_time, fetched_at)  # df holds every reading in it
+
+            # Step 2: fallback to last recorded data in the timeframe
+            if df.empty:
+                # add warning here
+
+                print(f"\n⚠️  No data in the last {self.time_range_hours} hours")
+                print(f"   Falling back to: Most recent {self.time_range_hours} hours of available data")
+
+                # newest timestamp for the same device filter, from device_latest when available
+                most_recent_str = self.most_recent_time(supabase, table)
+
+                if not most_recent_str:
+                    print(f"   ❌ No data found at all for this device/user")
+                    self.dataFetched.emit(pd.DataFrame())
+                    return
+
+                # Get the most recent timestamp
+                most_recent = pd.to_datetime(most_recent_str, utc=True)
+
+                # Calculate new cutoff: most_recent - time_range_hours
+                new_cutoff = most_recent - timedelta(hours=self.time_range_hours)
+                new_cutoff_str = new_cutoff.isoformat()
+
+                print(f"   📊 Most recent data: {most_recent_str}")
+                print(f"   📊 Showing data from: {new_cutoff_str} to {most_recent_str}")
+                print(f"   📊 (This is the most recent {self.time_range_hours} hours of available data)\n")
+                stored_range = None  # an older window, not contiguous with the present: don't store it
+
+                # Rebuild the full query with new cutoff
+                fallback_query = supabase.table(table).select(columns)
+
+                # Apply same device filtering
+                if self.device_id:
+                    fallback_query = fallback_query.eq("device_id", self.device_id)
+                else:
+                    if self.user_session and self.user_session.user:
+                        user_id = self.user_session.user.id
+                        user_devices_data = supabase.table("devices") \
+                            .select("id") \
+                            .eq("owner_id", user_id) \
+                            .execute()
+                        if user_devices_data.data:
+                            device_ids = [d["id"] for d in user_devices_data.data]
+                            fallback_query = fallback_query.in_("device_id", device_ids)
+
+                # Apply time filter and order
+                fallback_query = fallback_query.gte("recorded_at", new_cutoff_str).order("recorded_at",
+                                                                                         desc=False)
+                df = fetch_frame(fallback_query, bulk)
+
+                if df.empty:
+                    print(f"   ❌ Still no data found (this shouldn't happen)")
+                    self.dataFetched.emit(pd.DataFrame())
+                    return
+            else:
+                print(
+                    f"✅ Found {len(df)} rows in last {self.time_range_hours} hours (current time window)")
+
+        else:
+            # No time filter - get all data
+            query = query.order("recorded_at", desc=False)
+            df = fetch_frame(query, bulk)
+            stored_range = (None, fetched_at)
+
+            if df.empty:
+                print(f"No data found")
+                self.dataFetched.emit(pd.DataFrame())
+                return
+
+        # JSON rows come back as a list of dictionaries that pd.DataFrame turned into a table;
+        # CSV is already typed, so the conversion below is a no-op for it
+        # convert the recorded_at strings to datetime obejcts
+        if "recorded_at" in df.columns:
+            df["recorded_at"] = pd.to_datetime(df["recorded_at"], utc=True)
+
+        print(f"📈 Returning {len(df)} rows to display")
+        if len(df) > 0:
+            min_time = df["recorded_at"].min()
+            max_time = df["recorded_at"].max()
+            print(f"   Time range: {min_time} to {max_time}")
+
+        # keep the history locally (memory-mapped per device) for the plots to slice from.
+        # the store is the one copy of it: query_cache only remembers where this window is
+        df.attrs["source"] = table
+        if stored_range is not None and device_ids:
+            series_store.write_frame(table, df, device_ids, *stored_range)
+            query_cache.put(self.result_key(), StoredFrame(table, df, device_ids, *stored_range),
+                            self.result_ttl(table))
+
+        # emitting the signal with the dataframe safely passes it to the main thread
+        # now we can connect any slot function to the signal in the UI file
+        self.dataFetched.emit(df)
 
     # this runs in the background of the UI. all data is fetched here
     # when complete, it will emit a signal with the data
     # do not touch UI elements from this thread
     # try to handle ALL exceptions
     def run(self):
+        cached = failed = False
         # try/except wrapper catches all the errors
         try:
+            # same request answered recently (by any tab): no round-trip at all
+            cached = self.emit_cached()
+            if cached:
+                return
+
             # creating a new client each time for thread safety
             supabase = create_client(SUPABASE_URL, SUPABASE_KEY) #handles communication between app and supabase
 
@@ -48,181 +472,34 @@ class SupabaseDataLoader(QThread):
                 )
             ##### MODE 1 #####
             if self.mode == self.FETCH_MODE_GRAPH:
-                #querying the database
-                query = supabase.table(SUPABASE_TABLE).select("*")
-                # ^ this is the format of the query. will select one table and all columns
-
-                # filtering by device selected on graph
-                if self.device_id:
-                    # security check
-                    if self.user_session and self.user_session.user:
-                        user_id = self.user_session.user.id
-                        #verifying ownership again with a query
-                        #SQL equivalent: SELECT id FROM devices WHERE id = 'device_id' AND owner_id = 'user_id'
-                        device_check = supabase.table("devices") \
-                            .select("id") \
-                            .eq("id", self.device_id) \
-                            .eq("owner_id", user_id) \
-                            .execute()
-
-                        #if they do not have access or the device foes not exist, then exit
-                        if not device_check.data:
-                            self.errorOccurred.emit("Access denied: Device does not belong to you")
-                            return
-
-                    # now that ownership is verified, filter to this device
-                    query = query.eq("device_id", self.device_id)
-
-                    # "All my Devices" is selected on the graph
-                else:
-                    if self.user_session and self.user_session.user:
-                        user_id = self.user_session.user.id
-
-                        # a query to get the list of ALL devices owned by the user
-                        # SQL: SELECT id FROM devices WHERE owner_id = 'user_id'
-                        user_devices = supabase.table("devices") \
-                            .select("id") \
-                            .eq("owner_id", user_id) \
-                            .execute()
-
-                        # case if user has no devices at all
-                        if not user_devices.data:
-                            self.errorOccurred.emit("No devices found for this user")
-                            return
-
-                        # this extracts the device IDs into a list of strings
-                        device_ids = [d["id"] for d in user_devices.data]
-
-                        # filter query to only get data from these devices IDs
-                        # SQL: SELECT * FROM sensor_logs WHERE device_id IN ('device1', 'device2', ...)
-                        query = query.in_("device_id", device_ids)
-
-                # IMPROVED TIME FILTERING LOGIC
-                # Two-step filtering: Data will always be the most recently recorded, even if it is old data
-                # Data displayed on the graph will
-                # add warning if data is fall back
-                if self.time_range_hours:
-                    from datetime import datetime, timedelta, timezone
-
-                    #calculating cut off time by subtraction
-                    cutoff_time = datetime.now(timezone.utc) - timedelta(hours=self.time_range_hours)
-                    cutoff_str = cutoff_time.isoformat()
-
-                    # Build query with time filter
-                    # gte = "greater than or equal"
-                    # gets all sensor data past a specified time
-                    time_filtered_query = query.gte("recorded_at", cutoff_str).order("recorded_at", desc=False)
-                    response = time_filtered_query.execute()
-
-                    # Step 2: fallback to last recorded data in the timeframe
-                    if not response.data or len(response.data) == 0:
-                        # add warning here
-
-                        print(f"\n⚠️  No data in the last {self.time_range_hours} hours")
-                        print(f"   Falling back to: Most recent {self.time_range_hours} hours of available data")
-
-                        # Rebuild query to get most recent timestamp
-                        # We need to apply the same device filters
-                        # can't call select twice on the same query because it causes an error
-                        max_query = supabase.table(SUPABASE_TABLE).select("recorded_at")
-
-                        # Apply same device filtering as before
-                        if self.device_id:
-                            max_query = max_query.eq("device_id", self.device_id)
-                        else:
-                            if self.user_session and self.user_session.user:
-                                user_id = self.user_session.user.id
-                                user_devices = supabase.table("devices") \
-                                    .select("id") \
-                                    .eq("owner_id", user_id) \
-                                    .execute()
-                                if user_devices.data:
-                                    device_ids = [d["id"] for d in user_devices.data]
-                                    max_query = max_query.in_("device_id", device_ids)
-
-                        # gets the most recently recorded timestamps
-                        max_query = max_query.order("recorded_at", desc=True).limit(1)
-                        max_response = max_query.execute()
-
-                        if not max_response.data or len(max_response.data) == 0:
-                            print(f"   ❌ No data found at all for this device/user")
-                            self.dataFetched.emit(pd.DataFrame())
-                            return
-
-                        # Get the most recent timestamp
-                        most_recent_str = max_response.data[0]['recorded_at']
-                        most_recent = pd.to_datetime(most_recent_str, utc=True)
-
-                        # Calculate new cutoff: most_recent - time_range_hours
-                        new_cutoff = most_recent - timedelta(hours=self.time_range_hours)
-                        new_cutoff_str = new_cutoff.isoformat()
-
-                        print(f"   📊 Most recent data: {most_recent_str}")
-                        print(f"   📊 Showing data from: {new_cutoff_str} to {most_recent_str}")
-                        print(f"   📊 (This is the most recent {self.time_range_hours} hours of available data)\n")
-
-                        # Rebuild the full query with new cutoff
-                        fallback_query = supabase.table(SUPABASE_TABLE).select("*")
-
-                        # Apply same device filtering
-                        if self.device_id:
-                            fallback_query = fallback_query.eq("device_id", self.device_id)
-                        else:
-                            if self.user_session and self.user_session.user:
-                                user_id = self.user_session.user.id
-                                user_devices_data = supabase.table("devices") \
-                                    .select("id") \
-                                    .eq("owner_id", user_id) \
-                                    .execute()
-                                if user_devices_data.data:
-                                    device_ids = [d["id"] for d in user_devices_data.data]
-                                    fallback_query = fallback_query.in_("device_id", device_ids)
-
-                        # Apply time filter and order
-                        fallback_query = fallback_query.gte("recorded_at", new_cutoff_str).order("recorded_at",
-                                                                                                 desc=False)
-                        response = fallback_query.execute()
-
-                        if not response.data or len(response.data) == 0:
-                            print(f"   ❌ Still no data found (this shouldn't happen)")
-                            self.dataFetched.emit(pd.DataFrame())
-                            return
-                    else:
-                        print(
-                            f"✅ Found {len(response.data)} rows in last {self.time_range_hours} hours (current time window)")
-
-                else:
-                    # No time filter - get all data
-                    query = query.order("recorded_at", desc=False)
-                    response = query.execute()
-
-                    if not response.data or len(response.data) == 0:
-                        print(f"No data found")
-                        self.dataFetched.emit(pd.DataFrame())
-                        return
-
-                #responde.data is a list of dictionaries.
-                # pd.DataFrame converts this to a table structure with rows and columns
-                df = pd.DataFrame(response.data)
-
-                # convert the recorded_at strings to datetime obejcts
-                if "recorded_at" in df.columns:
-                    df["recorded_at"] = pd.to_datetime(df["recorded_at"], utc=True)
-
-                print(f"📈 Returning {len(df)} rows to display")
-                if len(df) > 0:
-                    min_time = df["recorded_at"].min()
-                    max_time = df["recorded_at"].max()
-                    print(f"   Time range: {min_time} to {max_time}")
-
-                # emitting the signal with the dataframe safely passes it to the main thread
-                # now we can connect any slot function to the signal in the UI file
-                self.dataFetched.emit(df)
+                # long ranges read a rollup table instead of every raw row
+                table, columns = self.graph_source()
+                # raw rows are append-only, so a refresh only needs the new ones.
+                # rollup buckets are rewritten as readings land, so those are always refetched
+                if self.since is not None and table == SUPABASE_TABLE:
+                    self.fetch_delta(supabase, columns)
+                    return
+                try:
+                    self.fetch_graph(supabase, table, columns)
+                except Exception as e:
+                    if table == SUPABASE_TABLE:
+                        raise
+                    # rollup migration not applied yet, use the raw table
+                    print(f"⚠️  Rollup {table} unavailable ({e}), using {SUPABASE_TABLE}")
+                    self.fetch_graph(supabase, SUPABASE_TABLE, self.projection(SUPABASE_TABLE))
 
             #SECOND FETCH MODE
             elif self.mode == self.FETCH_MODE_AVERAGES:
+                # just some columns (the graph frame has the others): add them up from rollup buckets
+                if self.columns:
+                    try:
+                        self.fetch_bucket_averages(supabase)
+                        return
+                    except Exception as e:
+                        print(f"⚠️  Rollup averages unavailable ({e}), using {SUPABASE_TABLE}")
+
                 #logic is mostly the same as first fetch mode
-                query = supabase.table(SUPABASE_TABLE).select("*")
+                query = supabase.table(SUPABASE_TABLE).select(self.average_columns())
 
                 # Build device filter
                 if self.device_id:
@@ -271,27 +548,10 @@ class SupabaseDataLoader(QThread):
                     if not response.data or len(response.data) == 0:
                         print(f"   Averages: No data in last {self.time_range_hours} hours, using most recent data")
 
-                        # Rebuild query to get most recent timestamp
-                        max_query = supabase.table(SUPABASE_TABLE).select("recorded_at")
-
-                        # Apply same device filtering
-                        if self.device_id:
-                            max_query = max_query.eq("device_id", self.device_id)
-                        else:
-                            if self.user_session and self.user_session.user:
-                                user_id = self.user_session.user.id
-                                user_devices = supabase.table("devices") \
-                                    .select("id") \
-                                    .eq("owner_id", user_id) \
-                                    .execute()
-                                if user_devices.data:
-                                    device_ids = [d["id"] for d in user_devices.data]
-                                    max_query = max_query.in_("device_id", device_ids)
-
-                        max_query = max_query.order("recorded_at", desc=True).limit(1)
-                        max_response = max_query.execute()
+                        # newest timestamp for the same device filter, from device_latest when available
+                        most_recent_str = self.most_recent_time(supabase, SUPABASE_TABLE)
 
-                        if not max_response.data or len(max_response.data) == 0:
+                        if not most_recent_str:
                             # No data at all
                             averages = {
                                 "temp": None,
@@ -304,13 +564,12 @@ class SupabaseDataLoader(QThread):
                             return
 
                         # Calculate fallback cutoff
-                        most_recent_str = max_response.data[0]['recorded_at']
                         most_recent = pd.to_datetime(most_recent_str, utc=True)
                         new_cutoff = most_recent - timedelta(hours=self.time_range_hours)
                         new_cutoff_str = new_cutoff.isoformat()
 
                         # Rebuild query with new cutoff
-                        fallback_query = supabase.table(SUPABASE_TABLE).select("*")
+                        fallback_query = supabase.table(SUPABASE_TABLE).select(self.average_columns())
 
                         # Apply same device filtering
                         if self.device_id:
@@ -366,7 +625,12 @@ class SupabaseDataLoader(QThread):
                     "windspeed": df["windSpeed"].mean() if "windSpeed" in df and len(df) > 0 else None,
                     "rfid": df["rfid"].iloc[-1] if "rfid" in df and not df.empty else "N/A"
                 }
+                if self.columns:
+                    # only report what was asked for, the rest of the cards come from the graph frame
+                    averages = {key: value for key, value in averages.items()
+                                if STAT_COLUMNS.get(key) in self.columns}
 
+                query_cache.put(self.result_key(), averages, cadence_ttl())
                 self.averagesFetched.emit(averages)
 
             # fetches the list if devices for the devices tab
@@ -379,6 +643,7 @@ class SupabaseDataLoader(QThread):
                         .eq("owner_id", str(user_id)) \
                         .execute()
 
+                    query_cache.put(self.result_key(), response.data or [], 0)  # offline copy
                     if response.data:
                         print(f"Found {len(response.data)} devices for user")
                         self.devicesFetched.emit(response.data)
@@ -387,6 +652,34 @@ class SupabaseDataLoader(QThread):
                 else:
                     self.errorOccurred.emit("Not authenticated")
 
+            # newest reading per device (device cards, status)
+            elif self.mode == self.FETCH_MODE_LATEST:
+                if self.user_session and self.user_session.user:
+                    if self.device_id:
+                        device_ids = [self.device_id]
+                    else:
+                        user_devices = supabase.table("devices") \
+                            .select("id") \
+                            .eq("owner_id", self.user_session.user.id) \
+                            .execute()
+                        device_ids = [d["id"] for d in user_devices.data or []]
+                    latest = fetch_latest(supabase, device_ids)
+                    query_cache.put(self.result_key(), latest, 0)  # offline copy
+                    self.latestFetched.emit(latest)
+                else:
+                    self.errorOccurred.emit("Not authenticated")
+
+            elif self.mode == self.FETCH_MODE_PROBE:
+                self.fetch_probe(supabase)
+
         except Exception as e:
+            failed = True
+            if is_offline_error(e):
+                connectivity.report(False)
+                if self.emit_offline():
+                    return
             print(f"Error in SupabaseDataLoader: {e}")
-            self.errorOccurred.emit(str(e))
\ No newline at end of file
+            self.errorOccurred.emit(str(e))
+        finally:
+            if not (cached or failed):
+                connectivity.report(True)
\ No newline at end of file
@@ -0,0 +1,59 @@
+# columnar wire format for bulk graph fetches.
+# a big window as JSON is an array of dicts that gets decoded by the client and then
+# pivoted by pd.DataFrame row by row. asking PostgREST for text/csv instead and reading
+# it with read_csv builds typed columns directly, which is much cheaper for large frames.
+# small requests stay JSON: for a few hundred rows the difference doesn't matter.
+# benchmark: testing/wire_format_benchmark.py
+import io
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (optional, multithreaded CSV reader)
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+# expected rows at or above this are fetched as CSV
+CSV_MIN_ROWS = 5000
+
+# sensor_logs / rollup column types, so read_csv doesn't have to infer them
+CSV_DTYPES = {
+    "id": "int64",
+    "device_id": str,
+    "rfid": str,
+    "samples": "int64",
+    "battery": "float64",
+    "temp_c": "float64",
+    "humidity": "float64",
+    "pressure_pa": "float64",
+    "windSpeed": "float64",
+}
+
+
+def read_csv_frame(text):
+    """PostgREST text/csv body -> DataFrame with typed columns and a UTC recorded_at"""
+    if not text:
+        return pd.DataFrame()
+    header = text.split("\n", 1)[0].strip().split(",")
+    dtype = {col: CSV_DTYPES[col] for col in header if col in CSV_DTYPES}
+    df = pd.read_csv(io.BytesIO(text.encode()), dtype=dtype, engine=CSV_ENGINE)
+    if "recorded_at" in df.columns:
+        df["recorded_at"] = parse_times(df["recorded_at"])
+    return df
+
+
+def parse_times(times):
+    """timestamptz text -> UTC datetimes. postgres drops trailing zeros from the fraction,
+    so the width varies row to row; the usual all-UTC case skips the offset parsing."""
+    if times.str.endswith("+00").all():
+        return pd.to_datetime(times.str.slice(0, -3), format="ISO8601").dt.tz_localize("UTC")
+    return pd.to_datetime(times, utc=True, format="ISO8601")
+
+
+def fetch_frame(query, bulk):
+    """Run a select query as a DataFrame. bulk=True asks for CSV (typed columns),
+    otherwise the usual JSON rows."""
+    if bulk:
+        return read_csv_frame(query.csv().execute().data)
+    return pd.DataFrame(query.execute().data or [])
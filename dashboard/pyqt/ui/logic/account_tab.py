@@ -6,6 +6,7 @@ from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QFont
 from supabase import create_client
 from config import SUPABASE_URL, SUPABASE_KEY
+from data.background_tasks import run_task
 
 
 class ChangePasswordDialog(QDialog):
@@ -131,14 +132,17 @@ class AccountTab(QWidget):
 
     signOutRequested = pyqtSignal()  # Signal to trigger logout
 
-    def __init__(self, user_session, parent=None):
+    def __init__(self, user_session, outbox, parent=None):
         super().__init__(parent)
         self.user_session = user_session
+        self.outbox = outbox  # profile saves are queued here while offline
+        self.outbox.rejected.connect(self.on_write_rejected)
         self.supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
         self.supabase.auth.set_session(
             access_token=self.user_session.access_token,
             refresh_token=self.user_session.refresh_token
         )
+        self.saved_name = ""  # last display name the server confirmed, for rollback
         self.setup_ui()
         self.load_profile()
 
@@ -343,19 +347,21 @@ class AccountTab(QWidget):
 
     def load_profile(self):
         """Load user profile from Supabase"""
-        try:
-            response = self.supabase.table("profiles") \
-                .select("full_name") \
-                .eq("id", self.user_session.user.id) \
-                .execute()
-
+        def done(response):
             if response.data and len(response.data) > 0:
                 full_name = response.data[0].get("full_name", "")
+                self.saved_name = full_name
                 self.username_input.setText(full_name)
                 print(f"Loaded profile: {full_name}")
 
-        except Exception as e:
-            print(f"Error loading profile: {e}")
+        run_task(
+            lambda: self.supabase.table("profiles")
+                .select("full_name")
+                .eq("id", self.user_session.user.id)
+                .execute(),
+            done,
+            lambda e: print(f"Error loading profile: {e}")
+        )
 
     def save_profile(self):
         """Save profile changes to Supabase"""
@@ -365,12 +371,11 @@ class AccountTab(QWidget):
             QMessageBox.warning(self, "Validation Error", "Display name cannot be empty!")
             return
 
-        try:
-            response = self.supabase.table("profiles") \
-                .update({"full_name": new_username}) \
-                .eq("id", self.user_session.user.id) \
-                .execute()
+        # the field already shows the new name; it goes back to the saved one if the update fails
+        previous = self.saved_name
+        self.saved_name = new_username
 
+        def done(response):
             if response.data:
                 QMessageBox.information(
                     self,
@@ -379,13 +384,35 @@ class AccountTab(QWidget):
                 )
                 print(f"Profile updated: {new_username}")
 
-        except Exception as e:
+        def failed(e):
+            if self.saved_name == new_username:  # a newer save owns the field otherwise
+                self.saved_name = previous
+                self.username_input.setText(previous)
             QMessageBox.critical(
                 self,
                 "Error",
                 f"Failed to update profile:\n{str(e)}"
             )
 
+        def queued():
+            QMessageBox.information(
+                self,
+                "Saved Offline",
+                "You're offline right now. Your profile will be updated when the connection is back."
+            )
+
+        self.outbox.write(
+            {"table": "profiles", "action": "update", "values": {"full_name": new_username},
+             "match": {"id": self.user_session.user.id}, "label": "Profile name"},
+            done, failed, queued
+        )
+
+    def on_write_rejected(self, op, error):
+        """A profile save made offline was refused when it synced: show what the server has"""
+        if op["table"] == "profiles":
+            QMessageBox.warning(self, "Sync Failed", f"Your profile could not be updated:\n{error}")
+            self.load_profile()
+
     def change_password(self):
         """Show dialog to change password"""
         dialog = ChangePasswordDialog(self)
@@ -1,6 +1,8 @@
 import sys
 import os
+import numpy as np
 import pandas as pd
+from datetime import datetime
 
 # Add parent directory to path to access modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -12,9 +14,16 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont
 from data.supabase_loader import SupabaseDataLoader
+from data.background_tasks import is_pending
+from data.running_stats import FrameStats, STAT_COLUMNS
+from data.query_cache import query_cache
+from data.series_store import series_store
+from data.prefetcher import Prefetcher
+from data.offline import connectivity
 from plot.mpl_canvas import MplCanvas
 
 REFRESH_COUNTDOWN = 30000
+PREFETCH_DEVICES = 5  # other devices warmed in the background after a view renders
 
 
 class MultiDeviceDialog(QDialog):
@@ -234,10 +243,17 @@ class MultiDeviceDialog(QDialog):
 class DashboardTab(QWidget):
     """Dashboard tab with graphs and sensor data - supports multiple devices on one graph"""
 
-    def __init__(self, user_session, parent=None):
+    def __init__(self, user_session, device_store, parent=None):
         super().__init__(parent)
         self.user_session = user_session
+        self.store = device_store  # device list shared with the devices tab
         self.data_df = pd.DataFrame()
+        self.frame_key = None  # (device_id, time range) data_df was fetched for
+        self.frame_columns = set()  # metric columns in data_df; others load when their button is clicked
+        self.frame_source = None  # table data_df came from, to slice plots from the series store
+        self.multi_columns = set()  # same for the multi-device frames
+        self.column_loader = None
+        self.stats = FrameStats()  # stat cards, kept up to date from data_df
         self.current_plot_col = "temp"
         self.current_device_id = None
         self.current_time_range_hours = 24
@@ -245,14 +261,26 @@ class DashboardTab(QWidget):
         self.selected_device_ids = []  # List of device IDs to show on graph
         self.device_data_cache = {}  # Cache data for each device {device_id: dataframe}
         self.active_loaders = []  # Keep references to active loaders to prevent garbage collection
+        self.probe_loader = None
+        self.probe_key = None  # (device ids, time range) the last probe was for
+        self.probe_since = None  # fixed start of its readings count, so the count only grows
+        self.probe_result = None
+        self.probe_checks = 0
+        self.probe_hits = 0  # auto-refresh ticks skipped because nothing changed
+        self.prefetcher = Prefetcher(user_session, self)  # warms likely next views while idle
+        self.offline_saved_at = None  # when the data on screen was saved, while offline
         self.setup_ui()
-        self.fetch_devices()
+        connectivity.changed.connect(self.on_connectivity_changed)
+        self.store.devicesChanged.connect(self.update_devices)
+        self.store.loadFailed.connect(self.handle_error)
+        if self.store.loaded:
+            self.update_devices(self.store.devices)
         self.setup_auto_refresh()
 
     def setup_auto_refresh(self):
         """Setup auto-refresh timer"""
         self.auto_refresh_timer = QTimer(self)
-        self.auto_refresh_timer.timeout.connect(self.refresh_all_data)
+        self.auto_refresh_timer.timeout.connect(self.auto_refresh)
         # Refresh every 30 seconds (30000 milliseconds)
         self.auto_refresh_timer.start(REFRESH_COUNTDOWN)
         print("✅ Auto-refresh enabled (every 30 seconds)")
@@ -384,7 +412,7 @@ class DashboardTab(QWidget):
         controls_layout.addWidget(add_to_graph_btn)
 
         # Refresh button
-        refresh_btn = QPushButton("↻ Refresh")
+        self.refresh_btn = refresh_btn = QPushButton("↻ Refresh")
         refresh_btn.setStyleSheet("""
             QPushButton {
                 background-color: #007BFF;
@@ -405,6 +433,22 @@ class DashboardTab(QWidget):
 
         main_layout.addLayout(controls_layout)
 
+        # Offline banner: shown while the graph and cards come from the local copy
+        self.offline_banner = QLabel("")
+        self.offline_banner.setStyleSheet("""
+            QLabel {
+                background-color: #fff3cd;
+                color: #856404;
+                border: 1px solid #ffeeba;
+                border-radius: 6px;
+                padding: 8px 12px;
+                font-size: 12px;
+                font-weight: bold;
+            }
+        """)
+        self.offline_banner.setVisible(False)
+        main_layout.addWidget(self.offline_banner)
+
         # ============================================================
         # GRAPH SECTION WITH WARNING OVERLAY
         # ============================================================
@@ -567,8 +611,14 @@ class DashboardTab(QWidget):
         value_label.setObjectName(f"{title.replace(' ', '_')}_value")
         value_label.setStyleSheet(f"color: {color}; font-size: 24px; font-weight: bold;")
 
+        # min / max / p95 under the average, filled in from the graph data
+        detail_label = QLabel("")
+        detail_label.setObjectName(f"{title.replace(' ', '_')}_detail")
+        detail_label.setStyleSheet("color: #9ca3af; font-size: 12px;")
+
         layout.addWidget(title_label)
         layout.addWidget(value_label)
+        layout.addWidget(detail_label)
 
         card.setLayout(layout)
         return card
@@ -586,6 +636,7 @@ class DashboardTab(QWidget):
         dialog = MultiDeviceDialog(self.devices, self.selected_device_ids, self)
         if dialog.exec_() == QDialog.Accepted:
             self.selected_device_ids = dialog.get_selected_device_ids()
+            self.multi_columns = set()
             print(f"📊 Selected devices: {self.selected_device_ids}")
 
             # Fetch data for all selected devices
@@ -600,26 +651,118 @@ class DashboardTab(QWidget):
     def refresh_all_data(self):
         """Refresh both graph data and averages"""
         print("🔄 Refreshing all data...")
+        self.report_cache_stats()
+        query_cache.invalidate(self.shown_device_ids())
         if len(self.selected_device_ids) > 0:
             self.fetch_multi_device_data()
+            self.fetch_averages()
         else:
+            self.fetch_data(delta=True)  # stat cards follow the graph data
+
+    def shown_device_ids(self):
+        """Devices the graph is showing, sorted"""
+        if self.selected_device_ids:
+            return sorted(self.selected_device_ids)
+        if self.current_device_id:
+            return [self.current_device_id]
+        return sorted(d["id"] for d in self.devices)
+
+    def auto_refresh(self):
+        """Timer tick: probe for new readings first, and only refresh when there are some"""
+        device_ids = self.shown_device_ids()
+        if not device_ids:
+            return
+
+        key = (tuple(device_ids), self.current_time_range_hours)
+        if key != self.probe_key:
+            self.probe_since = None
+            if self.current_time_range_hours:
+                self.probe_since = pd.Timestamp.now(tz="UTC") - pd.Timedelta(hours=self.current_time_range_hours)
+
+        self.probe_loader = SupabaseDataLoader(
+            SupabaseDataLoader.FETCH_MODE_PROBE,
+            user_session=self.user_session,
+            since=self.probe_since,
+            devices=device_ids
+        )
+        self.probe_loader.probeFetched.connect(lambda probe, key=key: self.on_probe(probe, key))
+        self.probe_loader.errorOccurred.connect(self.on_probe_failed)
+        self.probe_loader.start()
+
+    def on_probe(self, probe, key):
+        """Skip the refresh when the probe matches the previous one for the same selection"""
+        self.probe_checks += 1
+        same_key = key == self.probe_key
+        if same_key and probe == self.probe_result:
+            self.probe_hits += 1
+            self.report_probe_rate()
+            return
+        # a new count with the same newest reading means late readings landed inside the
+        # loaded window, which the delta refresh (newer than the frame) wouldn't pick up
+        late = same_key and self.probe_result is not None and probe["newest"] == self.probe_result["newest"]
+        self.probe_key, self.probe_result = key, probe
+        self.report_probe_rate()
+
+        if late and not self.selected_device_ids:
+            query_cache.invalidate(key[0])
             self.fetch_data()
-        self.fetch_averages()
+        else:
+            self.refresh_all_data()
+
+    def on_probe_failed(self, error_msg):
+        """No answer from the probe: refresh the normal way"""
+        self.handle_error(error_msg)
+        if not connectivity.online:
+            return  # keep showing the local copy; the next probe tells us when we're back
+        self.refresh_all_data()
+
+    def show_offline(self, stored_at):
+        """A loader served the local copy because Supabase couldn't be reached"""
+        if stored_at:
+            self.offline_saved_at = stored_at
+        if self.offline_saved_at is None:
+            text = "📴 Offline — showing the data already loaded"
+        else:
+            saved = datetime.fromtimestamp(self.offline_saved_at)
+            text = f"📴 Offline — showing data saved {saved.strftime('%b %d %H:%M')}"
+        self.offline_banner.setText(text)
+        self.offline_banner.setVisible(True)
+
+    def on_connectivity_changed(self, online):
+        """Back online: drop the banner and replace the saved copy with live data"""
+        if not online:
+            return
+        self.offline_saved_at = None
+        self.offline_banner.setVisible(False)
+        self.refresh_all_data()
+
+    def report_probe_rate(self):
+        rate = 100 * self.probe_hits / self.probe_checks
+        print(f"🔍 Probe: {self.probe_hits}/{self.probe_checks} auto-refreshes skipped ({rate:.0f}% hit rate)")
+        self.update_refresh_tooltip()
+
+    def report_cache_stats(self):
+        print(f"🗄️  Query cache: {query_cache.summary()}")
+        self.update_refresh_tooltip()
+
+    def update_refresh_tooltip(self):
+        """Probe and query cache hit rates on the refresh button"""
+        lines = []
+        if self.probe_checks:
+            rate = 100 * self.probe_hits / self.probe_checks
+            lines.append(f"Auto-refresh skipped {self.probe_hits} of {self.probe_checks} times: "
+                         f"no new readings ({rate:.0f}%)")
+        lines.append(f"Query cache: {query_cache.summary()}")
+        self.refresh_btn.setToolTip("\n".join(lines))
 
     def fetch_devices(self):
-        """Fetch list of devices from Supabase"""
-        print("📡 Fetching devices...")
-        self.device_loader = SupabaseDataLoader(
-            SupabaseDataLoader.FETCH_MODE_DEVICES,
-            user_session=self.user_session
-        )
-        self.device_loader.devicesFetched.connect(self.update_devices)
-        self.device_loader.errorOccurred.connect(self.handle_error)
-        self.device_loader.start()
+        """Reload the shared device list (update_devices runs when it lands)"""
+        self.store.load()
 
     def update_devices(self, devices):
         """Populate combo box with devices"""
-        print(f"✅ Received {len(devices)} devices")
+        devices = [d for d in devices if not is_pending(d)]  # no data until the server has it
+        first_load = len(self.devices) == 0
         self.devices = devices
 
         # Check if currently selected device still exists
@@ -648,6 +791,10 @@ class DashboardTab(QWidget):
 
             self.deviceComboBox.setEnabled(True)
 
+            # keep showing the selected device when the list is updated around it
+            if device_still_exists:
+                self.deviceComboBox.setCurrentIndex(self.deviceComboBox.findData(self.current_device_id))
+
             # If current device no longer exists, reset to "All My Devices"
             if self.current_device_id and not device_still_exists:
                 print(f"⚠️ Device {self.current_device_id} no longer available, switching to 'All My Devices'")
@@ -656,9 +803,9 @@ class DashboardTab(QWidget):
 
         self.deviceComboBox.blockSignals(False)
 
-        if len(devices) > 0:
+        # a rename or another device changing doesn't change the graph
+        if len(devices) > 0 and (first_load or not device_still_exists):
             self.fetch_data()
-            self.fetch_averages()
 
     def on_device_changed(self, index):
         """Handle device selection change"""
@@ -669,7 +816,6 @@ class DashboardTab(QWidget):
         self.selected_device_ids = []
 
         self.fetch_data()
-        self.fetch_averages()
 
     def on_time_range_changed(self, index):
         """Handle time range selection change"""
@@ -678,26 +824,41 @@ class DashboardTab(QWidget):
 
         if len(self.selected_device_ids) > 0:
             self.fetch_multi_device_data()
+            self.fetch_averages()
         else:
             self.fetch_data()
-        self.fetch_averages()
 
-    def fetch_data(self):
-        """Fetch graph data from Supabase for single device view"""
-        print(f"📊 Fetching data for device: {self.current_device_id or 'All'}...")
+    def fetch_data(self, delta=False):
+        """Fetch graph data from Supabase for single device view.
+        With delta=True only rows newer than the loaded frame are fetched (auto-refresh)."""
+        key = (self.current_device_id, self.current_time_range_hours)
+        since = None
+        columns = [STAT_COLUMNS[self.current_plot_col]]  # just the visible metric to start with
+        if delta and key == self.frame_key and self.stats.newest is not None:
+            since = self.stats.newest
+            columns = sorted(self.frame_columns)
+
+        print(f"📊 Fetching {'new ' if since is not None else ''}data for device: {self.current_device_id or 'All'}...")
         self.loader = SupabaseDataLoader(
             SupabaseDataLoader.FETCH_MODE_GRAPH,
             device_id=self.current_device_id,
             user_session=self.user_session,
-            time_range_hours=self.current_time_range_hours
+            time_range_hours=self.current_time_range_hours,
+            since=since,
+            columns=columns
         )
-        self.loader.dataFetched.connect(self.update_data)
+        # the key ties the result to the selection it was fetched for
+        self.loader.dataFetched.connect(lambda df, key=key: self.update_data(df, key, columns))
+        self.loader.deltaFetched.connect(lambda df, key=key: self.append_data(df, key))
         self.loader.errorOccurred.connect(self.handle_error)
+        self.loader.offlineData.connect(self.show_offline)
+        self.prefetcher.hold(self.loader)
         self.loader.start()
 
     def fetch_multi_device_data(self):
         """Fetch data for all selected devices and plot them together"""
         print(f"📊 Fetching data for {len(self.selected_device_ids)} devices...")
+        self.multi_columns.add(STAT_COLUMNS[self.current_plot_col])
         self.device_data_cache = {}
         self.pending_fetches = len(self.selected_device_ids)
         self.active_loaders = []  # Clear and store new loaders
@@ -708,7 +869,8 @@ class DashboardTab(QWidget):
                 SupabaseDataLoader.FETCH_MODE_GRAPH,
                 device_id=device_id,
                 user_session=self.user_session,
-                time_range_hours=self.current_time_range_hours
+                time_range_hours=self.current_time_range_hours,
+                columns=sorted(self.multi_columns)
             )
 
             # Store the device_id as an attribute on the loader
@@ -717,11 +879,13 @@ class DashboardTab(QWidget):
             # Connect signals - use a proper method instead of lambda
             loader.dataFetched.connect(self.on_device_data_fetched)
             loader.errorOccurred.connect(self.handle_error)
+            loader.offlineData.connect(self.show_offline)
 
             # Keep reference to prevent garbage collection
             self.active_loaders.append(loader)
 
             # Start the loader
+            self.prefetcher.hold(loader)
             loader.start()
 
     def on_device_data_fetched(self, df):
@@ -745,22 +909,137 @@ class DashboardTab(QWidget):
             # Clean up loader references to free memory
             self.active_loaders = []
 
-    def update_data(self, df):
+    def update_data(self, df, key=None, columns=None):
         """Update graph with new data (single device)"""
         print(f"✅ Data received: {len(df)} rows")
         self.data_df = df
+        self.frame_key = key
+        self.frame_source = df.attrs.get("source")  # table the frame came from (series store key)
+        self.frame_columns = set(columns or STAT_COLUMNS.values())
+
+        # stat cards come from the same rows; only ask the server when there are none
+        self.stats = FrameStats()
+        self.stats.add_frame(df)
+        if df.empty:
+            self.fetch_averages()
+        else:
+            self.update_averages(self.stats.averages())
+            self.fetch_card_averages()
+
         self.plot_current()
+        if not df.empty:
+            self.prefetch_next_views()
+
+    def prefetch_next_views(self):
+        """After a view renders, warm the cache for the views usually opened next: this device
+        over the next longer time range, then the other devices at this range. Each one as
+        update_data would ask for it: the visible metric, plus rollup averages for the rest."""
+        col = STAT_COLUMNS[self.current_plot_col]
+        card_cols = [c for c in STAT_COLUMNS.values() if c != col]
+
+        def view(device_id, hours):
+            return [
+                {"mode": SupabaseDataLoader.FETCH_MODE_GRAPH, "device_id": device_id,
+                 "time_range_hours": hours, "columns": [col]},
+                {"mode": SupabaseDataLoader.FETCH_MODE_AVERAGES, "device_id": device_id,
+                 "time_range_hours": hours, "columns": card_cols},
+            ]
+
+        views = []
+        ranges = [self.timeRangeComboBox.itemData(i) for i in range(self.timeRangeComboBox.count())]
+        if self.current_time_range_hours in ranges:
+            wider = ranges[ranges.index(self.current_time_range_hours) + 1:]
+            if wider and wider[0]:  # all-time is too big to fetch on spec
+                views += view(self.current_device_id, wider[0])
+        others = [d["id"] for d in self.devices if d["id"] != self.current_device_id]
+        for device_id in others[:PREFETCH_DEVICES]:
+            views += view(device_id, self.current_time_range_hours)
+        self.prefetcher.schedule(views)
+
+    def append_data(self, df, key):
+        """Add rows from a delta fetch and slide the time window forward"""
+        if key != self.frame_key or self.data_df.empty:
+            return  # selection changed while this was in flight
+        print(f"✅ New data received: {len(df)} rows")
+        changed = not df.empty
+        if changed:
+            self.data_df = pd.concat([self.data_df, df], ignore_index=True)
+            self.stats.add_frame(df)
+
+        # drop rows that fell out of the window, unless the frame is the
+        # "most recent data available" fallback for a device that stopped reporting
+        if self.current_time_range_hours:
+            cutoff = pd.Timestamp.now(tz="UTC") - pd.Timedelta(hours=self.current_time_range_hours)
+            if self.stats.newest >= cutoff and self.data_df["recorded_at"].iloc[0] < cutoff:
+                self.stats.evict_before(cutoff)
+                self.data_df = self.data_df[self.data_df["recorded_at"] >= cutoff].reset_index(drop=True)
+                changed = True
+
+        if changed:
+            self.update_averages(self.stats.averages())
+            self.fetch_card_averages()
+            self.plot_current()
+
+    def fetch_card_averages(self):
+        """Stat cards for metrics the frame hasn't loaded come from server-side rollups"""
+        missing = [col for col in STAT_COLUMNS.values() if col not in self.frame_columns]
+        if missing:
+            self.fetch_averages(missing)
+
+    def fetch_column(self, col):
+        """First click on a metric that isn't loaded: fetch just that column and merge it in"""
+        key = self.frame_key
+        print(f"📊 Loading {col}...")
+        self.column_loader = SupabaseDataLoader(
+            SupabaseDataLoader.FETCH_MODE_GRAPH,
+            device_id=self.current_device_id,
+            user_session=self.user_session,
+            time_range_hours=self.current_time_range_hours,
+            columns=[col]
+        )
+        self.column_loader.dataFetched.connect(lambda df, key=key, col=col: self.merge_column(df, key, col))
+        self.column_loader.errorOccurred.connect(self.handle_error)
+        self.column_loader.offlineData.connect(self.show_offline)
+        self.prefetcher.hold(self.column_loader)
+        self.column_loader.start()
+
+    def merge_column(self, df, key, col):
+        """Add a lazily fetched column to the cached frame (matched on device and time)"""
+        if key != self.frame_key or col in self.frame_columns or self.data_df.empty:
+            return
+        if col in df.columns:
+            merged = [c for c in (col, f"{col}_min", f"{col}_max") if c in df.columns]  # rollup min/max too
+            values = df[["device_id", "recorded_at", *merged]].drop_duplicates(["device_id", "recorded_at"])
+            self.data_df = self.data_df.drop(columns=merged, errors="ignore") \
+                .merge(values, on=["device_id", "recorded_at"], how="left")
+        else:
+            self.data_df[col] = float("nan")
+        self.frame_columns.add(col)
+        print(f"✅ Merged {col} into the cached frame")
+
+        # its card switches from the rollup numbers to stats over the frame
+        self.stats.add_frame(self.data_df, [col])
+        self.update_averages(self.stats.averages())
+        if STAT_COLUMNS[self.current_plot_col] == col:
+            self.plot_current()
 
     def plot_data(self, keyword):
         """Set which data to plot"""
         print(f"📈 Plotting: {keyword}")
         self.current_plot_col = keyword
+        col = STAT_COLUMNS[keyword]
 
-        # Plot based on mode
+        # Plot based on mode; a metric that isn't loaded yet is fetched first
         if len(self.selected_device_ids) > 0:
-            self.plot_multi_device()
+            if col in self.multi_columns:
+                self.plot_multi_device()
+            else:
+                self.fetch_multi_device_data()
         else:
-            self.plot_current()
+            if col in self.frame_columns or self.data_df.empty:
+                self.plot_current()
+            else:
+                self.fetch_column(col)
 
     def plot_current(self):
         """Plot the current data selection (single device)"""
@@ -785,25 +1064,32 @@ class DashboardTab(QWidget):
             print("⚠ 'recorded_at' column not found")
             return
 
-        # Prepare data
-        df = self.data_df[["recorded_at", col]].copy()
+        # Prepare data: straight from the stored history when it has the whole window
+        arrays = self.stored_window(self.current_device_id, self.frame_source, self.data_df, col)
+        if arrays is not None:
+            x, y = arrays
+            if len(x) == 0:
+                print("⚠ No valid data after cleaning")
+                return
+        else:
+            df = self.data_df[["recorded_at", col]].copy()
 
-        if not pd.api.types.is_datetime64_any_dtype(df["recorded_at"]):
-            df["recorded_at"] = pd.to_datetime(df["recorded_at"], utc=True, errors='coerce')
+            if not pd.api.types.is_datetime64_any_dtype(df["recorded_at"]):
+                df["recorded_at"] = pd.to_datetime(df["recorded_at"], utc=True, errors='coerce')
 
-        if df["recorded_at"].dt.tz is not None:
-            df["recorded_at"] = df["recorded_at"].dt.tz_localize(None)
+            if df["recorded_at"].dt.tz is not None:
+                df["recorded_at"] = df["recorded_at"].dt.tz_localize(None)
 
-        df = df.dropna()
+            df = df.dropna()
 
-        if df.empty:
-            print("⚠ No valid data after cleaning")
-            return
+            if df.empty:
+                print("⚠ No valid data after cleaning")
+                return
 
-        df = df.sort_values("recorded_at")
+            df = df.sort_values("recorded_at")
 
-        x = df["recorded_at"]
-        y = pd.to_numeric(df[col], errors="coerce")
+            x = df["recorded_at"]
+            y = pd.to_numeric(df[col], errors="coerce")
 
         # Plot
         self.canvas.ax.clear()
@@ -820,7 +1106,21 @@ class DashboardTab(QWidget):
         self.canvas.fig.subplots_adjust(bottom=0.2)
 
         self.canvas.draw()
-        print(f"✅ Plot updated: {len(df)} data points")
+        print(f"✅ Plot updated: {len(x)} data points{' (stored history)' if arrays is not None else ''}")
+
+    def stored_window(self, device_id, source, df, col):
+        """The frame's time window of `col` from the local series store without missing
+        readings (x: UTC datetime64, y: float64; zero-copy when none are missing), or None
+        if the store doesn't hold all of it"""
+        if not device_id or not source or df.empty \
+                or not pd.api.types.is_datetime64_any_dtype(df["recorded_at"]):
+            return None
+        arrays = series_store.window(device_id, source, col, df["recorded_at"].min(), df["recorded_at"].max())
+        if arrays is None:
+            return None
+        x, y = arrays
+        valid = ~np.isnan(y)
+        return (x, y) if valid.all() else (x[valid], y[valid])
 
     def plot_multi_device(self):
         """Plot multiple devices on the same graph with different colors"""
@@ -857,21 +1157,27 @@ class DashboardTab(QWidget):
                 continue
 
             # Prepare data
-            plot_df = df[["recorded_at", col]].copy()
+            arrays = self.stored_window(device_id, df.attrs.get("source"), df, col)
+            if arrays is not None:
+                x, y = arrays
+                if len(x) == 0:
+                    continue
+            else:
+                plot_df = df[["recorded_at", col]].copy()
 
-            if not pd.api.types.is_datetime64_any_dtype(plot_df["recorded_at"]):
-                plot_df["recorded_at"] = pd.to_datetime(plot_df["recorded_at"], utc=True, errors='coerce')
+                if not pd.api.types.is_datetime64_any_dtype(plot_df["recorded_at"]):
+                    plot_df["recorded_at"] = pd.to_datetime(plot_df["recorded_at"], utc=True, errors='coerce')
 
-            if plot_df["recorded_at"].dt.tz is not None:
-                plot_df["recorded_at"] = plot_df["recorded_at"].dt.tz_localize(None)
+                if plot_df["recorded_at"].dt.tz is not None:
+                    plot_df["recorded_at"] = plot_df["recorded_at"].dt.tz_localize(None)
 
-            plot_df = plot_df.dropna().sort_values("recorded_at")
+                plot_df = plot_df.dropna().sort_values("recorded_at")
 
-            if plot_df.empty:
-                continue
+                if plot_df.empty:
+                    continue
 
-            x = plot_df["recorded_at"]
-            y = pd.to_numeric(plot_df[col], errors="coerce")
+                x = plot_df["recorded_at"]
+                y = pd.to_numeric(plot_df[col], errors="coerce")
 
             # Use different color for each device
             color = colors[idx % len(colors)]
@@ -916,17 +1222,20 @@ class DashboardTab(QWidget):
         self.canvas.draw()
         print(f"✅ Multi-device plot updated: {len(self.selected_device_ids)} devices")
 
-    def fetch_averages(self):
-        """Fetch average statistics"""
+    def fetch_averages(self, columns=None):
+        """Fetch average statistics (only for `columns` when given)"""
         print("📈 Fetching averages...")
         self.avg_loader = SupabaseDataLoader(
             SupabaseDataLoader.FETCH_MODE_AVERAGES,
             device_id=self.current_device_id,
             user_session=self.user_session,
-            time_range_hours=self.current_time_range_hours
+            time_range_hours=self.current_time_range_hours,
+            columns=columns
         )
         self.avg_loader.averagesFetched.connect(self.update_averages)
         self.avg_loader.errorOccurred.connect(self.handle_error)
+        self.avg_loader.offlineData.connect(self.show_offline)
+        self.prefetcher.hold(self.avg_loader)
         self.avg_loader.start()
 
     def update_averages(self, avg):
@@ -948,8 +1257,25 @@ class DashboardTab(QWidget):
         if windspeed_label and avg.get('windspeed') is not None:
             windspeed_label.setText(f"{avg.get('windspeed'):.2f} m/s")
 
-        # Check for filter warning after updating cards
-        self.check_filter_warning(avg)
+        # min / max / p95 only come with stats computed from the graph data
+        for card, name, key, unit in (
+                (self.temp_card, "Avg_Temperature", "temp", "°C"),
+                (self.pressure_card, "Avg_Pressure", "pressure", " Pa"),
+                (self.humidity_card, "Avg_Humidity", "humidity", "%"),
+                (self.windspeed_card, "Wind_Speed", "windspeed", " m/s")):
+            detail_label = card.findChild(QLabel, f"{name}_detail")
+            if detail_label and key in avg:
+                if avg.get(f"{key}_min") is not None:
+                    detail = f"   min {avg[f'{key}_min']:.2f}{unit} · max {avg[f'{key}_max']:.2f}{unit}"
+                    if avg.get(f"{key}_p95") is not None:
+                        detail += f" · p95 {avg[f'{key}_p95']:.2f}{unit}"
+                    detail_label.setText(detail)
+                else:
+                    detail_label.setText("")
+
+        # Check for filter warning after updating cards (when this update has wind speed)
+        if 'windspeed' in avg:
+            self.check_filter_warning(avg)
 
         print("✅ Averages updated")
 
@@ -986,5 +1312,6 @@ class DashboardTab(QWidget):
     def handle_error(self, error_msg):
         """Handle errors from data loading - just log them, don't show message boxes"""
         print(f"❌ Error: {error_msg}")
+        self.probe_result = None  # refresh on the next tick rather than trusting the last probe
         # Don't show message boxes for data fetch errors - they can be annoying during auto-refresh
         # Users can check console for errors if needed
\ No newline at end of file
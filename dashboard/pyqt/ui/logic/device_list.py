@@ -0,0 +1,245 @@
+"""
+Virtualized device list for DevicesTab.
+
+DeviceListModel holds the devices and their newest readings and applies
+changes as row inserts/moves/removals/dataChanged instead of a full reset.
+DeviceCardDelegate paints each row as a device card (including the Edit and
+Unclaim buttons), so QListView only draws the rows that are on screen and
+no widgets are created per device.
+"""
+from datetime import datetime, timezone
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QRectF, QSize, QEvent, pyqtSignal
+from PyQt5.QtGui import QColor, QFont, QPainter, QPainterPath, QPen
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle
+
+ONLINE_SECONDS = 5 * 60    # nodes report every minute; a few missed readings is still online
+STALE_SECONDS = 60 * 60    # silent for longer than this is offline
+LOW_BATTERY_V = 3.4
+
+HEALTH_COLORS = {
+    "online": "#28a745",
+    "warning": "#ffc107",
+    "offline": "#dc3545",
+    "unknown": "#9ca3af",
+}
+
+CARD_HEIGHT = 215
+CARD_SPACING = 15
+CARD_PADDING = 15
+BUTTON_SIZE = QSize(90, 32)
+
+
+def parse_time(value):
+    """Supabase timestamp string -> aware datetime (None if missing or unparseable)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def device_health(latest, now=None):
+    """Health from a device_latest row: (state, text). state is a HEALTH_COLORS key."""
+    seen = parse_time((latest or {}).get('recorded_at'))
+    if seen is None:
+        return "unknown", "No readings yet"
+    age = ((now or datetime.now(timezone.utc)) - seen).total_seconds()
+    battery = (latest or {}).get('battery')
+    if age > STALE_SECONDS:
+        return "offline", "Offline"
+    if age > ONLINE_SECONDS:
+        return "warning", "Missed readings"
+    if battery is not None and float(battery) < LOW_BATTERY_V:
+        return "warning", "Low battery"
+    return "online", "Online"
+
+
+class DeviceListModel(QAbstractListModel):
+    """Devices in display order plus their newest reading (device_latest)"""
+
+    DeviceRole = Qt.UserRole + 1
+    LatestRole = Qt.UserRole + 2
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.devices = []  # device dicts in display order
+        self.latest = {}   # device_id -> newest reading
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.devices)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.devices):
+            return None
+        device = self.devices[index.row()]
+        if role == Qt.DisplayRole:
+            return device.get('name', 'Unnamed Device')
+        if role == self.DeviceRole:
+            return device
+        if role == self.LatestRole:
+            return self.latest.get(device.get('id'))
+        return None
+
+    def row_of(self, device_id, start=0):
+        for row in range(start, len(self.devices)):
+            if self.devices[row].get('id') == device_id:
+                return row
+        return None
+
+    def set_devices(self, devices):
+        """Make the list match `devices` with the fewest row changes"""
+        wanted = {d.get('id') for d in devices}
+
+        # drop devices that are gone, bottom up so row numbers stay valid
+        for row in reversed(range(len(self.devices))):
+            if self.devices[row].get('id') not in wanted:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.devices[row]
+                self.endRemoveRows()
+
+        # walk the new order: keep, move or insert each device
+        for pos, device in enumerate(devices):
+            existing = self.row_of(device.get('id'), pos)
+            if existing is None:
+                self.beginInsertRows(QModelIndex(), pos, pos)
+                self.devices.insert(pos, device)
+                self.endInsertRows()
+                continue
+            if existing != pos:
+                self.beginMoveRows(QModelIndex(), existing, existing, QModelIndex(), pos)
+                self.devices.insert(pos, self.devices.pop(existing))
+                self.endMoveRows()
+            if self.devices[pos] != device:
+                self.devices[pos] = device
+                self.dataChanged.emit(self.index(pos), self.index(pos))
+
+    def set_latest(self, latest):
+        """New health data for every row; only visible rows are repainted"""
+        self.latest = latest
+        if self.devices:
+            self.dataChanged.emit(self.index(0), self.index(len(self.devices) - 1), [self.LatestRole])
+
+
+class DeviceCardDelegate(QStyledItemDelegate):
+    """Paints a device card per row and turns clicks on its buttons into signals"""
+
+    editRequested = pyqtSignal(object)     # Emits device data
+    unclaimRequested = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.name_font = QFont("Arial", 14, QFont.Bold)
+        self.status_font = QFont("Arial", 10, QFont.Bold)
+        self.text_font = QFont("Arial", 9)
+        self.id_font = QFont("monospace", 8)
+        self.button_font = QFont("Arial", 9, QFont.Bold)
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), CARD_HEIGHT + CARD_SPACING)
+
+    def card_rect(self, option):
+        return QRect(option.rect.left(), option.rect.top(), option.rect.width() - 1, CARD_HEIGHT)
+
+    def button_rects(self, option):
+        card = self.card_rect(option)
+        top = card.bottom() - CARD_PADDING - BUTTON_SIZE.height()
+        edit = QRect(card.left() + CARD_PADDING, top, BUTTON_SIZE.width(), BUTTON_SIZE.height())
+        unclaim = QRect(edit.right() + 10, top, BUTTON_SIZE.width(), BUTTON_SIZE.height())
+        return edit, unclaim
+
+    def paint(self, painter, option, index):
+        device = index.data(DeviceListModel.DeviceRole) or {}
+        latest = index.data(DeviceListModel.LatestRole)
+        hovered = bool(option.state & QStyle.State_MouseOver)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        # card background
+        card = self.card_rect(option)
+        path = QPainterPath()
+        path.addRoundedRect(QRectF(card).adjusted(0.5, 0.5, -0.5, -0.5), 12, 12)
+        painter.fillPath(path, QColor("#F8F9FA" if hovered else "#FFFFFF"))
+        painter.setPen(QPen(QColor("#007BFF" if hovered else "#E6E9EC"), 1))
+        painter.drawPath(path)
+
+        x = card.left() + CARD_PADDING
+        width = card.width() - 2 * CARD_PADDING
+        y = card.top() + CARD_PADDING
+
+        def line(text, font, color, height):
+            nonlocal y
+            painter.setFont(font)
+            painter.setPen(QColor(color))
+            painter.drawText(QRect(x, y, width, height), Qt.AlignLeft | Qt.AlignVCenter,
+                             painter.fontMetrics().elidedText(text, Qt.ElideRight, width))
+            y += height
+
+        # Device name
+        line(device.get('name', 'Unnamed Device'), self.name_font, "#2c3e50", 26)
+
+        # Location
+        line(f"Location: {device.get('hvac_location') or 'No location set'}", self.text_font, "#6c757d", 18)
+
+        # Health dot + state
+        state, status = device_health(latest)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(HEALTH_COLORS[state]))
+        painter.drawEllipse(QRect(x, y + 6, 10, 10))
+        painter.setBrush(Qt.NoBrush)
+        painter.setFont(self.status_font)
+        painter.setPen(QColor("#2c3e50"))
+        painter.drawText(QRect(x + 16, y, width - 16, 22), Qt.AlignLeft | Qt.AlignVCenter, status)
+        y += 22
+
+        seen = parse_time((latest or {}).get('recorded_at'))
+        line(f"Last seen: {seen.astimezone().strftime('%b %d, %Y %H:%M')}" if seen else "Last seen: never",
+             self.text_font, "#6c757d", 18)
+        if latest:
+            battery = latest.get('battery')
+            boot = latest.get('boot')
+            battery_str = f"{float(battery):.2f} V" if battery is not None else "—"
+            boot_str = boot if boot is not None else "—"
+            line(f"Battery: {battery_str}   Boots: {boot_str}   RFID: {latest.get('rfid') or '—'}",
+                 self.text_font, "#6c757d", 18)
+        else:
+            y += 18
+
+        # Created date
+        created = parse_time(device.get('created_at'))
+        line(f"Added: {created.strftime('%b %d, %Y')}" if created else "", self.text_font, "#9ca3af", 18)
+
+        # Device ID
+        line(f"ID: {device.get('id', 'Unknown')}", self.id_font, "#9ca3af", 16)
+
+        # buttons
+        edit, unclaim = self.button_rects(option)
+        painter.setFont(self.button_font)
+        button = QPainterPath()
+        button.addRoundedRect(QRectF(edit), 6, 6)
+        painter.fillPath(button, QColor("#007BFF"))
+        painter.setPen(QColor("#FFFFFF"))
+        painter.drawText(edit, Qt.AlignCenter, "Edit")
+
+        button = QPainterPath()
+        button.addRoundedRect(QRectF(unclaim).adjusted(1, 1, -1, -1), 6, 6)
+        painter.fillPath(button, QColor("#FFFFFF"))
+        painter.setPen(QPen(QColor("#dc3545"), 2))
+        painter.drawPath(button)
+        painter.drawText(unclaim, Qt.AlignCenter, "Unclaim")
+
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            edit, unclaim = self.button_rects(option)
+            device = index.data(DeviceListModel.DeviceRole)
+            if edit.contains(event.pos()):
+                self.editRequested.emit(device)
+                return True
+            if unclaim.contains(event.pos()):
+                self.unclaimRequested.emit(device)
+                return True
+        return super().editorEvent(event, model, option, index)
@@ -1,129 +1,16 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QScrollArea, QFrame, QMessageBox, QDialog
+    QPushButton, QListView, QMessageBox, QDialog
 )
-from PyQt5.QtCore import Qt, pyqtSignal
+import uuid
+from datetime import datetime, timezone
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 from PyQt5.QtGui import QFont
-from supabase import create_client
-from config import SUPABASE_URL, SUPABASE_KEY
+from data.supabase_loader import SupabaseDataLoader
+from data.background_tasks import run_task, is_pending, PENDING_PREFIX
+from ui.logic.device_list import DeviceListModel, DeviceCardDelegate
 
-
-class DeviceCard(QFrame):
-    """Individual device card widget"""
-
-    # these are the signals that can be sent by the cards
-    unclaimRequested = pyqtSignal(object)  # Emits device data
-    editRequested = pyqtSignal(object)
-
-    def __init__(self, device_data, parent=None):
-        super().__init__(parent)
-        self.device_data = device_data  # store device info (name ,id, location)
-        self.setup_ui()
-
-    def setup_ui(self):
-        self.setStyleSheet("""
-            DeviceCard {
-                background-color: #FFFFFF;
-                border-radius: 12px;
-                border: 1px solid #E6E9EC;
-                padding: 15px;
-            }
-            DeviceCard:hover {
-                border: 1px solid #007BFF;
-                background-color: #F8F9FA;
-            }
-        """)
-
-        layout = QVBoxLayout()
-        layout.setSpacing(10)
-
-        # Device name
-        name_label = QLabel(self.device_data.get('name', 'Unnamed Device'))
-        name_label.setFont(QFont("Arial", 14, QFont.Bold))
-        name_label.setStyleSheet("color: #2c3e50;")
-
-        # Location
-        location = self.device_data.get('hvac_location', 'No location set')
-        location_label = QLabel(f"Location: {location}")
-        location_label.setStyleSheet("color: #6c757d; font-size: 12px;")
-
-        # Device ID
-        device_id = self.device_data.get('id', 'Unknown')
-        id_label = QLabel(f"ID: {device_id}")
-        id_label.setStyleSheet("color: #9ca3af; font-size: 10px; font-family: monospace;")
-        id_label.setWordWrap(True)
-
-        # Created date
-        created_at = self.device_data.get('created_at', '')
-        if created_at:
-            # formatting the created at date nicely
-            from datetime import datetime
-            try:
-                dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                date_str = dt.strftime('%b %d, %Y')
-                date_label = QLabel(f"Added: {date_str}")
-                date_label.setStyleSheet("color: #9ca3af; font-size: 11px;")
-            except:
-                date_label = QLabel("")
-        else:
-            date_label = QLabel("")
-
-        # buttons
-        btn_layout = QHBoxLayout()
-        btn_layout.setSpacing(10)
-
-        edit_btn = QPushButton("Edit")
-        edit_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #007BFF;
-                color: white;
-                border: none;
-                border-radius: 6px;
-                padding: 8px 16px;
-                font-size: 12px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #0056b3;
-            }
-        """)
-        edit_btn.setCursor(Qt.PointingHandCursor)
-
-        # when clicked, emit signal with the device's data
-        edit_btn.clicked.connect(lambda: self.editRequested.emit(self.device_data))
-
-        unclaim_btn = QPushButton("Unclaim")
-        unclaim_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #FFFFFF;
-                color: #dc3545;
-                border: 2px solid #dc3545;
-                border-radius: 6px;
-                padding: 8px 16px;
-                font-size: 12px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #dc3545;
-                color: white;
-            }
-        """)
-        unclaim_btn.setCursor(Qt.PointingHandCursor)
-        # when unclaim btn clicked, emit signal with device data
-        unclaim_btn.clicked.connect(lambda: self.unclaimRequested.emit(self.device_data))
-
-        btn_layout.addWidget(edit_btn)
-        btn_layout.addWidget(unclaim_btn)
-        btn_layout.addStretch()
-
-        # Add all to layout
-        layout.addWidget(name_label)
-        layout.addWidget(location_label)
-        layout.addWidget(date_label)
-        layout.addWidget(id_label)
-        layout.addLayout(btn_layout)
-
-        self.setLayout(layout)
+HEALTH_REFRESH = 60000     # ms between background health refreshes
 
 
 class FindDeviceDialog(QDialog):
@@ -356,17 +243,28 @@ class AddEditDeviceDialog(QDialog):
 class DevicesTab(QWidget):
     """Main devices management tab"""
     devicesChanged = pyqtSignal()
-    def __init__(self, user_session, parent=None):
+    def __init__(self, user_session, device_store, parent=None):
         super().__init__(parent)
         self.user_session = user_session
-        self.supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-        self.supabase.auth.set_session(
-            access_token=self.user_session.access_token,
-            refresh_token=self.user_session.refresh_token
-        )
+        self.store = device_store  # shared with the dashboard; writes go through its outbox
+        self.supabase = device_store.supabase
+        self.outbox = device_store.outbox
         self.devices = []
+        self.latest = {}  # device_id -> newest reading (device_latest), cached between refreshes
+        self.health_loader = None
         self.setup_ui()
-        self.load_devices()
+
+        self.store.devicesChanged.connect(self.on_devices_changed)
+        self.store.loadFailed.connect(
+            lambda e: QMessageBox.critical(self, "Error", f"Failed to load devices: {e}"))
+        self.outbox.rejected.connect(self.on_write_rejected)
+        if self.store.loaded:
+            self.on_devices_changed(self.store.devices)
+
+        # keep health current without rebuilding the list
+        self.health_timer = QTimer(self)
+        self.health_timer.timeout.connect(self.refresh_health)
+        self.health_timer.start(HEALTH_REFRESH)
 
     def setup_ui(self):
         layout = QVBoxLayout()
@@ -434,70 +332,99 @@ class DevicesTab(QWidget):
         header_layout.addWidget(find_btn)
         header_layout.addWidget(add_btn)
 
-        # Scroll area for device cards
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setStyleSheet("""
-            QScrollArea {
+        # Device cards: a list view paints only the visible rows, so large fleets stay fast
+        self.model = DeviceListModel(self)
+        self.delegate = DeviceCardDelegate(self)
+        self.delegate.unclaimRequested.connect(self.unclaim_device)
+        self.delegate.editRequested.connect(self.edit_device)
+
+        self.devices_view = QListView()
+        self.devices_view.setModel(self.model)
+        self.devices_view.setItemDelegate(self.delegate)
+        self.devices_view.setUniformItemSizes(True)
+        self.devices_view.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.devices_view.setSelectionMode(QListView.NoSelection)
+        self.devices_view.setFocusPolicy(Qt.NoFocus)
+        self.devices_view.setMouseTracking(True)  # card hover highlight
+        self.devices_view.setStyleSheet("""
+            QListView {
                 border: none;
                 background-color: transparent;
             }
         """)
 
-        self.devices_container = QWidget()
-        self.devices_layout = QVBoxLayout()
-        self.devices_layout.setSpacing(15)
-        self.devices_container.setLayout(self.devices_layout)
-
-        scroll.setWidget(self.devices_container)
+        self.empty_label = QLabel("No devices yet. Click 'Add Device' to get started!")
+        self.empty_label.setAlignment(Qt.AlignCenter)
+        self.empty_label.setStyleSheet("color: #6c757d; font-size: 16px; padding: 60px;")
+        self.empty_label.hide()
 
         # Add to main layout
         layout.addLayout(header_layout)
-        layout.addWidget(scroll)
+        layout.addWidget(self.empty_label)
+        layout.addWidget(self.devices_view)
 
         self.setLayout(layout)
 
     def load_devices(self):
-        """Load devices from Supabase"""
-        try:
-            response = self.supabase.table("devices") \
-                .select("*") \
-                .eq("owner_id", self.user_session.user.id) \
-                .order("created_at", desc=True) \
-                .execute()
-
-            self.devices = response.data if response.data else []
-            self.refresh_device_list()
+        """Reload devices from Supabase (the store tells every tab when they land)"""
+        self.store.load()
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to load devices: {str(e)}")
+    def on_devices_changed(self, devices):
+        """The shared device list changed: update the cards in place"""
+        new_ids = {d.get('id') for d in devices if not is_pending(d)} - {d.get('id') for d in self.devices}
+        self.devices = devices
+        self.refresh_device_list()  # cards show cached health until the refresh lands
+        if new_ids:
+            self.refresh_health()  # only devices we haven't seen before can have unknown health
 
     def refresh_device_list(self):
         """Refresh the device cards display"""
-        # Clear existing cards
-        while self.devices_layout.count():
-            child = self.devices_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
         # Update count
         count = len(self.devices)
         self.device_count.setText(f"{count} device{'s' if count != 1 else ''}")
 
-        # Add device cards
-        if count == 0:
-            empty_label = QLabel("No devices yet. Click 'Add Device' to get started!")
-            empty_label.setAlignment(Qt.AlignCenter)
-            empty_label.setStyleSheet("color: #6c757d; font-size: 16px; padding: 60px;")
-            self.devices_layout.addWidget(empty_label)
-        else:
-            for device in self.devices:
-                card = DeviceCard(device)
-                card.unclaimRequested.connect(self.unclaim_device)
-                card.editRequested.connect(self.edit_device)
-                self.devices_layout.addWidget(card)
-
-        self.devices_layout.addStretch()
+        # the model only touches rows that were added, removed or changed
+        self.model.set_devices(self.devices)
+        self.empty_label.setVisible(count == 0)
+        self.devices_view.setVisible(count > 0)
+
+    def pending_device(self, data):
+        """Optimistic row shown until the server returns the real one"""
+        return {
+            **data,
+            'id': f"{PENDING_PREFIX}{uuid.uuid4().hex}",
+            'created_at': datetime.now(timezone.utc).isoformat()
+        }
+
+    def on_queued(self):
+        QMessageBox.information(
+            self,
+            "Saved Offline",
+            "You're offline right now. The change is saved and will sync automatically "
+            "when the connection is back."
+        )
+
+    def on_write_rejected(self, op, error):
+        """A change made offline was refused when it synced (the list is reloaded after)"""
+        if op["table"] == "devices":
+            QMessageBox.warning(self, "Sync Failed", f"{op.get('label', 'A device change')} could not be saved:\n{error}")
+
+    def refresh_health(self):
+        """Fetch the newest reading for all devices in one background query"""
+        if not self.devices or (self.health_loader and self.health_loader.isRunning()):
+            return
+        self.health_loader = SupabaseDataLoader(
+            SupabaseDataLoader.FETCH_MODE_LATEST,
+            user_session=self.user_session
+        )
+        self.health_loader.latestFetched.connect(self.update_health)
+        self.health_loader.errorOccurred.connect(lambda e: print(f"⚠️  Device health refresh failed: {e}"))
+        self.health_loader.start()
+
+    def update_health(self, latest):
+        """Apply fetched health to the existing cards"""
+        self.latest = latest
+        self.model.set_latest(latest)
 
     def add_device(self):
         """Show dialog to add a new device"""
@@ -509,21 +436,31 @@ class DevicesTab(QWidget):
                 QMessageBox.warning(self, "Validation Error", "Device name is required!")
                 return
 
-            try:
-                # in the event that users add their own device, we write to supabase
-                data['owner_id'] = self.user_session.user.id
+            # in the event that users add their own device, we write to supabase
+            data['owner_id'] = self.user_session.user.id
 
-                response = self.supabase.table("devices").insert(data).execute()
+            # show the card right away, swap in the saved row when the insert lands
+            pending = self.pending_device(data)
+            self.store.upsert(pending)
 
-                if response.data:
-                    QMessageBox.information(self, "Success", "Device added successfully!")
-                    self.load_devices()
-
-                    self.devicesChanged.emit() #emit signal to let dashboard know to update
+            def done(response):
+                if not response.data:
+                    failed(Exception("No device returned"))
+                    return
+                self.store.upsert(response.data[0], replace_id=pending['id'])
+                QMessageBox.information(self, "Success", "Device added successfully!")
+                self.devicesChanged.emit() #emit signal to let dashboard know to update
 
-            except Exception as e:
+            def failed(e):
+                self.store.remove(pending['id'])  # roll back
                 QMessageBox.critical(self, "Error", f"Failed to add device: {str(e)}")
 
+            self.outbox.write(
+                {"table": "devices", "action": "insert", "values": data,
+                 "pending_id": pending['id'], "label": f"Adding '{data['name']}'"},
+                done, failed, self.on_queued
+            )
+
     def find_device(self):
         """Show dialog to find and claim a device by MAC address"""
         dialog = FindDeviceDialog(parent=self)
@@ -535,113 +472,134 @@ class DevicesTab(QWidget):
                 QMessageBox.warning(self, "Validation Error", "Please enter a MAC address!")
                 return
 
-            try:
-                # Step 1: Search for the device by MAC address
-                response = self.supabase.table("devices") \
-                    .select("*") \
-                    .eq("device_mac", mac_address) \
-                    .execute()
-
-                # Step 2: Check if device was found
-                if not response.data or len(response.data) == 0:
-                    QMessageBox.warning(
-                        self,
-                        "Device Not Found",
-                        f"No device found with MAC address: {mac_address}\n\n"
-                        f"Possible reasons:\n"
-                        f"• Device doesn't exist in the system\n"
-                        f"• MAC address is incorrect\n"
-                        f"• Device is claimed by another user (RLS blocking access)\n\n"
-                        f"If you're sure the device exists, check your database permissions."
-                    )
-                    return
-
-                device = response.data[0]
-
-                # Step 3: Check if device is claimed using BOTH methods for compatibility
-                # Some databases might use 'claimed' column, others just 'owner_id'
-                is_claimed = device.get('claimed', False) or device.get('owner_id') is not None
-
-                if is_claimed:
-                    current_owner = device.get('owner_id')
-
-                    # Check if it's already the current user's device
-                    if current_owner == self.user_session.user.id:
-                        QMessageBox.information(
-                            self,
-                            "Already Your Device",
-                            f"This device is already in your account!\n\n"
-                            f"Device: {device.get('name', 'Unnamed')}\n"
-                            f"Location: {device.get('hvac_location', 'Not set')}\n"
-                            f"MAC: {mac_address}"
-                        )
-                        return
-                    else:
-                        # Claimed by someone else
-                        QMessageBox.warning(
-                            self,
-                            "Device Already Claimed",
-                            f"This device is already assigned to another user.\n\n"
-                            f"Device: {device.get('name', 'Unnamed')}\n"
-                            f"MAC: {mac_address}\n\n"
-                            f"Please contact support if you believe this is an error."
-                        )
-                        return
-
-                # Step 4: Device is available! Ask user if they want to claim it
-                reply = QMessageBox.question(
+            # Step 1: Search for the device by MAC address
+            run_task(
+                lambda: self.supabase.table("devices")
+                    .select("*")
+                    .eq("device_mac", mac_address)
+                    .execute(),
+                on_done=lambda response: self.on_device_found(mac_address, response),
+                on_error=self.on_find_failed
+            )
+
+    def on_device_found(self, mac_address, response):
+        """Check the search result and offer to claim the device"""
+        # Step 2: Check if device was found
+        if not response.data or len(response.data) == 0:
+            QMessageBox.warning(
+                self,
+                "Device Not Found",
+                f"No device found with MAC address: {mac_address}\n\n"
+                f"Possible reasons:\n"
+                f"• Device doesn't exist in the system\n"
+                f"• MAC address is incorrect\n"
+                f"• Device is claimed by another user (RLS blocking access)\n\n"
+                f"If you're sure the device exists, check your database permissions."
+            )
+            return
+
+        device = response.data[0]
+
+        # Step 3: Check if device is claimed using BOTH methods for compatibility
+        # Some databases might use 'claimed' column, others just 'owner_id'
+        is_claimed = device.get('claimed', False) or device.get('owner_id') is not None
+
+        if is_claimed:
+            current_owner = device.get('owner_id')
+
+            # Check if it's already the current user's device
+            if current_owner == self.user_session.user.id:
+                QMessageBox.information(
                     self,
-                    "Claim Device?",
-                    f"✅ Device found and available!\n\n"
-                    f"Device Name: {device.get('name', 'Unnamed Device')}\n"
+                    "Already Your Device",
+                    f"This device is already in your account!\n\n"
+                    f"Device: {device.get('name', 'Unnamed')}\n"
                     f"Location: {device.get('hvac_location', 'Not set')}\n"
-                    f"MAC Address: {mac_address}\n\n"
-                    f"Would you like to claim this device and add it to your account?",
-                    QMessageBox.Yes | QMessageBox.No,
-                    QMessageBox.Yes
+                    f"MAC: {mac_address}"
                 )
+                return
+            else:
+                # Claimed by someone else
+                QMessageBox.warning(
+                    self,
+                    "Device Already Claimed",
+                    f"This device is already assigned to another user.\n\n"
+                    f"Device: {device.get('name', 'Unnamed')}\n"
+                    f"MAC: {mac_address}\n\n"
+                    f"Please contact support if you believe this is an error."
+                )
+                return
+
+        # Step 4: Device is available! Ask user if they want to claim it
+        reply = QMessageBox.question(
+            self,
+            "Claim Device?",
+            f"✅ Device found and available!\n\n"
+            f"Device Name: {device.get('name', 'Unnamed Device')}\n"
+            f"Location: {device.get('hvac_location', 'Not set')}\n"
+            f"MAC Address: {mac_address}\n\n"
+            f"Would you like to claim this device and add it to your account?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes
+        )
 
-                if reply == QMessageBox.Yes:
-                    # Step 5: Claim the device by setting owner_id and claimed flag
-                    update_data = {
-                        "owner_id": self.user_session.user.id,
-                        "claimed": True
-                    }
-
-                    update_response = self.supabase.table("devices") \
-                        .update(update_data) \
-                        .eq("id", device['id']) \
-                        .execute()
-
-                    if update_response.data:
-                        QMessageBox.information(
-                            self,
-                            "Success!",
-                            f"🎉 Device '{device.get('name', 'Unnamed')}' has been successfully added to your account!"
-                        )
-                        self.load_devices()  # Refresh the device list
-                        self.devicesChanged.emit()
-                    else:
-                        QMessageBox.warning(
-                            self,
-                            "Update Failed",
-                            "Device was found but could not be claimed. Please try again."
-                        )
-
-            except Exception as e:
-                error_msg = str(e)
-                print(f"Error in find_device: {error_msg}")
-
-                QMessageBox.critical(
+        if reply == QMessageBox.Yes:
+            self.claim_device(device)
+
+    def claim_device(self, device):
+        """Step 5: Claim the device by setting owner_id and claimed flag"""
+        update_data = {
+            "owner_id": self.user_session.user.id,
+            "claimed": True
+        }
+
+        # it's ours as far as the UI is concerned; taken back out if the update fails
+        self.store.upsert({**device, **update_data})
+
+        def done(update_response):
+            if not update_response.data:
+                self.store.remove(device['id'])
+                QMessageBox.warning(
                     self,
-                    "Error",
-                    f"Failed to find/claim device:\n\n{error_msg}\n\n"
-                    f"If the device exists but you can't see it, this may be due to "
-                    f"database permissions (RLS policy). Please contact your administrator."
+                    "Update Failed",
+                    "Device was found but could not be claimed. Please try again."
                 )
+                return
+            self.store.upsert(update_response.data[0])
+            self.refresh_health()  # the claim is confirmed, so its readings are visible now
+            QMessageBox.information(
+                self,
+                "Success!",
+                f"🎉 Device '{device.get('name', 'Unnamed')}' has been successfully added to your account!"
+            )
+            self.devicesChanged.emit()
+
+        def failed(e):
+            self.store.remove(device['id'])  # roll back
+            self.on_find_failed(e)
+
+        self.outbox.write(
+            {"table": "devices", "action": "update", "values": update_data,
+             "match": {"id": device['id']}, "label": f"Claiming '{device.get('name', 'Unnamed')}'"},
+            done, failed, self.on_queued
+        )
+
+    def on_find_failed(self, e):
+        error_msg = str(e)
+        print(f"Error in find_device: {error_msg}")
+
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"Failed to find/claim device:\n\n{error_msg}\n\n"
+            f"If the device exists but you can't see it, this may be due to "
+            f"database permissions (RLS policy). Please contact your administrator."
+        )
 
     def edit_device(self, device_data):
         """Show dialog to edit a device"""
+        if is_pending(device_data):
+            return  # not saved yet, nothing to update
         dialog = AddEditDeviceDialog(device_data, parent=self)
         if dialog.exec_() == QDialog.Accepted:
             data = dialog.get_data()
@@ -650,22 +608,30 @@ class DevicesTab(QWidget):
                 QMessageBox.warning(self, "Validation Error", "Device name is required!")
                 return
 
-            try:
-                response = self.supabase.table("devices") \
-                    .update(data) \
-                    .eq("id", device_data['id']) \
-                    .execute()
+            self.store.upsert({**device_data, **data})
 
-                if response.data:
-                    QMessageBox.information(self, "Success", "Device updated successfully!")
-                    self.load_devices()
-                    self.devicesChanged.emit()
+            def done(response):
+                if not response.data:
+                    failed(Exception("No device returned"))
+                    return
+                self.store.upsert(response.data[0])
+                QMessageBox.information(self, "Success", "Device updated successfully!")
+                self.devicesChanged.emit()
 
-            except Exception as e:
+            def failed(e):
+                self.store.upsert(device_data)  # roll back to the old values
                 QMessageBox.critical(self, "Error", f"Failed to update device: {str(e)}")
 
+            self.outbox.write(
+                {"table": "devices", "action": "update", "values": data,
+                 "match": {"id": device_data['id']}, "label": f"Editing '{data['name']}'"},
+                done, failed, self.on_queued
+            )
+
     def unclaim_device(self, device_data):
         """Unclaim a device after confirmation"""
+        if is_pending(device_data):
+            return
         reply = QMessageBox.question(
             self,
             "Confirm Unclaim",
@@ -676,18 +642,22 @@ class DevicesTab(QWidget):
         )
 
         if reply == QMessageBox.Yes:
-            try:
-                response = self.supabase.table("devices") \
-                    .update({
-                    "owner_id": None,
-                    "claimed": False  # ✅ Added this!
-                    }) \
-                    .eq("id", device_data['id']) \
-                    .execute()
+            index = self.store.remove(device_data['id'])
 
+            def done(response):
                 QMessageBox.information(self, "Success", "Device unclaimed successfully!")
-                self.load_devices()
                 self.devicesChanged.emit()
 
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to unclaim device: {str(e)}")
\ No newline at end of file
+            def failed(e):
+                self.store.upsert(device_data, index)  # put it back where it was
+                QMessageBox.critical(self, "Error", f"Failed to unclaim device: {str(e)}")
+
+            self.outbox.write(
+                {"table": "devices", "action": "update",
+                 "values": {
+                     "owner_id": None,
+                     "claimed": False  # ✅ Added this!
+                 },
+                 "match": {"id": device_data['id']}, "label": f"Unclaiming '{device_data.get('name')}'"},
+                done, failed, self.on_queued
+            )
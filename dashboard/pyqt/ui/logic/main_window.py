@@ -15,6 +15,9 @@ from ui.logic.dashboard_tab import DashboardTab
 from ui.logic.account_tab import AccountTab
 from ui.logic.devices_tab import DevicesTab
 from ui.logic.orders import OrdersTab
+from data.device_store import DeviceStore
+from data.outbox import Outbox
+from data.offline import connectivity
 
 
 def get_resource_path(relative_path):
@@ -123,12 +126,23 @@ class UI(QMainWindow):
             # Map tab indices
             self.map_tab_indices()
 
+            # Writes made while offline wait here until Supabase is reachable again
+            self.outbox = Outbox(self.user_session, self)
+            self.outbox.changed.connect(self.update_sync_status)
+            connectivity.changed.connect(self.update_sync_status)
+
+            # One device list for the dashboard and devices tabs
+            self.device_store = DeviceStore(self.user_session, self.outbox, self)
+
             # Initialize all tabs (each tab handles its own logic)
             self.init_dashboard_tab()
             self.init_devices_tab()
             self.init_orders_tab()
             self.init_account_tab()
 
+            # Single fetch; both tabs are told when it lands
+            self.device_store.load()
+
             # Connect tab change
             self.tabWidget.currentChanged.connect(self.update_tab_header)
 
@@ -333,7 +347,20 @@ class UI(QMainWindow):
             """)
             self.tab_title_label.setAlignment(Qt.AlignCenter)
 
+            # offline / waiting-to-sync indicator on the right
+            self.sync_label = QLabel("")
+            self.sync_label.setStyleSheet("""
+                QLabel {
+                    color: white;
+                    font-size: 13px;
+                    font-weight: bold;
+                    background-color: transparent;
+                }
+            """)
+            self.sync_label.setVisible(False)
+
             header_layout.addWidget(self.tab_title_label)
+            header_layout.addWidget(self.sync_label)
             self.tab_header.setLayout(header_layout)
 
             # Position at very top
@@ -345,6 +372,17 @@ class UI(QMainWindow):
             print(f"ERROR in create_tab_header: {e}")
             raise
 
+    def update_sync_status(self, *args):
+        """Show whether we're offline and how many changes are waiting to sync"""
+        waiting = len(self.outbox.ops)
+        parts = []
+        if not connectivity.online:
+            parts.append("📴 Offline")
+        if waiting:
+            parts.append(f"{waiting} change{'s' if waiting != 1 else ''} waiting to sync")
+        self.sync_label.setText(" · ".join(parts))
+        self.sync_label.setVisible(bool(parts))
+
     def map_tab_indices(self):
         """Map tab object names to display names"""
         try:
@@ -409,7 +447,7 @@ class UI(QMainWindow):
                 # Create layout and add DashboardTab
                 layout = QVBoxLayout()
                 layout.setContentsMargins(0, 0, 0, 0)
-                self.dashboard_tab = DashboardTab(self.user_session)
+                self.dashboard_tab = DashboardTab(self.user_session, self.device_store)
                 layout.addWidget(self.dashboard_tab)
                 dashboard_tab_widget.setLayout(layout)
                 print("✓ Dashboard tab initialized")
@@ -428,7 +466,7 @@ class UI(QMainWindow):
 
                 layout = QVBoxLayout()
                 layout.setContentsMargins(0, 0, 0, 0)
-                self.devices_tab = DevicesTab(self.user_session)
+                self.devices_tab = DevicesTab(self.user_session, self.device_store)
                 layout.addWidget(self.devices_tab)
                 devices_tab_widget.setLayout(layout)
                 print("✓ Devices tab initialized")
@@ -462,7 +500,7 @@ class UI(QMainWindow):
 
                 layout = QVBoxLayout()
                 layout.setContentsMargins(0, 0, 0, 0)
-                self.account_tab = AccountTab(self.user_session)
+                self.account_tab = AccountTab(self.user_session, self.outbox)
                 self.account_tab.signOutRequested.connect(self.handle_sign_out)
                 layout.addWidget(self.account_tab)
                 account_tab_widget.setLayout(layout)
@@ -8,8 +8,10 @@ from PyQt5.QtCore import Qt, pyqtSignal, QThread
 from PyQt5.QtGui import QFont, QDoubleValidator
 from supabase import create_client
 from config import SUPABASE_URL, SUPABASE_KEY
-from datetime import datetime
+from datetime import datetime, timezone
 import json
+import uuid
+from data.background_tasks import run_task, PENDING_PREFIX
 
 
 class ProductCard(QFrame):
@@ -676,36 +678,42 @@ class OrdersTab(QWidget):
 
     def load_products(self):
         """Load products from Supabase"""
-        try:
-            response = self.supabase.table("products") \
-                .select("*") \
-                .eq("active", True) \
-                .order("name") \
-                .execute()
-
+        def done(response):
             self.products = response.data if response.data else []
             self.refresh_products_list()
 
-        except Exception as e:
+        def failed(e):
             print(f"Error loading products: {e}")
             QMessageBox.critical(self, "Error", f"Failed to load products: {str(e)}")
 
+        run_task(
+            lambda: self.supabase.table("products")
+                .select("*")
+                .eq("active", True)
+                .order("name")
+                .execute(),
+            done, failed
+        )
+
     def load_orders(self):
         """Load user's order history"""
-        try:
-            response = self.supabase.table("orders") \
-                .select("*") \
-                .eq("customer_id", self.user_session.user.id) \
-                .order("created_at", desc=True) \
-                .execute()
-
+        def done(response):
             self.orders = response.data if response.data else []
             self.refresh_orders_list()
 
-        except Exception as e:
+        def failed(e):
             print(f"Error loading orders: {e}")
             QMessageBox.critical(self, "Error", f"Failed to load orders: {str(e)}")
 
+        run_task(
+            lambda: self.supabase.table("orders")
+                .select("*")
+                .eq("customer_id", self.user_session.user.id)
+                .order("created_at", desc=True)
+                .execute(),
+            done, failed
+        )
+
     def refresh_products_list(self):
         """Refresh products display"""
         # Clear existing cards
@@ -797,42 +805,44 @@ class OrdersTab(QWidget):
 
     def place_order(self, shipping_info):
         """Create order in Supabase"""
-        try:
-            # Calculate totals
-            subtotal = sum(item['product']['price_cents'] * item['quantity'] for item in self.cart)
-            tax = int(subtotal * 0.08)  # 8% tax
-            shipping = 999  # $9.99 shipping
-            total = subtotal + tax + shipping
-
-            # Get currency from first product
-            currency = self.cart[0]['product'].get('currency', 'USD')
-
-            # Create order
-            order_data = {
-                'customer_id': self.user_session.user.id,
-                'status': 'pending',
-                'currency': currency,
-                'subtotal_cents': subtotal,
-                'tax_cents': tax,
-                'shipping_cents': shipping,
-                'total_cents': total,
-                'created_by': self.user_session.user.id,
-                **shipping_info
-            }
+        cart = self.cart
+
+        # Calculate totals
+        subtotal = sum(item['product']['price_cents'] * item['quantity'] for item in cart)
+        tax = int(subtotal * 0.08)  # 8% tax
+        shipping = 999  # $9.99 shipping
+        total = subtotal + tax + shipping
 
+        # Get currency from first product
+        currency = cart[0]['product'].get('currency', 'USD')
+
+        # Create order
+        order_data = {
+            'customer_id': self.user_session.user.id,
+            'status': 'pending',
+            'currency': currency,
+            'subtotal_cents': subtotal,
+            'tax_cents': tax,
+            'shipping_cents': shipping,
+            'total_cents': total,
+            'created_by': self.user_session.user.id,
+            **shipping_info
+        }
+
+        def submit():
             order_response = self.supabase.table("orders").insert(order_data).execute()
 
             if not order_response.data:
                 raise Exception("Failed to create order")
 
-            order_id = order_response.data[0]['id']
+            order = order_response.data[0]
 
             # Create order items
             order_items = []
-            for item in self.cart:
+            for item in cart:
                 line_total = item['product']['price_cents'] * item['quantity']
                 order_item = {
-                    'order_id': order_id,
+                    'order_id': order['id'],
                     'product_id': item['product']['id'],
                     'qty': item['quantity'],
                     'unit_price_cents': item['product']['price_cents'],
@@ -843,25 +853,42 @@ class OrdersTab(QWidget):
 
             # Insert all order items
             self.supabase.table("order_items").insert(order_items).execute()
+            return order
 
-            # Clear cart
-            self.cart = []
-            self.update_cart_button()
+        # Clear cart and show the order straight away; both are undone if it fails
+        pending = {
+            **order_data,
+            'id': f"{PENDING_PREFIX}{uuid.uuid4().hex}",
+            'created_at': datetime.now(timezone.utc).isoformat()
+        }
+        self.cart = []
+        self.update_cart_button()
+        self.orders.insert(0, pending)
+        self.refresh_orders_list()
 
-            # Reload orders
-            self.load_orders()
+        def done(order):
+            self.orders = [order if o is pending else o for o in self.orders]
+            self.refresh_orders_list()
 
             # Success message
             QMessageBox.information(
                 self,
                 "Order Placed",
-                f"Your order has been placed successfully!\n\nOrder ID: {order_id[:13]}...\nTotal: ${total / 100:.2f}"
+                f"Your order has been placed successfully!\n\nOrder ID: {order['id'][:13]}...\nTotal: ${total / 100:.2f}"
             )
 
-        except Exception as e:
+        def failed(e):
+            # roll back: the order disappears and the items go back in the cart
+            self.orders = [o for o in self.orders if o is not pending]
+            self.refresh_orders_list()
+            self.cart = cart + self.cart
+            self.update_cart_button()
+
             print(f"Error placing order: {e}")
             QMessageBox.critical(
                 self,
                 "Error",
                 f"Failed to place order:\n{str(e)}"
-            )
\ No newline at end of file
+            )
+
+        run_task(submit, done, failed)
@@ -0,0 +1,213 @@
+"""
+Batched upstream posting for relay.py
+
+Instead of one HTTPS GET per reading, spooled readings are gathered over a
+time/size window and posted as one JSON array to a bulk endpoint:
+
+  apps-script : the Logger.gs doPost bulk endpoint. Each element carries the
+                same keys as the doGet query string (id, bc, bat, srs, ...).
+  supabase    : the ingest_logs edge function. Each element is shaped like
+                the firmware's buildIngestJson() payload.
+
+A batch that the server rejects is split in half and each half retried, down
+to single readings, so one bad row can't hold back the rest. Connection
+errors (uplink down) retry the whole batch later with backoff instead.
+
+Apps Script answers HTTP 200 whatever happens, so for apps-script the body
+decides: `OK <n>` (ingest_server.py) or Logger.gs's JSON reply must account
+for every row sent, anything else is treated as a rejection or an outage.
+"""
+import asyncio, json, re
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlsplit
+import requests
+
+from spool import backoff, stamp
+
+BATCH_SIZE = 200      # readings per POST
+BATCH_WINDOW = 5.0    # seconds to wait for a batch to fill before sending it anyway
+
+# firmware query keys (buildURL) -> buildIngestJson() keys
+INGEST_KEYS = {
+    "id": "device_mac", "bc": "boot", "bat": "battery", "srs": "filter_status",
+    "temp": "temp_c", "humd": "humidity", "Prs": "pressure_pa", "wind": "windSpeed",
+    "rfid": "rfid",
+}
+OK_RE = re.compile(r"^OK (\d+)$")
+
+
+def query_params(url):
+    return {k: v[0] for k, v in parse_qs(urlsplit(url).query, keep_blank_values=True).items()}
+
+
+def num(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_ingest_row(params):
+    """Apps Script query params -> Supabase ingest payload (same units as buildIngestJson)"""
+    row = {INGEST_KEYS[k]: v for k, v in params.items() if k in INGEST_KEYS}
+    boot = num(row.get("boot"))
+    row["boot"] = int(boot) if boot is not None else None
+    for key in ("temp_c", "humidity", "windSpeed"):
+        row[key] = num(row.get(key))
+    # bat is a percentage on the URL path; pctFromBatt() is (v - 2.0) * 100
+    pct = num(row.get("battery"))
+    row["battery"] = round(2.0 + pct / 100.0, 3) if pct is not None else None
+    # Prs is hPa on the URL path, the ingest schema wants Pa
+    hpa = num(row.get("pressure_pa"))
+    row["pressure_pa"] = round(hpa * 100.0, 1) if hpa is not None else None
+    row["massAirFlow"] = None
+    ts = num(params.get("ts"))  # capture time from the spool
+    if ts is not None:
+        row["recorded_at"] = datetime.fromtimestamp(ts, timezone.utc).isoformat()
+    return row
+
+
+def apps_script_result(text, sent):
+    """Logger reply -> ('ok' | 'rejected' | 'down', rows the Logger skipped for good)"""
+    text = text.strip()
+    m = OK_RE.match(text)
+    if m:
+        return ("ok" if int(m.group(1)) == sent else "rejected"), 0
+    try:
+        reply = json.loads(text)
+    except ValueError:
+        return "down", 0  # e.g. Apps Script's HTML error page: retry the batch later
+    if not isinstance(reply, dict):
+        return "down", 0
+    if not reply.get("ok"):
+        return ("down" if reply.get("retry") else "rejected"), 0
+    skipped = len(reply.get("skipped") or ())
+    if reply.get("total") != sent or reply.get("written", -1) + skipped != sent:
+        return "rejected", 0
+    return "ok", skipped  # skipped rows have no id; the Logger will never take them
+
+
+def bulk_target(url, bulk_url):
+    """Where a reading's batch goes. Apps Script defaults to the reading's own /exec URL."""
+    if bulk_url:
+        return bulk_url
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class Batcher:
+    """Replaces the per-reading workers when the relay runs with --mode batch"""
+
+    def __init__(self, spool, fwd, kick, health, metrics, fmt="apps-script", bulk_url=None, key=None,
+                 size=BATCH_SIZE, window=BATCH_WINDOW, concurrency=4):
+        self.spool = spool
+        self.fwd = fwd
+        self.kick = kick
+        self.health = health
+        self.metrics = metrics
+        self.leased = 0  # readings claimed from the spool and not yet settled
+        self.fmt = fmt
+        self.bulk_url = bulk_url
+        self.size = size
+        self.window = window
+        self.slots = asyncio.Semaphore(concurrency)
+        self.inflight = set()
+        self.headers = {"Content-Type": "application/json"}
+        if key:
+            self.headers["apikey"] = key
+            self.headers["Authorization"] = f"Bearer {key}"
+
+    def encode(self, rows):
+        params = [query_params(stamp(url, created_at)) for _, url, _, created_at in rows]
+        if self.fmt == "supabase":
+            params = [to_ingest_row(p) for p in params]
+        return json.dumps(params, separators=(",", ":"))
+
+    async def post(self, target, rows):
+        """POST one batch. Returns 'ok', 'rejected' (server refused it) or 'down' (no uplink)."""
+        try:
+            r = await self.fwd.post(target, self.encode(rows), self.headers)
+        except requests.RequestException as e:
+            print(f"[HTTP ERROR] batch of {len(rows)}: {e}")
+            return "down"
+        print(f"[BATCH] {len(rows)} → {r.status_code} | {r.text[:80]!r}")
+        if r.status_code in (408, 429) or r.status_code >= 500:
+            return "down"
+        if r.status_code >= 300:
+            return "rejected"
+        if self.fmt == "supabase":
+            return "ok"
+        result, skipped = apps_script_result(r.text, len(rows))
+        if skipped:
+            print(f"[REJECTED] Logger skipped {skipped} of {len(rows)} readings")
+            self.metrics.inc("relay_drops_total", skipped, reason="rejected")
+        return result
+
+    async def send(self, target, rows):
+        """Post a batch; split rejected batches in half until the bad readings are isolated"""
+        result = await self.post(target, rows)
+        if result == "ok":
+            await self.spool.call(self.spool.ack_many, [r[0] for r in rows])
+            self.metrics.inc("relay_delivered_total", len(rows))
+            self.health["failures"] = 0
+        elif result == "rejected" and len(rows) > 1:
+            mid = len(rows) // 2
+            await asyncio.gather(self.send(target, rows[:mid]), self.send(target, rows[mid:]))
+        elif result == "rejected":
+            # a single reading the server will never take; retrying won't help
+            print(f"[REJECTED] dropping {rows[0][1][:80]}")
+            await self.spool.call(self.spool.ack_many, [rows[0][0]])
+            self.metrics.inc("relay_drops_total", reason="rejected")
+        else:
+            await self.spool.call(self.spool.retry_many, [(r[0], r[2] + 1) for r in rows])
+            self.health["failures"] += 1
+
+    async def _run_batch(self, target, rows):
+        try:
+            await self.send(target, rows)
+        except Exception as e:
+            print(f"[ERROR] batch: {e}")
+            await self.spool.call(self.spool.retry_many, [(r[0], r[2] + 1) for r in rows])
+        finally:
+            self.leased -= len(rows)
+            self.slots.release()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        outage = 0
+        while True:
+            if self.health["failures"]:
+                outage += 1
+                await asyncio.sleep(backoff(outage))
+            else:
+                outage = 0
+
+            # wait until a full batch is due or the window runs out
+            deadline = loop.time() + self.window
+            while await self.spool.call(self.spool.due_count) < self.size and loop.time() < deadline:
+                self.kick.clear()
+                try:
+                    await asyncio.wait_for(self.kick.wait(), min(0.5, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    pass
+
+            await self.slots.acquire()
+            rows = await self.spool.call(self.spool.claim, 1 if self.health["failures"] else self.size)
+            if not rows:
+                self.slots.release()
+                continue
+
+            self.leased += len(rows)
+            groups = {}
+            for row in rows:
+                groups.setdefault(bulk_target(row[1], self.bulk_url), []).append(row)
+            for i, (target, group) in enumerate(groups.items()):
+                if i:  # each extra destination needs its own slot
+                    await self.slots.acquire()
+                task = asyncio.create_task(self._run_batch(target, group))
+                self.inflight.add(task)
+                task.add_done_callback(self.inflight.discard)
+
+    def cancel(self):
+        for task in list(self.inflight):
+            task.cancel()
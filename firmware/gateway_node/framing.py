@@ -0,0 +1,77 @@
+"""
+Serial line framing for relay.py
+
+A fixed-size bytearray is filled straight from the port with readinto(), and
+newlines are found with bytearray.find() from the offset where the previous
+search stopped, so a burst of N lines costs O(N) instead of re-splitting the
+whole buffer per line. Only the unfinished tail is moved back to the front
+between reads. Lines come out as memoryviews into the buffer (no copy) and a
+bytes pattern searched in place filters out debug chatter before anything is
+decoded.
+
+A yielded memoryview is only valid until the next fill(); copy it (bytes(line))
+if it has to outlive that.
+"""
+import re
+
+BUF_SIZE = 64 * 1024    # longest line the framer can hold; longer ones are dropped
+
+# lines the relay cares about hold one of these, anywhere and in any case (a log prefix or
+# timestamp may come before it); the yielded line starts at the match
+FORWARD_RE = re.compile(rb"\[SERIALFWD\]|http://script\.google\.com", re.I)
+LEADING_SPACE = b" \t\r"  # stripped from unfiltered lines (CRLF line ends leave a \r)
+
+
+class LineFramer:
+    def __init__(self, size=BUF_SIZE):
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.start = 0      # first byte of the current (unfinished) line
+        self.scan = 0       # newline search resumes here
+        self.end = 0        # end of valid data
+        self.lines = 0      # complete lines seen, including filtered ones
+        self.overflows = 0  # lines dropped for not fitting in the buffer
+
+    def fill(self, ser):
+        """Read whatever the port has (at least one byte or a timeout) into the free space.
+        Returns the byte count; 0 on timeout."""
+        if self.start:
+            # keep only the unfinished tail; previously yielded views become invalid here
+            tail = self.end - self.start
+            self.buf[:tail] = self.view[self.start:self.end]
+            self.scan -= self.start
+            self.start, self.end = 0, tail
+        if self.end == len(self.buf):
+            print(f"[FRAMING] line longer than {len(self.buf)} bytes dropped")
+            self.overflows += 1
+            self.start = self.scan = self.end = 0
+        free = self.view[self.end:]
+        want = min(len(free), max(1, ser.in_waiting))
+        n = ser.readinto(free[:want]) or 0
+        self.end += n
+        return n
+
+    def frames(self, pattern=None):
+        """Yield each complete line (without the newline or leading whitespace) as a
+        memoryview. With a compiled bytes pattern, only lines containing it are yielded,
+        from where it matched."""
+        buf = self.buf
+        while True:
+            nl = buf.find(b"\n", self.scan, self.end)
+            if nl < 0:
+                self.scan = self.end
+                return
+            start = self.start
+            self.start = self.scan = nl + 1
+            self.lines += 1
+            if pattern is not None:
+                m = pattern.search(buf, start, nl)
+                if m:
+                    yield self.view[m.start():nl]
+                continue
+            while start < nl and buf[start] in LEADING_SPACE:
+                start += 1
+            yield self.view[start:nl]
+
+    def reset(self):
+        self.start = self.scan = self.end = 0
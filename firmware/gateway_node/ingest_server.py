@@ -0,0 +1,305 @@
+"""
+Local ingest server: a drop-in for the Apps Script Logger (google_scripts/Logger.gs)
+python ingest_server.py --port 8088 --store ingest_store
+
+Accepts the same requests the Logger web app does, so the relay (or a gateway
+with a LAN uplink) can write here instead of to script.google.com:
+
+  GET  <any path>?sts=write&id=..&bc=..&bat=..&srs=..&temp=..&humd=..&Prs=..&wind=..&rfid=..
+  POST <any path>  JSON object or array, either query-style keys (the relay's
+                   --mode batch apps-script format) or buildIngestJson() rows
+  GET  <any path>?sts=read&id=<unit>[&since=<epoch s>][&limit=N]   columnar JSON
+  GET  /units                                                      known unit ids
+
+Writes are acknowledged as soon as they are buffered; a flusher thread appends
+them to one file per column per unit (stdlib array.tofile, Logger.gs units:
+bat in %, Prs in hPa) every FLUSH_INTERVAL seconds or FLUSH_ROWS readings.
+A torn flush is repaired on startup by truncating every column to the
+shortest one.
+"""
+import argparse, array, bisect, json, math, os, re, threading, time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from batcher import INGEST_KEYS, num
+
+HOST = "127.0.0.1"
+PORT = 8088
+STORE_DIR = "ingest_store"
+FLUSH_INTERVAL = 1.0   # seconds between flushes
+FLUSH_ROWS = 5000      # flush early once this many readings are buffered
+READ_LIMIT = 10000     # default max rows per read
+
+# column name -> array typecode; names are the Logger query keys. ts is the receive time
+# (reads are ordered by it), at the capture time the relay's spool sends as ts, if any.
+NUMERIC = {"ts": "d", "at": "d", "bc": "q", "bat": "f", "temp": "f", "humd": "f", "Prs": "f", "wind": "f"}
+TEXT = ("srs", "rfid")
+QUERY_KEYS = {v: k for k, v in INGEST_KEYS.items()}  # buildIngestJson keys -> query keys
+UNIT_RE = re.compile(r"^[A-Za-z0-9_:\-]{1,64}$")      # unit ids become directory names
+# ':' (MACs) isn't valid in Windows file names; '~' can't appear in an id, so the mapping reverses
+UNIT_SEP = "~"
+
+
+def from_ingest_row(row):
+    """buildIngestJson() payload -> Logger query params (bat back to %, pressure back to hPa)"""
+    params = {QUERY_KEYS[k]: v for k, v in row.items() if k in QUERY_KEYS}
+    volts = num(row.get("battery"))
+    params["bat"] = round((volts - 2.0) * 100.0, 1) if volts is not None else None
+    pa = num(row.get("pressure_pa"))
+    params["Prs"] = round(pa / 100.0, 2) if pa is not None else None
+    if row.get("recorded_at"):
+        try:
+            params["ts"] = datetime.fromisoformat(str(row["recorded_at"]).replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return params
+
+
+def to_record(params, ts):
+    """Query params -> one stored row. Missing numbers are NaN (bc: -1)."""
+    rec = {"id": str(params.get("id") or ""), "ts": ts}
+    at = num(params.get("ts"))
+    rec["at"] = at if at is not None else math.nan
+    boot = num(params.get("bc"))
+    rec["bc"] = int(boot) if boot is not None else -1
+    for key in ("bat", "temp", "humd", "Prs", "wind"):
+        value = num(params.get(key))
+        rec[key] = value if value is not None else math.nan
+    for key in TEXT:
+        value = params.get(key)
+        rec[key] = "" if value is None else str(value).replace("\n", " ")
+    return rec
+
+
+class ColumnStore:
+    """Append-only column files per unit: <root>/UNIT_<id>/<column>.<typecode|txt>"""
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()        # guards the pending buffer
+        self.write_lock = threading.Lock()  # one flush at a time; reads see whole flushes
+        self.pending = {}  # unit -> [record]
+        self.npending = 0
+        self.flushed = threading.Event()
+        os.makedirs(root, exist_ok=True)
+        for unit in self.units():
+            self.repair(unit)
+
+    def unit_dir(self, unit):
+        return os.path.join(self.root, "UNIT_" + unit.replace(":", UNIT_SEP))
+
+    def column_path(self, unit, name):
+        return os.path.join(self.unit_dir(unit), f"{name}.{NUMERIC.get(name, 'txt')}")
+
+    def units(self):
+        return sorted(d[5:].replace(UNIT_SEP, ":") for d in os.listdir(self.root) if d.startswith("UNIT_"))
+
+    def rows_on_disk(self, unit):
+        """Rows every column has; a torn flush leaves some columns longer"""
+        counts = []
+        for name, tc in NUMERIC.items():
+            path = self.column_path(unit, name)
+            counts.append(os.path.getsize(path) // array.array(tc).itemsize if os.path.exists(path) else 0)
+        for name in TEXT:
+            path = self.column_path(unit, name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    counts.append(sum(1 for _ in f))
+            else:
+                counts.append(0)
+        return min(counts)
+
+    def repair(self, unit, n=None):
+        """Cut every column back to n rows (default: the rows all columns have)"""
+        if n is None:
+            n = self.rows_on_disk(unit)
+        for name, tc in NUMERIC.items():
+            path = self.column_path(unit, name)
+            if os.path.exists(path) and os.path.getsize(path) > n * array.array(tc).itemsize:
+                with open(path, "r+b") as f:
+                    f.truncate(n * array.array(tc).itemsize)
+        for name in TEXT:
+            path = self.column_path(unit, name)
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                lines = f.readlines()
+            if len(lines) != n or (lines and not lines[-1].endswith(b"\n")):
+                with open(path, "wb") as f:
+                    f.writelines(line if line.endswith(b"\n") else line + b"\n" for line in lines[:n])
+        return n
+
+    def append(self, records):
+        with self.lock:
+            for rec in records:
+                self.pending.setdefault(rec["id"], []).append(rec)
+            self.npending += len(records)
+            return self.npending
+
+    def flush(self):
+        """Write buffered records to disk. Each unit leaves the buffer only once it is
+        written, so a failed write keeps it (and every unit after it) for the next flush."""
+        written = 0
+        with self.write_lock:
+            with self.lock:
+                pending = {unit: recs[:] for unit, recs in self.pending.items() if recs}
+            for unit, recs in pending.items():
+                os.makedirs(self.unit_dir(unit), exist_ok=True)
+                ts_path = self.column_path(unit, "ts")
+                before = os.path.getsize(ts_path) // 8 if os.path.exists(ts_path) else 0
+                try:
+                    self.write_unit(unit, recs)
+                except Exception:
+                    self.repair(unit, before)  # drop the torn rows; they are still pending
+                    raise
+                with self.lock:  # appends during the write went on the end
+                    del self.pending[unit][:len(recs)]
+                    if not self.pending[unit]:
+                        del self.pending[unit]
+                    self.npending -= len(recs)
+                written += len(recs)
+        return written
+
+    def write_unit(self, unit, recs):
+        for name in TEXT:
+            with open(self.column_path(unit, name), "a", encoding="utf-8", newline="\n") as f:
+                f.writelines(r[name] + "\n" for r in recs)
+        # ts goes last: a row only counts once its timestamp is on disk
+        for name in [n for n in NUMERIC if n != "ts"] + ["ts"]:
+            with open(self.column_path(unit, name), "ab") as f:
+                array.array(NUMERIC[name], (r[name] for r in recs)).tofile(f)
+
+    def read(self, unit, since=None, limit=READ_LIMIT):
+        """Columns for one unit as {name: [values]}, oldest first. With a limit, the newest rows."""
+        with self.write_lock:  # columns are only ever uneven mid-flush, so ts gives the row count
+            ts_path = self.column_path(unit, "ts")
+            n = os.path.getsize(ts_path) // 8 if os.path.exists(ts_path) else 0
+            cols = {name: array.array(tc) for name, tc in NUMERIC.items()}
+            if n:
+                with open(self.column_path(unit, "ts"), "rb") as f:
+                    cols["ts"].fromfile(f, n)
+            start = bisect.bisect_left(cols["ts"], since) if since is not None else 0
+            start = max(start, n - limit) if limit else start
+            cols["ts"] = cols["ts"][start:]
+            for name, tc in NUMERIC.items():
+                if name == "ts" or not n:
+                    continue
+                with open(self.column_path(unit, name), "rb") as f:
+                    f.seek(start * cols[name].itemsize)
+                    cols[name].fromfile(f, n - start)
+            out = {name: list(values) for name, values in cols.items()}
+            for name in TEXT:
+                if n:
+                    with open(self.column_path(unit, name), encoding="utf-8") as f:
+                        out[name] = [line.rstrip("\n") for line in f][start:n]
+                else:
+                    out[name] = []
+            with self.lock:
+                recent = [r for r in self.pending.get(unit, []) if since is None or r["ts"] >= since]
+        for rec in recent:
+            for name in out:
+                out[name].append(rec[name])
+        if limit and len(out["ts"]) > limit:
+            out = {name: values[-limit:] for name, values in out.items()}
+        for name, tc in NUMERIC.items():  # JSON has no NaN; float32 columns back to readable decimals
+            out[name] = [None if isinstance(v, float) and math.isnan(v) else round(v, 4) if tc == "f" else v
+                         for v in out[name]]
+        return out
+
+
+def flusher(store, interval, stop):
+    while not stop.is_set():
+        store.flushed.wait(interval)
+        store.flushed.clear()
+        try:
+            store.flush()
+        except Exception as e:
+            print(f"[STORE ERROR] flush failed: {e}")
+    store.flush()
+
+
+def make_handler(store, flush_rows):
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, code, body, ctype="text/plain; charset=utf-8"):
+            data = body.encode()
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def ingest(self, params_list, bulk=False):
+            now = time.time()
+            records = [to_record(p, now) for p in params_list]
+            bad = [r["id"] for r in records if not UNIT_RE.match(r["id"])]
+            if bad:
+                return self.reply(400, f"❌ Bad or missing 'id': {bad[0]!r}")
+            if store.append(records) >= flush_rows:
+                store.flushed.set()
+            self.reply(200, f"OK {len(records)}" if bulk else "OK")  # the relay's batcher checks the count
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path == "/units":
+                return self.reply(200, json.dumps(store.units()), "application/json")
+            params = {k: v[0] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+            if not params.get("id"):
+                return self.reply(200, "❌ Missing required parameter 'id'")
+            if params.get("sts") == "read":
+                if not UNIT_RE.match(params["id"]):
+                    return self.reply(400, "❌ Bad 'id'")
+                since, limit = num(params.get("since")), num(params.get("limit"))
+                cols = store.read(params["id"], since, int(limit) if limit else READ_LIMIT)
+                return self.reply(200, json.dumps(cols, separators=(",", ":")), "application/json")
+            self.ingest([params])
+
+        def do_POST(self):
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+            except ValueError:
+                return self.reply(400, "❌ Body is not JSON")
+            items = body if isinstance(body, list) else [body]
+            if not items or not all(isinstance(i, dict) for i in items):
+                return self.reply(400, "❌ Expected a JSON object or array of objects")
+            self.ingest([from_ingest_row(i) if "device_mac" in i else i for i in items], bulk=True)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Local drop-in for the Apps Script Logger")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--store", default=STORE_DIR, help="column store directory")
+    ap.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL, help="seconds")
+    ap.add_argument("--flush-rows", type=int, default=FLUSH_ROWS)
+    return ap.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    store = ColumnStore(args.store)
+    stop = threading.Event()
+    flush_thread = threading.Thread(target=flusher, args=(store, args.flush_interval, stop),
+                                    name="flusher", daemon=True)
+    flush_thread.start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store, args.flush_rows))
+    server.daemon_threads = True
+    print(f"[INFO] Ingest on http://{args.host}:{server.server_address[1]} | store {args.store} "
+          f"| {len(store.units())} units")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[EXIT] Interrupted")
+    finally:
+        server.server_close()
+        stop.set(); store.flushed.set()
+        flush_thread.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Throughput counters and a Prometheus /metrics endpoint for relay.py
+
+Counters are cumulative (Prometheus computes rates); the periodic console
+summary shows per-second rates over the last interval instead. Upstream
+latency is kept in a rolling window of recent requests for p50/p95/p99; the
+summary's _sum and _count are running totals like the counters.
+"""
+import threading, time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = 9108        # 0 disables the endpoint
+SUMMARY_INTERVAL = 60      # seconds between [STATS] lines, 0 disables
+LATENCY_WINDOW = 2048      # most recent upstream requests used for percentiles
+
+HELP = {
+    "relay_serial_lines_total": ("counter", "Lines read from the gateway serial port"),
+    "relay_readings_total": ("counter", "Forwardable readings parsed from serial"),
+    "relay_forwards_total": ("counter", "Upstream requests by result"),
+    "relay_delivered_total": ("counter", "Readings acknowledged by upstream"),
+    "relay_drops_total": ("counter", "Readings dropped, by reason"),
+    "relay_serial_reconnects_total": ("counter", "Serial port reopen attempts after an error"),
+    "relay_upstream_latency_seconds": ("summary", "Upstream request latency"),
+    "relay_queue_depth": ("gauge", "Readings leased to workers and not yet finished"),
+    "relay_spool_pending": ("gauge", "Readings in the spool awaiting delivery"),
+    "relay_serial_ports_active": ("gauge", "Serial ports with a running reader (--supervise)"),
+}
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def fmt_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class RelayMetrics:
+    """Thread-safe: serial reader threads, the event loop and the HTTP server all touch it"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}  # (name, ((label, value), ...)) -> count
+        self.latency = deque(maxlen=LATENCY_WINDOW)
+        self.latency_sum = 0.0  # all requests ever, not just the window
+        self.latency_count = 0
+        self.gauges = {}    # name -> callable returning the current value
+        self.last_summary = (time.monotonic(), {})
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe_latency(self, seconds):
+        with self.lock:
+            self.latency.append(seconds)
+            self.latency_sum += seconds
+            self.latency_count += 1
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def total(self, name, **labels):
+        """Sum of a counter over all label sets matching `labels`"""
+        want = set(labels.items())
+        with self.lock:
+            return sum(v for (n, l), v in self.counters.items() if n == name and want <= set(l))
+
+    def latency_quantiles(self):
+        with self.lock:
+            values = sorted(self.latency)
+        return {q: percentile(values, q) for q in (0.5, 0.95, 0.99)}, len(values)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self.lock:
+            counters = dict(self.counters)
+        lines = []
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for name, kind_help in HELP.items():
+            kind, text = kind_help
+            if kind == "counter":
+                samples = by_name.get(name, [((), 0)])
+                lines += [f"# HELP {name} {text}", f"# TYPE {name} counter"]
+                lines += [f"{name}{fmt_labels(l)} {v}" for l, v in sorted(samples)]
+            elif kind == "gauge" and name in self.gauges:
+                try:
+                    value = self.gauges[name]()
+                except Exception:
+                    continue
+                lines += [f"# HELP {name} {text}", f"# TYPE {name} gauge", f"{name} {value}"]
+            elif kind == "summary":
+                quantiles, _ = self.latency_quantiles()
+                with self.lock:
+                    total, count = self.latency_sum, self.latency_count
+                lines += [f"# HELP {name} {text}", f"# TYPE {name} summary"]
+                lines += [f'{name}{{quantile="{q}"}} {v:.6f}' for q, v in quantiles.items()]
+                lines += [f"{name}_sum {total:.6f}", f"{name}_count {count}"]
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """One [STATS] line with rates since the previous summary"""
+        now = time.monotonic()
+        names = ("relay_serial_lines_total", "relay_readings_total", "relay_delivered_total")
+        current = {n: self.total(n) for n in names}
+        current["forwards"] = self.total("relay_forwards_total")
+        current["errors"] = self.total("relay_forwards_total", result="error")
+        current["drops"] = self.total("relay_drops_total")
+        then, previous = self.last_summary
+        self.last_summary = (now, current)
+        dt = max(1e-6, now - then)
+        rate = {k: (v - previous.get(k, 0)) / dt for k, v in current.items()}
+
+        q, _ = self.latency_quantiles()
+        gauges = {}
+        for name in ("relay_queue_depth", "relay_spool_pending"):
+            try:
+                gauges[name] = self.gauges[name]() if name in self.gauges else 0
+            except Exception:
+                gauges[name] = "?"
+        return (f"[STATS] lines {rate['relay_serial_lines_total']:.1f}/s | "
+                f"readings {rate['relay_readings_total']:.1f}/s | "
+                f"forwards {rate['forwards']:.1f}/s ({rate['errors']:.1f} err/s) | "
+                f"delivered {rate['relay_delivered_total']:.1f}/s | "
+                f"latency p50 {q[0.5] * 1000:.0f} p95 {q[0.95] * 1000:.0f} p99 {q[0.99] * 1000:.0f} ms | "
+                f"queue {gauges['relay_queue_depth']} | spool {gauges['relay_spool_pending']} | "
+                f"drops {current['drops']} | reconnects {self.total('relay_serial_reconnects_total')}")
+
+    def port_summary(self):
+        """One [PORTS] line with per-port line/reading totals and reconnects"""
+        with self.lock:
+            counters = dict(self.counters)
+        ports = {}
+        for (name, labels), value in counters.items():
+            port = dict(labels).get("port")
+            if port is not None:
+                ports.setdefault(port, {})[name] = value
+        if not ports:
+            return "[PORTS] none"
+        return "[PORTS] " + " | ".join(
+            f"{port} lines {c.get('relay_serial_lines_total', 0)} "
+            f"readings {c.get('relay_readings_total', 0)} "
+            f"reconnects {c.get('relay_serial_reconnects_total', 0)}"
+            for port, c in sorted(ports.items()))
+
+
+def serve_metrics(metrics, port, host="127.0.0.1"):
+    """Start the /metrics endpoint on a daemon thread. Returns the server (call shutdown())."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404); self.end_headers(); return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # keep the console for relay output
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"[INFO] Metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -1,56 +1,465 @@
 """
 ESP32 Serial → HTTPS Forwarder
 pip install pyserial requests
+
+The serial port is read on its own thread, which writes every forwardable
+URL to a durable spool (spool.py) before anything else happens. A drainer
+leases due entries from the spool into a bounded in-memory queue, and a pool
+of asyncio workers forwards them over a keep-alive connection pool with a
+token-bucket rate limit per destination host. Delivered entries are acked,
+failed ones are retried with exponential backoff, so neither a slow response
+nor a multi-hour outage loses readings or stalls the serial reader.
+
+--mode single (default) keeps the original one GET per reading. --mode batch
+posts readings as JSON arrays to a bulk endpoint instead (batcher.py).
+
+--supervise runs one reader thread per gateway found by USB VID:PID and
+rescans for hot-plugged ports; every reader shares the one spool, connection
+pool and metrics, and serial counters carry a port label.
+
+Serial input is framed by framing.py without per-line buffer copies.
 """
-import re, time, sys
+import argparse, asyncio, re, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 import serial, requests
 import urllib3
+from spool import Spool, backoff, stamp
+from framing import LineFramer, FORWARD_RE
+from batcher import Batcher, BATCH_SIZE, BATCH_WINDOW
+from metrics import RelayMetrics, serve_metrics, METRICS_PORT, SUMMARY_INTERVAL
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 PORT = "COM23"      # <-- set your ESP32-C6 port
 BAUD = 115200
 SER_TIMEOUT = 0.2
-HTTP_TIMEOUT = 12
+HTTP_TIMEOUT = 12  # keep above Logger.gs LOCK_TIMEOUT_MS (8 s), or a post that timed out here can still land
+QUEUE_SIZE = 1000   # spooled readings leased to the workers at once
+SPOOL_PATH = "relay_spool.db"
+COMPACT_INTERVAL = 60  # seconds between spool compactions
+WORKERS = 8         # concurrent outbound requests
+DEFAULT_RATE = 10.0                     # requests/s per destination host
+RATE_LIMITS = {"script.google.com": 5.0}  # per-host overrides (Apps Script quotas)
+USB_IDS = ["303A:1001", "10C4:EA60", "1A86:7523", "1A86:55D4"]  # ESP32-C6 USB-JTAG, CP210x, CH340, CH9102
+RESCAN_INTERVAL = 2.0  # seconds between port scans in --supervise mode
+USB_ID_RE = re.compile(r"^[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}$")  # USB ids are 16-bit
 LINE_RE = re.compile(r'(?:\[SERIALFWD\])?(http://script\.google\.com\S+)', re.I)
 
-def main():
-    try:
-        ser = serial.Serial(PORT, BAUD, timeout=SER_TIMEOUT)
-    except serial.SerialException as e:
-        print(f"[ERROR] {e}"); sys.exit(1)
 
-    print(f"[INFO] Listening on {PORT} @ {BAUD}")
-    sess = requests.Session()
-    buf = b""
+class RateLimiter:
+    """Token bucket per destination host. acquire() waits until a request may go out."""
+
+    def __init__(self, default_rate=DEFAULT_RATE, limits=None):
+        self.default_rate = default_rate
+        self.limits = dict(limits or {})
+        self.buckets = {}  # host -> [tokens, last refill time, lock]
+
+    async def acquire(self, host):
+        rate = self.limits.get(host, self.default_rate)
+        if not rate:
+            return
+        capacity = max(1.0, rate)  # burst of one second, but always room for one request
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = [capacity, time.monotonic(), asyncio.Lock()]
+
+        async with bucket[2]:  # one waiter at a time keeps the bucket fair
+            while True:
+                now = time.monotonic()
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                if bucket[0] >= 1:
+                    bucket[0] -= 1
+                    return
+                await asyncio.sleep((1 - bucket[0]) / rate)  # exactly until the next token
+
+
+class SerialReader(threading.Thread):
+    """Reads the gateway's serial port and passes every forwardable URL to on_url().
+    Runs on its own thread so HTTP latency can never block serial reads."""
+
+    def __init__(self, port, baud, on_url, metrics, reconnect=True):
+        super().__init__(name=f"serial-{port}", daemon=True)
+        self.port = port
+        self.baud = baud
+        self.on_url = on_url
+        self.metrics = metrics
+        self.reconnect = reconnect  # False: exit on error and let the Supervisor restart us
+        self.stop_event = threading.Event()
+
+    def open(self):
+        while not self.stop_event.is_set():
+            try:
+                return serial.Serial(self.port, self.baud, timeout=SER_TIMEOUT)
+            except serial.SerialException as e:
+                print(f"[ERROR] {e}")
+                if not self.reconnect:
+                    break
+                self.stop_event.wait(2.0)
+        return None
+
+    def run(self):
+        ser = self.open()
+        if ser is None:
+            return
+        print(f"[INFO] Listening on {self.port} @ {self.baud}")
+        framer = LineFramer()
+
+        while not self.stop_event.is_set():
+            try:
+                if not framer.fill(ser):  # blocks up to SER_TIMEOUT, no extra sleep needed
+                    continue
+                seen, readings = framer.lines, 0
+                for line in framer.frames(FORWARD_RE):
+                    m = LINE_RE.search(str(line, "utf-8", "ignore"))
+                    if not m:
+                        continue
+                    readings += 1
+                    self.on_url(m.group(1).replace("http://", "https://", 1))
+                if framer.lines != seen:
+                    self.metrics.inc("relay_serial_lines_total", framer.lines - seen, port=self.port)
+                if readings:
+                    self.metrics.inc("relay_readings_total", readings, port=self.port)
+
+            except serial.SerialException as e:
+                try: ser.close()
+                except Exception: pass
+                if not self.reconnect:
+                    print(f"[SERIAL ERROR] {e} — {self.port} gone")
+                    ser = None
+                    break
+                print(f"[SERIAL ERROR] {e} — reopening {self.port}")
+                self.metrics.inc("relay_serial_reconnects_total", port=self.port)
+                ser = self.open()
+                if ser is None:
+                    break
+                framer.reset()
+            except Exception as e:
+                print(f"[ERROR] {e}"); time.sleep(0.3)
+
+        if ser is not None:
+            ser.close()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def retarget(url, upstream):
+    """Send a reading to another Logger-compatible endpoint (e.g. ingest_server.py), same query"""
+    query = urlsplit(url).query
+    return f"{upstream}?{query}" if query else upstream
+
+
+def discover_ports(usb_ids):
+    """Serial ports whose USB VID:PID is in usb_ids (hex strings like "303A:1001")"""
+    from serial.tools import list_ports
+    wanted = {tuple(int(x, 16) for x in i.split(":")) for i in usb_ids}
+    return sorted(p.device for p in list_ports.comports() if (p.vid, p.pid) in wanted)
+
+
+class Supervisor:
+    """Runs one SerialReader per gateway and hot-plugs them: ports found by VID:PID
+    get a reader when they appear and lose it when they disappear. Ports named
+    with --port are always kept and reopen on their own like a single reader."""
+
+    def __init__(self, baud, on_url, metrics, usb_ids=USB_IDS, static_ports=(), interval=RESCAN_INTERVAL):
+        self.baud = baud
+        self.on_url = on_url
+        self.metrics = metrics
+        self.usb_ids = usb_ids
+        self.static_ports = set(static_ports)
+        self.interval = interval
+        self.readers = {}  # port -> SerialReader
+
+    def scan(self):
+        try:
+            present = set(discover_ports(self.usb_ids))
+        except Exception as e:
+            print(f"[SCAN ERROR] {e}")
+            return
+        present |= self.static_ports
+        for port, reader in list(self.readers.items()):
+            if port not in present:
+                print(f"[UNPLUG] {port}")
+                reader.stop()
+                del self.readers[port]
+            elif not reader.is_alive():  # read error; restart it if the port is still listed
+                del self.readers[port]
+        for port in sorted(present - self.readers.keys()):
+            print(f"[PLUG] {port}")
+            reader = SerialReader(port, self.baud, self.on_url, self.metrics,
+                                  reconnect=port in self.static_ports)
+            self.readers[port] = reader
+            reader.start()
+
+    async def run(self):
+        while True:
+            await asyncio.to_thread(self.scan)  # port enumeration can block for a while
+            await asyncio.sleep(self.interval)
+
+    def active(self):
+        return sum(r.is_alive() for r in self.readers.values())
+
+    def stop(self):
+        for reader in self.readers.values():
+            reader.stop()
+        for reader in self.readers.values():
+            reader.join(timeout=2 * SER_TIMEOUT)
+
+
+class Forwarder:
+    """Outbound side: a pooled keep-alive requests.Session driven from asyncio.
+    Blocking requests calls run on a dedicated executor sized to the worker count."""
+
+    def __init__(self, metrics, workers=WORKERS, limiter=None):
+        self.sess = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+        self.sess.mount("http://", adapter)
+        self.sess.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http")
+        self.limiter = limiter or RateLimiter()
+        self.metrics = metrics
+
+    async def timed(self, fn, *args):
+        """Run a blocking request on the executor, recording latency and result"""
+        loop = asyncio.get_running_loop()
+        t0 = time.monotonic()
+        try:
+            r = await loop.run_in_executor(self.executor, fn, *args)
+        except Exception:
+            self.metrics.inc("relay_forwards_total", result="error")
+            raise
+        self.metrics.observe_latency(time.monotonic() - t0)
+        self.metrics.inc("relay_forwards_total", result="error" if r.status_code >= 400 else "ok")
+        return r
 
+    def _get(self, url):
+        return self.sess.get(url, timeout=HTTP_TIMEOUT, allow_redirects=True, verify=False)
+
+    def _post(self, url, body, headers):
+        return self.sess.post(url, data=body, headers=headers, timeout=HTTP_TIMEOUT,
+                              allow_redirects=True, verify=False)
+
+    async def forward(self, url):
+        await self.limiter.acquire(urlsplit(url).hostname)
+        return await self.timed(self._get, url)
+
+    async def post(self, url, body, headers):
+        await self.limiter.acquire(urlsplit(url).hostname)
+        return await self.timed(self._post, url, body, headers)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.sess.close()
+
+
+def delivered(status):
+    """2xx/3xx is delivered; other 4xx is a permanent rejection that retrying won't fix"""
+    return status < 400 or (status < 500 and status not in (408, 429))
+
+
+async def worker(queue, fwd, spool, health, metrics):
     while True:
+        entry_id, url, attempts, created_at = await queue.get()
+        print(f"[FORWARD] {url}")
         try:
-            chunk = ser.read(512)
-            if chunk: buf += chunk
-            else: 
-                time.sleep(0.02); continue
-
-            while b"\n" in buf:
-                line, buf = buf.split(b"\n", 1)
-                text = line.decode("utf-8", "ignore").strip()
-                m = LINE_RE.search(text)
-                if not m: 
-                    continue
+            r = await fwd.forward(stamp(url, created_at))
+            print(f"[RESP] {r.status_code} | {r.text[:120]!r}")
+            ok = delivered(r.status_code)
+            if ok and r.status_code >= 400:
+                print(f"[REJECTED] {r.status_code} — dropping {url[:80]}")
+                metrics.inc("relay_drops_total", reason="rejected")
+            elif ok:
+                metrics.inc("relay_delivered_total")
+        except requests.RequestException as e:
+            print(f"[HTTP ERROR] {e}")
+            ok = False
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            ok = False
+        finally:
+            queue.task_done()
+
+        if ok:
+            await spool.call(spool.ack, entry_id)
+            health["failures"] = 0
+        else:
+            await spool.call(spool.retry, entry_id, attempts + 1)
+            health["failures"] += 1
+
+
+async def drainer(queue, spool, kick, health):
+    """Moves due spool entries into the worker queue. While the uplink is failing it
+    backs off exponentially and only sends one probe per round; the first success
+    resumes draining at full speed."""
+    outage = 0
+    while True:
+        if health["failures"]:
+            outage += 1
+            await asyncio.sleep(backoff(outage))
+        else:
+            outage = 0
+
+        free = queue.maxsize - queue.qsize()
+        if free == 0:  # workers are busy, check back shortly
+            await asyncio.sleep(0.05)
+            continue
+        limit = 1 if health["failures"] else free
+        rows = await spool.call(spool.claim, limit)
+        for row in rows:
+            queue.put_nowait(row)
+        if rows and len(rows) == limit:
+            if health["failures"]:  # let the probe finish before deciding what to do next
+                await queue.join()
+            else:  # there may be more due right now
+                await asyncio.sleep(0)
+            continue
+
+        # nothing (more) due: wait for a new reading or the next scheduled retry
+        kick.clear()
+        due = await spool.call(spool.next_due)
+        timeout = 1.0 if due is None else min(max(due, 0.05), 1.0)
+        try:
+            await asyncio.wait_for(kick.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
 
-                url_http = m.group(1)
-                url_https = url_http.replace("http://", "https://", 1)
-                print(f"[FORWARD] {url_https}")
+async def reporter(metrics, interval, per_port=False):
+    metrics.summary()  # sets the baseline for the first interval
+    while True:
+        await asyncio.sleep(interval)
+        print(metrics.summary())
+        if per_port:
+            print(metrics.port_summary())
 
-                try:
-                    r = sess.get(url_https, timeout=HTTP_TIMEOUT, allow_redirects=True, verify=False)
-                    print(f"[RESP] {r.status_code} | {r.text[:120]!r}")
-                except requests.RequestException as e:
-                    print(f"[HTTP ERROR] {e}")
 
-        except KeyboardInterrupt:
-            print("\n[EXIT] Interrupted"); break
+async def compactor(spool):
+    while True:
+        await asyncio.sleep(COMPACT_INTERVAL)
+        try:
+            await spool.call(spool.compact)
         except Exception as e:
-            print(f"[ERROR] {e}"); time.sleep(0.3)
+            print(f"[SPOOL ERROR] compaction failed: {e}")
+
+
+async def run_relay(args):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=args.queue)
+    spool = Spool(args.spool)
+    kick = asyncio.Event()
+    health = {"failures": 0}  # consecutive forward failures, shared by workers and drainer
+    metrics = RelayMetrics()
+    metrics.gauge("relay_spool_pending", spool.pending)
+    server = serve_metrics(metrics, args.metrics_port) if args.metrics_port else None
+    print(f"[SPOOL] {args.spool} | {spool.pending()} readings pending")
+
+    def on_url(url):  # serial reader thread: persist first, then wake the drainer
+        if args.upstream:
+            url = retarget(url, args.upstream)
+        if spool.put(url):
+            loop.call_soon_threadsafe(kick.set)
+        else:
+            print(f"[DUP] {url[:80]}")
+            metrics.inc("relay_drops_total", reason="duplicate")
+
+    fwd = Forwarder(metrics, args.workers, RateLimiter(args.default_rate, {**RATE_LIMITS, **args.rate}))
+    if args.supervise:
+        supervisor = Supervisor(args.baud, on_url, metrics, args.vid_pid or USB_IDS,
+                                args.port or (), args.rescan)
+        metrics.gauge("relay_serial_ports_active", supervisor.active)
+    else:
+        supervisor = None
+        reader = SerialReader(args.port[0] if args.port else PORT, args.baud, on_url, metrics)
+        reader.start()
+
+    batcher = None
+    if args.mode == "batch":
+        batcher = Batcher(spool, fwd, kick, health, metrics, args.bulk_format, args.bulk_url, args.bulk_key,
+                          args.batch_size, args.batch_window, concurrency=args.workers)
+        tasks = [asyncio.create_task(batcher.run())]
+        metrics.gauge("relay_queue_depth", lambda: batcher.leased)
+    else:
+        tasks = [asyncio.create_task(worker(queue, fwd, spool, health, metrics)) for _ in range(args.workers)]
+        tasks.append(asyncio.create_task(drainer(queue, spool, kick, health)))
+        metrics.gauge("relay_queue_depth", queue.qsize)
+    tasks.append(asyncio.create_task(compactor(spool)))
+    if args.summary_interval:
+        tasks.append(asyncio.create_task(reporter(metrics, args.summary_interval, per_port=bool(supervisor))))
+    try:
+        if supervisor:
+            await supervisor.run()
+        else:
+            while reader.is_alive():
+                await asyncio.sleep(0.5)
+    finally:
+        if supervisor: supervisor.stop()
+        else: reader.stop()
+        if batcher: batcher.cancel()
+        for t in tasks: t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        fwd.close()
+        if server: server.shutdown()
+        if not supervisor: reader.join(timeout=2 * SER_TIMEOUT)
+        spool.close()
+
+
+def parse_rate(value):
+    host, _, rate = value.partition("=")
+    try:
+        return host, float(rate)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected HOST=REQUESTS_PER_SECOND")
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="ESP32 serial → HTTPS forwarder")
+    ap.add_argument("--port", action="append",
+                    help=f"serial port (default {PORT}); repeatable, always kept open with --supervise")
+    ap.add_argument("--supervise", action="store_true",
+                    help="discover gateways by USB VID:PID and run one reader per port, hot-plugging them")
+    ap.add_argument("--vid-pid", action="append", metavar="VID:PID",
+                    help=f"USB ids to supervise (repeatable, default {' '.join(USB_IDS)})")
+    ap.add_argument("--rescan", type=float, default=RESCAN_INTERVAL, help="seconds between port scans")
+    ap.add_argument("--baud", type=int, default=BAUD)
+    ap.add_argument("--workers", type=int, default=WORKERS, help="concurrent outbound requests")
+    ap.add_argument("--queue", type=int, default=QUEUE_SIZE, help="max spooled readings leased to workers at once")
+    ap.add_argument("--spool", default=SPOOL_PATH, help="SQLite spool file (store-and-forward)")
+    ap.add_argument("--default-rate", type=float, default=DEFAULT_RATE,
+                    help="requests/s per destination host (0 = unlimited)")
+    ap.add_argument("--rate", type=parse_rate, action="append", default=[],
+                    metavar="HOST=RPS", help="per-host rate limit override (repeatable)")
+    ap.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                    help="local Prometheus /metrics port (0 = off)")
+    ap.add_argument("--summary-interval", type=float, default=SUMMARY_INTERVAL,
+                    help="seconds between [STATS] console summaries (0 = off)")
+    ap.add_argument("--mode", choices=["single", "batch"], default="single",
+                    help="single: one GET per reading (original); batch: JSON arrays to a bulk endpoint")
+    ap.add_argument("--upstream", help="forward readings here instead of script.google.com, "
+                                       "e.g. http://127.0.0.1:8088/exec (ingest_server.py)")
+    ap.add_argument("--bulk-format", choices=["apps-script", "supabase"], default="apps-script")
+    ap.add_argument("--bulk-url", help="bulk endpoint (default for apps-script: the reading's /exec URL)")
+    ap.add_argument("--bulk-key", help="Supabase anon key for the ingest_logs function")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    ap.add_argument("--batch-window", type=float, default=BATCH_WINDOW, help="seconds")
+    args = ap.parse_args(argv)
+    args.rate = dict(args.rate)
+    if args.port and len(args.port) > 1 and not args.supervise:
+        ap.error("several --port values need --supervise")
+    for usb_id in args.vid_pid or ():
+        if not USB_ID_RE.match(usb_id):
+            ap.error(f"bad --vid-pid {usb_id!r}, expected hex VID:PID")
+    if args.mode == "batch" and args.bulk_format == "supabase" and not args.bulk_url:
+        ap.error("--bulk-url is required for --bulk-format supabase")
+    return args
+
+
+def main():
+    args = parse_args()
+    try:
+        asyncio.run(run_relay(args))
+    except KeyboardInterrupt:
+        print("\n[EXIT] Interrupted")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,177 @@
+"""
+Durable store-and-forward spool for relay.py
+
+Every forwardable line is written to a SQLite (WAL) file before any HTTP
+attempt, so an uplink outage never loses readings. Entries are leased out to
+the forwarders, acknowledged (deleted) on delivery, or rescheduled with
+exponential backoff on failure. Readings are de-duplicated by device + boot
+count, which the firmware puts in the `id` and `bc` query parameters.
+
+Each entry keeps the time it was spooled, which goes upstream as `ts` (epoch
+seconds) so a reading replayed after an outage is logged at its capture time.
+SQLite calls from the event loop go through call(), on the spool's own thread.
+"""
+import asyncio, random, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+BACKOFF_BASE = 2.0      # seconds before the first retry
+BACKOFF_MAX = 300.0     # never wait more than 5 minutes between retries
+LEASE_SECONDS = 60.0    # an entry handed to a forwarder is hidden this long (crash safety)
+DEDUP_WINDOW = 24 * 3600  # remember delivered device+boot keys this long
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedup_key    TEXT UNIQUE,            -- device + boot count, NULL if the line has neither
+    url          TEXT NOT NULL,
+    created_at   REAL NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_spool_due ON spool(next_attempt, id);
+
+-- delivered keys, so a late duplicate is still recognised after compaction
+CREATE TABLE IF NOT EXISTS delivered (
+    dedup_key    TEXT PRIMARY KEY,
+    delivered_at REAL NOT NULL
+);
+"""
+
+
+def backoff(attempts):
+    """Exponential backoff with jitter: 2, 4, 8 ... capped at BACKOFF_MAX seconds"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def dedup_key(url):
+    """device+boot from the firmware query string (id=<mac>&bc=<bootCount>)"""
+    qs = parse_qs(urlsplit(url).query)
+    dev, boot = qs.get("id", [""])[0], qs.get("bc", [""])[0]
+    if not dev or not boot:
+        return None
+    return f"{dev}:{boot}"
+
+
+def stamp(url, created_at):
+    """Add the capture time as ts=<epoch s> unless the line already carries one"""
+    query = urlsplit(url).query
+    if "ts" in parse_qs(query):
+        return url
+    return f"{url}{'&' if query else '?'}ts={created_at:.3f}"
+
+
+class Spool:
+    """Thread-safe: the serial reader thread appends, the event loop drains"""
+
+    def __init__(self, path, dedup_window=DEDUP_WINDOW):
+        self.path = path
+        self.dedup_window = dedup_window
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL survives process crashes
+        self.db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.db.executescript(SCHEMA)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spool")
+
+    async def call(self, fn, *args):
+        """Run a spool method off the event loop, like the HTTP calls in relay.Forwarder"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def put(self, url):
+        """Persist one reading. Returns False if it duplicates a spooled or delivered reading."""
+        key = dedup_key(url)
+        with self.lock:
+            if key is not None and self.db.execute(
+                    "SELECT 1 FROM delivered WHERE dedup_key = ?", (key,)).fetchone():
+                return False
+            cur = self.db.execute(
+                "INSERT OR IGNORE INTO spool (dedup_key, url, created_at) VALUES (?, ?, ?)",
+                (key, url, time.time()))
+            return cur.rowcount == 1
+
+    def claim(self, limit):
+        """Lease up to `limit` due entries, oldest first. Returns [(id, url, attempts, created_at)]."""
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.db.execute(
+                    "SELECT id, url, attempts, created_at FROM spool WHERE next_attempt <= ? ORDER BY id LIMIT ?",
+                    (now, limit)).fetchall()
+                if rows:
+                    self.db.executemany(
+                        "UPDATE spool SET next_attempt = ? WHERE id = ?",
+                        [(now + LEASE_SECONDS, r[0]) for r in rows])
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return rows
+
+    def ack(self, entry_id):
+        """Delivered: drop the entry, remember its key for de-duplication"""
+        self.ack_many([entry_id])
+
+    def ack_many(self, entry_ids):
+        """Delivered as one batch"""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                for entry_id in entry_ids:
+                    row = self.db.execute("SELECT dedup_key FROM spool WHERE id = ?", (entry_id,)).fetchone()
+                    if row and row[0] is not None:
+                        self.db.execute("INSERT OR REPLACE INTO delivered VALUES (?, ?)", (row[0], now))
+                self.db.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in entry_ids])
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def retry_many(self, entries):
+        """Reschedule [(id, attempts)] with exponential backoff"""
+        now = time.time()
+        with self.lock:
+            self.db.executemany(
+                "UPDATE spool SET attempts = ?, next_attempt = ? WHERE id = ?",
+                [(attempts, now + backoff(attempts), entry_id) for entry_id, attempts in entries])
+
+    def retry(self, entry_id, attempts):
+        """Failed: reschedule with exponential backoff"""
+        with self.lock:
+            self.db.execute(
+                "UPDATE spool SET attempts = ?, next_attempt = ? WHERE id = ?",
+                (attempts, time.time() + backoff(attempts), entry_id))
+
+    def pending(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def due_count(self):
+        with self.lock:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM spool WHERE next_attempt <= ?", (time.time(),)).fetchone()[0]
+
+    def next_due(self):
+        """Seconds until the earliest entry is due (0 if one is due now, None if empty)"""
+        with self.lock:
+            row = self.db.execute("SELECT MIN(next_attempt) FROM spool").fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def compact(self):
+        """Forget old delivered keys, fold the WAL back and return free pages to the OS"""
+        with self.lock:
+            self.db.execute("DELETE FROM delivered WHERE delivered_at < ?",
+                            (time.time() - self.dedup_window,))
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.db.execute("PRAGMA incremental_vacuum")
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        with self.lock:
+            self.db.close()
@@ -15,6 +15,22 @@
  *   humd  - relative humidity in %
  *   Prs   - pressure in hPa
  *   rfid  - optional RFID tag UID
+ *   ts    - optional capture time in epoch seconds (the relay's spool time);
+ *           Date/Time use it instead of the time the row is written
+ *
+ * POST (bulk): a JSON array of objects with the same keys as the URL
+ * parameters, e.g. [{"id":"10","bc":"11","temp":"21.5",...}, ...]. Readings
+ * are grouped by UNIT_ sheet and each group is written with one setValues().
+ * Both doGet and doPost append under a script lock, so concurrent writers
+ * can't land on the same row, and the last row of each sheet is cached so
+ * getLastRow() is only called on a cache miss. If rows are added to a UNIT_
+ * sheet by hand, run clearRowCache() afterwards.
+ *
+ * doPost always answers JSON, since Apps Script returns HTTP 200 either way:
+ *   {"ok":true,"written":n,"total":t,"skipped":[i,...]}  skipped: indexes of
+ *       readings without an id, which will never be written
+ *   {"ok":false,"error":"...","retry":true|false}  retry: a transient failure
+ *       (lock timeout, Sheets error) - send the whole batch again later
  *
  *Web app URL                     : https://script.google.com/macros/s/AKfycbwvnyAISRYpsSrVg3Q_iQxo-0IE9O1ZQ2iene4haoByh6OMdxs4X6Y8S--dDjlUuxHr/exec
 
@@ -23,6 +39,16 @@
  *Web app URL Test Read  : https://script.google.com/macros/s/AKfycbwvnyAISRYpsSrVg3Q_iQxo-0IE9O1ZQ2iene4haoByh6OMdxs4X6Y8S--dDjlUuxHr/exec?sts=read
 **/
 
+var SHEET_ID = '1jLbKlstPxHlD7kHZhQn0Z-8PDUdkm7ZQxHZjDr8VWqw';  // Replace with your actual Sheet ID
+var HEADERS = [
+  "Date", "Time", "ID", "Boot", "Battery", "Status", "Temp",
+  "Humidity", "Pressure", "WindSpeed", "RFID"
+];
+// well under the relay's HTTP_TIMEOUT (12 s, firmware/gateway_node/relay.py): a post the
+// relay has given up on and will resend must not still be waiting here to append its rows
+var LOCK_TIMEOUT_MS = 8000;
+var ROW_CACHE_TTL = 21600;  // seconds (CacheService maximum)
+
 function doGet(e) {
   Logger.log(JSON.stringify(e));
   var result = 'OK';
@@ -31,44 +57,141 @@ function doGet(e) {
     return ContentService.createTextOutput("❌ Missing required parameter 'id'");
   }
 
-  var sheet_id = '1jLbKlstPxHlD7kHZhQn0Z-8PDUdkm7ZQxHZjDr8VWqw';  // Replace with your actual Sheet ID
-  var unit_id = e.parameter.id;
-  var sheet_name = "UNIT_" + unit_id;
+  try {
+    appendReadings([e.parameter]);
+  } catch (err) {
+    Logger.log("Write failed: " + err);
+    return ContentService.createTextOutput("❌ " + err);
+  }
+  return ContentService.createTextOutput(result);
+}
 
-  var sheet_open = SpreadsheetApp.openById(sheet_id);
-  var sheet_target = sheet_open.getSheetByName(sheet_name);
+function doPost(e) {
+  var readings;
+  try {
+    readings = JSON.parse(e.postData.contents);
+  } catch (err) {
+    return jsonOutput({ ok: false, error: "Body is not JSON", retry: false });
+  }
+  if (!Array.isArray(readings)) {
+    readings = [readings];
+  }
+
+  try {
+    var result = appendReadings(readings);
+  } catch (err) {
+    Logger.log("Bulk write failed: " + err);
+    return jsonOutput({ ok: false, error: String(err), retry: true });
+  }
+  Logger.log("Bulk write: " + result.written + " of " + readings.length + " readings");
+  return jsonOutput({ ok: true, written: result.written, total: readings.length, skipped: result.skipped });
+}
+
+function jsonOutput(obj) {
+  return ContentService.createTextOutput(JSON.stringify(obj)).setMimeType(ContentService.MimeType.JSON);
+}
 
-  // Create sheet and headers if it doesn't exist
-  if (!sheet_target) {
-    sheet_target = sheet_open.insertSheet(sheet_name);
-    sheet_target.getRange("A1:K1").setValues([[
-      "Date", "Time", "ID", "Boot", "Battery", "Status", "Temp",
-      "Humidity", "Pressure", "WindSpeed", "RFID"
-    ]]);
+/**
+ * Append readings (objects keyed like the URL parameters) to their UNIT_ sheets.
+ * One setValues() per sheet, all under the script lock. Returns
+ * {written: rows written, skipped: indexes of readings without an id}.
+ * Throws if the lock or the spreadsheet can't be had; nothing is written then.
+ */
+function appendReadings(readings) {
+  var now = new Date();
+  var groups = {};
+  var written = 0;
+  var skipped = [];
+  readings.forEach(function (p, i) {
+    if (!p || !p.id) {  // same rule as doGet: no id, no row
+      skipped.push(i);
+      return;
+    }
+    var name = "UNIT_" + p.id;
+    (groups[name] = groups[name] || []).push(buildRow(p, capturedAt(p, now)));
+  });
+  var names = Object.keys(groups);
+  if (!names.length) return { written: 0, skipped: skipped };
+
+  var lock = LockService.getScriptLock();
+  if (!lock.tryLock(LOCK_TIMEOUT_MS)) {
+    throw new Error("Script lock busy for " + LOCK_TIMEOUT_MS / 1000 + " s, send again later");
   }
+  try {
+    var sheet_open = SpreadsheetApp.openById(SHEET_ID);
+    var sheets = {};
+    sheet_open.getSheets().forEach(function (sh) { sheets[sh.getName()] = sh; });
+
+    var cache = CacheService.getScriptCache();
+    var cached = cache.getAll(names.map(rowCacheKey));
+    var lastRows = {};
+
+    names.forEach(function (name) {
+      var rows = groups[name];
+      var sheet_target = sheets[name];
+      var lastRow;
+
+      // Create sheet and headers if it doesn't exist
+      if (!sheet_target) {
+        sheet_target = sheet_open.insertSheet(name);
+        sheet_target.getRange(1, 1, 1, HEADERS.length).setValues([HEADERS]);
+        lastRow = 1;
+      } else if (cached[rowCacheKey(name)]) {
+        lastRow = Number(cached[rowCacheKey(name)]);
+      } else {
+        lastRow = sheet_target.getLastRow();
+      }
+
+      sheet_target.getRange(lastRow + 1, 1, rows.length, HEADERS.length).setValues(rows);
+      lastRows[rowCacheKey(name)] = String(lastRow + rows.length);
+      written += rows.length;
+    });
+
+    SpreadsheetApp.flush();  // commit before the next writer takes the lock
+    cache.putAll(lastRows, ROW_CACHE_TTL);
+  } finally {
+    lock.releaseLock();
+  }
+  return { written: written, skipped: skipped };
+}
 
-  var newRow = sheet_target.getLastRow() + 1;
-  var rowData = new Array(11);
+/**
+ * When the reading was taken: its ts parameter if it has a valid one, else now
+ */
+function capturedAt(p, now) {
+  var ts = Number(p.ts);
+  return p.ts && isFinite(ts) && ts > 0 ? new Date(ts * 1000) : now;
+}
 
+function buildRow(p, at) {
+  var rowData = new Array(HEADERS.length);
   // Date and Time in CST
-  rowData[0] = Utilities.formatDate(new Date(), "CST", 'MM/dd/yyyy');
-  rowData[1] = Utilities.formatDate(new Date(), "CST", 'HH:mm:ss');
+  rowData[0] = Utilities.formatDate(at, "CST", 'MM/dd/yyyy');
+  rowData[1] = Utilities.formatDate(at, "CST", 'HH:mm:ss');
 
   // Fill in parameters
-  rowData[2] = e.parameter.id || "";
-  rowData[3] = e.parameter.bc || "";
-  rowData[4] = e.parameter.bat || "";
-  rowData[5] = e.parameter.srs || "";
-  rowData[6] = e.parameter.temp || "";
-  rowData[7] = e.parameter.humd || "";
-  rowData[8] = e.parameter.Prs || "";
-  rowData[9] = e.parameter.wind || "";
-  rowData[10] = e.parameter.rfid || "";
-
-  Logger.log("Writing row: " + JSON.stringify(rowData));
-  sheet_target.getRange(newRow, 1, 1, rowData.length).setValues([rowData]);
+  rowData[2] = p.id || "";
+  rowData[3] = p.bc || "";
+  rowData[4] = p.bat || "";
+  rowData[5] = p.srs || "";
+  rowData[6] = p.temp || "";
+  rowData[7] = p.humd || "";
+  rowData[8] = p.Prs || "";
+  rowData[9] = p.wind || "";
+  rowData[10] = p.rfid || "";
+  return rowData;
+}
 
-  return ContentService.createTextOutput(result);
+function rowCacheKey(sheetName) {
+  return "lastRow_" + sheetName;
+}
+
+/**
+ * Forget cached last rows, e.g. after editing UNIT_ sheets by hand
+ */
+function clearRowCache() {
+  var names = SpreadsheetApp.openById(SHEET_ID).getSheets().map(function (sh) { return sh.getName(); });
+  CacheService.getScriptCache().removeAll(names.map(rowCacheKey));
 }
 
 
@@ -0,0 +1,303 @@
+"""
+Synthetic Sensor Fleet Generator
+Emits readings in the exact buildIngestJson() schema for thousands of virtual
+sensor nodes, so ingestion and the dashboard can be load-tested offline.
+
+pip install requests   (only needed for the http / gateway sinks)
+
+Examples:
+  python fleet_simulator.py --nodes 2000 --duration 3600 --sink file --out fleet.jsonl
+  python fleet_simulator.py --nodes 500 --speedup 60 --sink http --url https://<ref>.functions.supabase.co/ingest_logs --key <anon key>
+  python fleet_simulator.py --nodes 50 --speedup 1 --sink gateway --url http://192.168.4.1/data
+"""
+import argparse, heapq, json, math, random, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+# Firmware constants (ESP32C6_Sensorfusion_AirFLowIQPackage.ino)
+SLEEP_TIME = 60            # sleep_Time, seconds of deep sleep between wakes
+WAKE_SECONDS = (4.0, 12.0)  # time awake: WiFi connect + RFID window + uplink
+BATTERY_FULL = 3.0          # V after dividerGain; pctFromBatt() maps 2.0..3.0 V -> 0..100 %
+BATTERY_DEAD = 2.05         # below this the regulator browns out and the node goes silent
+WEB_APP_PATH = "/macros/s/AKfycby0Y0FUDXrrgpBRS0fGOVgzpTs0XwQK9daSMbiqvNdLIBRZrIXhGrmlCXVB0VWVd-vP/exec"
+
+
+def url_encode(s):
+    """Same as the firmware urlEncode(): every non-alphanumeric byte is %XX"""
+    return quote(s, safe="")
+
+
+class VirtualNode:
+    """One simulated sensor node. step() advances it by one wake cycle."""
+
+    def __init__(self, rng, start_time):
+        self.rng = rng
+        self.mac = "".join(f"{rng.randrange(256):02X}" for _ in range(6))
+        self.boot = 0
+        self.battery = rng.uniform(2.6, BATTERY_FULL)
+        self.battery_drain = rng.uniform(2e-5, 6e-5)  # V per wake
+        self.next_wake = start_time + timedelta(seconds=rng.uniform(0, SLEEP_TIME))
+
+        # environment baselines for this HVAC system
+        self.temp_base = rng.uniform(18.0, 24.0)
+        self.humidity_base = rng.uniform(30.0, 55.0)
+        self.pressure_pa = rng.uniform(99500.0, 102500.0)
+
+        # airflow: clean filter speed, drops as the filter loads up
+        self.clean_wind = rng.uniform(2.8, 4.5)
+        self.filter_load = rng.uniform(0.0, 0.6)       # 0 = new filter, 1 = fully clogged
+        self.load_rate = rng.uniform(1e-5, 8e-5)       # load per wake
+        self.rfid = self.new_tag()
+
+        self.offline_until = None  # uplink outage (WiFi / gateway down)
+
+    def new_tag(self):
+        return "".join(f"{self.rng.randrange(256):02X}" for _ in range(4))
+
+    def step(self, p_drop, p_outage, p_sensor_fail, p_no_tag):
+        """Wake up, read sensors, return (payload, wake time) or None if nothing reached the uplink"""
+        rng = self.rng
+        now = self.next_wake
+        awake = rng.uniform(*WAKE_SECONDS)
+        self.next_wake = now + timedelta(seconds=SLEEP_TIME + awake)
+
+        if self.battery < BATTERY_DEAD:
+            # flat battery: a technician swaps it after a while, which resets the RTC boot count
+            if rng.random() < 0.002:
+                self.battery = BATTERY_FULL
+                self.boot = 0
+            return None
+
+        self.boot += 1
+        self.battery -= self.battery_drain * rng.uniform(0.8, 1.2)
+
+        # filter loading and RFID filter swaps
+        self.filter_load = min(1.0, self.filter_load + self.load_rate)
+        if self.filter_load > rng.uniform(0.85, 1.0) or rng.random() < 1e-5:
+            self.filter_load = 0.0
+            self.rfid = self.new_tag()
+
+        # daily temperature swing plus noise
+        hour = now.hour + now.minute / 60.0
+        temp = self.temp_base + 1.5 * math.sin((hour - 9) / 24.0 * 2 * math.pi) + rng.gauss(0, 0.15)
+        humidity = min(100.0, max(0.0, self.humidity_base + rng.gauss(0, 0.8)))
+        self.pressure_pa += rng.gauss(0, 8.0)
+        wind = max(0.0, self.clean_wind * (1.0 - 0.75 * self.filter_load) + rng.gauss(0, 0.08))
+
+        status = "Success"
+        if rng.random() < p_sensor_fail:
+            # Temp/Humd/Prs keep their -1 init values when bme.begin() fails
+            status, temp, humidity, pressure = "Failed", -1.0, -1.0, -100.0
+        else:
+            pressure = self.pressure_pa
+
+        # uplink dropouts: single lost packets and longer outages
+        if self.offline_until and now < self.offline_until:
+            return None
+        self.offline_until = None
+        if rng.random() < p_outage:
+            self.offline_until = now + timedelta(minutes=rng.uniform(5, 240))
+            return None
+        if rng.random() < p_drop:
+            return None
+
+        return {
+            "device_mac": self.mac,
+            "boot": self.boot,
+            "battery": round(self.battery, 3),
+            "temp_c": round(temp, 2),
+            "humidity": round(humidity, 2),
+            "pressure_pa": round(pressure, 1),
+            "windSpeed": round(wind, 2),
+            "rfid": "" if rng.random() < p_no_tag else self.rfid,
+            "filter_status": status,
+            "massAirFlow": None,
+        }, now
+
+
+# ------------------------------- sinks -------------------------------
+
+class FileSink:
+    """Newline-delimited JSON, one payload per line. '-' writes to stdout."""
+
+    def __init__(self, path, with_time):
+        self.fh = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+        self.with_time = with_time
+
+    def send(self, payload, at):
+        if self.with_time:
+            payload = dict(payload, recorded_at=at.isoformat())
+        self.fh.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+    def close(self):
+        if self.fh is not sys.stdout:
+            self.fh.close()
+
+
+class HttpSink:
+    """POST the JSON body to an ingest endpoint, like postToIngest() does"""
+
+    def __init__(self, url, key, workers, timeout):
+        import requests
+        self.url = url
+        self.timeout = timeout
+        self.sess = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.sess.mount("http://", adapter)
+        self.sess.mount("https://", adapter)
+        self.headers = {"Content-Type": "application/json"}
+        if key:
+            self.headers["apikey"] = key
+            self.headers["Authorization"] = f"Bearer {key}"
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.inflight = threading.BoundedSemaphore(workers * 4)  # backpressure on the generator
+        self.sent = self.failed = 0
+
+    def submit(self, fn, arg):
+        self.inflight.acquire()
+        fut = self.pool.submit(fn, arg)
+        fut.add_done_callback(lambda _: self.inflight.release())
+
+    def _post(self, body):
+        try:
+            r = self.sess.post(self.url, data=body, headers=self.headers, timeout=self.timeout)
+            ok = 200 <= r.status_code < 300
+        except Exception:
+            ok = False
+        if ok: self.sent += 1
+        else: self.failed += 1
+
+    def send(self, payload, at):
+        self.submit(self._post, json.dumps(payload, separators=(",", ":")))
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        print(f"[HTTP] sent={self.sent} failed={self.failed}", file=sys.stderr)
+
+
+class GatewaySink(HttpSink):
+    """GET the gateway /data?url=... API exactly like the WiFi relay path in the
+    sensor firmware, so ESPHostCurrent + relay.py see real [SERIALFWD] traffic"""
+
+    def _get(self, url):
+        try:
+            r = self.sess.get(url, timeout=self.timeout)
+            ok = r.status_code == 200
+        except Exception:
+            ok = False
+        if ok: self.sent += 1
+        else: self.failed += 1
+
+    def send(self, payload, at):
+        pct = max(0.0, min(100.0, (payload["battery"] - 2.0) * 100.0))
+        params = (
+            "?sts=write"
+            f"&id={payload['device_mac']}"
+            f"&bc={payload['boot']}"
+            f"&bat={pct:.2f}"
+            f"&srs={payload['filter_status']}"
+            f"&temp={payload['temp_c']:.2f}"
+            f"&humd={payload['humidity']:.2f}"
+            f"&Prs={payload['pressure_pa'] / 100.0:.2f}"
+            f"&wind={payload['windSpeed']:.2f}"
+            f"&rfid={payload['rfid']}"
+        )
+        self.submit(self._get, f"{self.url}?url={url_encode(WEB_APP_PATH + params)}")
+
+
+# ------------------------------- driver -------------------------------
+
+def run(args):
+    rng = random.Random(args.seed)
+    start = datetime.now(timezone.utc) if args.start is None else \
+        datetime.fromisoformat(args.start).astimezone(timezone.utc)
+    end = start + timedelta(seconds=args.duration)
+
+    nodes = [VirtualNode(random.Random(rng.random()), start) for _ in range(args.nodes)]
+    heap = [(n.next_wake, i) for i, n in enumerate(nodes)]
+    heapq.heapify(heap)
+
+    if args.sink == "file":
+        sink = FileSink(args.out, with_time=not args.no_time)
+    elif args.sink == "http":
+        sink = HttpSink(args.url, args.key, args.workers, args.timeout)
+    else:
+        sink = GatewaySink(args.url, None, args.workers, args.timeout)
+
+    wall0 = time.monotonic()
+    emitted = dropped = 0
+    min_gap = 1.0 / args.max_rate if args.max_rate else 0.0
+    last_emit = 0.0
+
+    try:
+        while heap:
+            wake, idx = heapq.heappop(heap)
+            if wake >= end:
+                break
+
+            # pace simulated time against the wall clock
+            if args.speedup:
+                due = wall0 + (wake - start).total_seconds() / args.speedup
+                delay = due - time.monotonic()
+                if delay > 0: time.sleep(delay)
+            if min_gap:
+                delay = last_emit + min_gap - time.monotonic()
+                if delay > 0: time.sleep(delay)
+
+            node = nodes[idx]
+            out = node.step(args.p_drop, args.p_outage, args.p_sensor_fail, args.p_no_tag)
+            heapq.heappush(heap, (node.next_wake, idx))
+
+            if out is None:
+                dropped += 1
+                continue
+            payload, at = out
+            sink.send(payload, at)
+            emitted += 1
+            last_emit = time.monotonic()
+
+            if args.progress and emitted % args.progress == 0:
+                rate = emitted / max(1e-6, time.monotonic() - wall0)
+                print(f"[SIM] {emitted} readings ({dropped} dropped) | {rate:.0f}/s | sim {wake.isoformat()}",
+                      file=sys.stderr)
+    except KeyboardInterrupt:
+        print("\n[EXIT] Interrupted", file=sys.stderr)
+    finally:
+        sink.close()
+
+    elapsed = time.monotonic() - wall0
+    print(f"[DONE] {emitted} readings, {dropped} dropped, {len(nodes)} nodes in {elapsed:.1f}s",
+          file=sys.stderr)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Synthetic AirFlowIQ sensor fleet")
+    ap.add_argument("--nodes", type=int, default=100)
+    ap.add_argument("--duration", type=float, default=3600, help="simulated seconds")
+    ap.add_argument("--start", default=None, help="ISO start time (default: now)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--speedup", type=float, default=0,
+                    help="simulated seconds per wall second (0 = as fast as possible)")
+    ap.add_argument("--max-rate", type=float, default=0, help="cap on readings/s emitted")
+    ap.add_argument("--sink", choices=["file", "http", "gateway"], default="file")
+    ap.add_argument("--out", default="-", help="file sink path ('-' = stdout)")
+    ap.add_argument("--no-time", action="store_true", help="file sink: omit recorded_at")
+    ap.add_argument("--url", help="ingest endpoint (http) or gateway /data URL (gateway)")
+    ap.add_argument("--key", help="Supabase anon key for the http sink")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--timeout", type=float, default=12)
+    ap.add_argument("--p-drop", type=float, default=0.01, help="chance a single reading is lost")
+    ap.add_argument("--p-outage", type=float, default=0.0005, help="chance an uplink outage starts")
+    ap.add_argument("--p-sensor-fail", type=float, default=0.002, help="chance bme.begin() fails")
+    ap.add_argument("--p-no-tag", type=float, default=0.01, help="chance the RFID read times out")
+    ap.add_argument("--progress", type=int, default=10000, help="print every N readings (0 = off)")
+    args = ap.parse_args()
+
+    if args.sink != "file" and not args.url:
+        ap.error("--url is required for the http and gateway sinks")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
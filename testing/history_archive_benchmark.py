@@ -0,0 +1,84 @@
+"""
+History Archive Benchmark
+On-disk size and cold-load time of the dashboard's local history archive
+(dashboard/pyqt/data/history_archive.py: delta-of-delta timestamps, quantized
+delta-encoded values, zstd) for day-chunks of fleet simulator readings, against
+the same rows as float64 columns (the memory-mapped hot files) and as the
+PostgREST CSV a bulk graph fetch downloads. Load time for CSV is parsing only,
+with no network, so it is a lower bound for a fetch.
+
+Examples:
+  python history_archive_benchmark.py
+  python history_archive_benchmark.py --days 30 --nodes 5 --repeat 3
+"""
+import argparse, os, random, sys
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from fleet_simulator import VirtualNode
+from wire_format_benchmark import as_csv, best_of
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dashboard", "pyqt"))
+from data.history_archive import decode_chunk, encode_chunk  # noqa: E402
+from data.wire_format import read_csv_frame  # noqa: E402
+
+METRICS = ["battery", "temp_c", "humidity", "pressure_pa", "windSpeed"]
+
+
+def make_device_rows(days, nodes, seed):
+    """`days` of readings from each of `nodes` simulated devices, one device at a time"""
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for _ in range(nodes):
+        node = VirtualNode(random.Random(rng.random()), start)
+        while node.next_wake < start + timedelta(days=days):
+            out = node.step(0.0, 0.0, 0.0, 0.01)
+            if out is None:
+                continue
+            payload, at = out
+            rows.append({"id": len(rows) + 1, "device_id": node.mac, "recorded_at": at,
+                         "rfid": payload["rfid"] or None, **{c: payload[c] for c in METRICS}})
+    return pd.DataFrame(rows)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Archive size and cold-load time vs float64 and CSV")
+    ap.add_argument("--days", type=int, default=14)
+    ap.add_argument("--nodes", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=5, help="runs per format, best time is reported")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    df = make_device_rows(args.days, args.nodes, args.seed)
+    print(f"{'device':>17} {'rows':>7} | {'float64 KB':>10} {'archive KB':>10} {'ratio':>6} | "
+          f"{'csv KB':>7} {'csv ms':>7} {'archive ms':>10} | speedup")
+    for device_id, rows in df.groupby("device_id", sort=False):
+        times = pd.to_datetime(rows["recorded_at"], utc=True).dt.tz_convert(None)
+        day = times.dt.floor("D")
+        chunks = []
+        for _, part in rows.groupby(day.to_numpy()):
+            t = pd.to_datetime(part["recorded_at"], utc=True).dt.tz_convert(None).to_numpy("datetime64[ns]").view("i8")
+            chunks.append(encode_chunk(t, {c: part[c].to_numpy("float64") for c in METRICS}))
+
+        def load_archive(blobs):
+            return [decode_chunk(blob, METRICS) for blob in blobs]
+
+        # same readings back (timestamps to the second)
+        decoded = load_archive(chunks)
+        values = np.concatenate([cols["temp_c"] for _, cols in decoded])
+        assert np.array_equal(values, rows["temp_c"].to_numpy("float64"))
+
+        csv_text = as_csv(rows.to_dict("records"))
+        csv_s, _ = best_of(args.repeat, read_csv_frame, csv_text)
+        archive_s, _ = best_of(args.repeat, load_archive, chunks)
+        flat = len(rows) * 8 * (1 + len(METRICS))
+        packed = sum(len(c) for c in chunks)
+        print(f"{device_id:>17} {len(rows):>7} | {flat / 1e3:>10.1f} {packed / 1e3:>10.1f} {flat / packed:>5.1f}x | "
+              f"{len(csv_text) / 1e3:>7.1f} {csv_s * 1e3:>7.1f} {archive_s * 1e3:>10.1f} | {csv_s / archive_s:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Wire Format Benchmark
+Decode time for bulk sensor_logs fetches as PostgREST JSON (what the supabase
+client returns, then pd.DataFrame) versus text/csv read by the dashboard's
+read_csv_frame() (dashboard/pyqt/data/wire_format.py). Rows come from the
+fleet simulator, formatted the way PostgREST sends them.
+
+Examples:
+  python wire_format_benchmark.py
+  python wire_format_benchmark.py --rows 1000 100000 1000000 --repeat 3
+"""
+import argparse, json, os, random, sys, time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from fleet_simulator import VirtualNode
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dashboard", "pyqt"))
+from data.wire_format import CSV_ENGINE, read_csv_frame  # noqa: E402
+
+COLUMNS = ["id", "device_id", "recorded_at", "battery", "temp_c", "humidity", "pressure_pa", "windSpeed", "rfid"]
+
+
+def make_rows(n, nodes, seed):
+    """n sensor_logs rows from `nodes` simulated devices, in recorded_at order"""
+    rng = random.Random(seed)
+    fleet = [VirtualNode(random.Random(rng.random()), datetime(2026, 1, 1, tzinfo=timezone.utc))
+             for _ in range(nodes)]
+    rows = []
+    while len(rows) < n:
+        node = min(fleet, key=lambda v: v.next_wake)
+        out = node.step(0.0, 0.0, 0.0, 0.01)
+        if out is None:
+            continue
+        payload, at = out
+        rows.append({
+            "id": len(rows) + 1,
+            "device_id": node.mac,
+            "recorded_at": at,
+            "battery": payload["battery"],
+            "temp_c": payload["temp_c"],
+            "humidity": payload["humidity"],
+            "pressure_pa": payload["pressure_pa"],
+            "windSpeed": payload["windSpeed"],
+            "rfid": payload["rfid"] or None,
+        })
+    return rows
+
+
+def pg_time(at, sep):
+    """timestamptz the way postgres prints it: trailing zeros of the fraction dropped"""
+    text = at.strftime(f"%Y-%m-%d{sep}%H:%M:%S.%f").rstrip("0").rstrip(".")
+    return text + ("+00:00" if sep == "T" else "+00")
+
+
+def as_json(rows):
+    return json.dumps([dict(r, recorded_at=pg_time(r["recorded_at"], "T")) for r in rows])
+
+
+def as_csv(rows):
+    lines = [",".join(COLUMNS)]
+    for r in rows:
+        r = dict(r, recorded_at=pg_time(r["recorded_at"], " "))
+        lines.append(",".join("" if r[c] is None else str(r[c]) for c in COLUMNS))
+    return "\n".join(lines) + "\n"
+
+
+def decode_json(text):
+    df = pd.DataFrame(json.loads(text))
+    df["recorded_at"] = pd.to_datetime(df["recorded_at"], utc=True, format="ISO8601")
+    return df
+
+
+def best_of(repeat, fn, arg):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = fn(arg)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, df
+
+
+def main():
+    ap = argparse.ArgumentParser(description="JSON vs CSV decode time for bulk graph fetches")
+    ap.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000, 500000])
+    ap.add_argument("--nodes", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=5, help="runs per format, best time is reported")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    print(f"CSV engine: {CSV_ENGINE}")
+    print(f"{'rows':>9} | {'json MB':>8} {'json ms':>9} | {'csv MB':>7} {'csv ms':>8} | speedup")
+    rows = make_rows(max(args.rows), args.nodes, args.seed)
+    for n in sorted(args.rows):
+        json_text, csv_text = as_json(rows[:n]), as_csv(rows[:n])
+        json_s, json_df = best_of(args.repeat, decode_json, json_text)
+        csv_s, csv_df = best_of(args.repeat, read_csv_frame, csv_text)
+
+        # same frame either way
+        pd.testing.assert_frame_equal(json_df[COLUMNS], csv_df[COLUMNS], check_dtype=False)
+
+        print(f"{n:>9} | {len(json_text) / 1e6:>8.2f} {json_s * 1e3:>9.1f} | "
+              f"{len(csv_text) / 1e6:>7.2f} {csv_s * 1e3:>8.1f} | {json_s / csv_s:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()